@@ -1,7 +1,10 @@
+import asyncio
 import logging
-from typing import Dict, Any, Generator
-from langchain_openai import ChatOpenAI
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, AsyncGenerator, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 from prompts.creative_prompts import (
     PRODUCT_ANALYSIS_PROMPT,
     AUDIENCE_ANALYSIS_PROMPT,
@@ -10,10 +13,64 @@ from prompts.creative_prompts import (
     MARKETING_SUGGESTIONS_PROMPT,
     FINAL_CONTENT_PROMPT
 )
+from core.cache import StepCache, make_cache_key
+from core.compaction import ContextCompactor
+from core.concurrency import AdaptiveConcurrencyLimiter, get_concurrency_limiter
+from core.hedging import Hedger, get_hedger
+from core.executor import stream_dependency_graph
+from core.llm import create_chat_model
+from core.metrics import CONTEXT_TOKENS_SAVED, STEP_DURATION, STEP_ERRORS, STEP_TOKENS_PER_SECOND, STEP_TTFT
+from core.rate_limit import RateLimiter, estimate_tokens, get_rate_limiter
+from core.tracing import Span, get_tracer, reset_span, use_span
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class PipelineStep:
+    """
+    A single persona step of the streaming pipeline
+
+    Attributes:
+        number: Step number (1-6) used in emitted events
+        title: Display title of the step
+        prompt: Prompt template of the step
+        output: Context key the full step output is stored under
+        inputs: Context keys the prompt is rendered from
+    """
+    number: int
+    title: str
+    prompt: str
+    output: str
+    inputs: Tuple[str, ...]
+
+
+PIPELINE_STEPS: Tuple[PipelineStep, ...] = (
+    PipelineStep(1, "تحليل المنتج", PRODUCT_ANALYSIS_PROMPT, "product_analysis",
+                 ("client_name", "product_description")),
+    PipelineStep(2, "تحليل الجمهور", AUDIENCE_ANALYSIS_PROMPT, "audience_analysis",
+                 ("target_audience", "tone_of_voice")),
+    PipelineStep(3, "توليد الأفكار", CREATIVE_IDEATION_PROMPT, "creative_ideas",
+                 ("product_analysis", "audience_analysis", "tone_of_voice")),
+    PipelineStep(4, "توليد المحتوى", CONTENT_GENERATION_PROMPT, "generated_content",
+                 ("product_analysis", "audience_analysis", "creative_ideas", "tone_of_voice")),
+    PipelineStep(5, "الاقتراحات التسويقية", MARKETING_SUGGESTIONS_PROMPT, "marketing_suggestions",
+                 ("generated_content", "target_audience", "tone_of_voice")),
+    PipelineStep(6, "الصياغة النهائية", FINAL_CONTENT_PROMPT, "final_content",
+                 ("product_analysis", "audience_analysis", "creative_ideas",
+                  "generated_content", "marketing_suggestions", "tone_of_voice")),
+)
+
+# Context keys holding step outputs (compacted before being fed to later steps)
+STEP_OUTPUTS: Tuple[str, ...] = tuple(step.output for step in PIPELINE_STEPS)
+
+# Step number -> step numbers whose output it consumes (steps 1 and 2 are independent)
+STEP_DEPENDENCIES: Dict[int, Tuple[int, ...]] = {
+    step.number: tuple(dep.number for dep in PIPELINE_STEPS if dep.output in step.inputs)
+    for step in PIPELINE_STEPS
+}
+
+
 class CreativeAgent:
     """
     Multi-step creative content generation agent
@@ -27,169 +84,386 @@ class CreativeAgent:
     6. Return final structured output as friendly KSA Arabic text with a funny tone
     """
 
-    def __init__(self, model: str = "gpt-4-turbo", temperature: float = 0.7):
+    def __init__(
+        self,
+        model: str = "gpt-4-turbo",
+        temperature: float = 0.7,
+        cache: Optional[StepCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        hedger: Optional[Hedger] = None,
+        compactor: Optional[ContextCompactor] = None
+    ):
         """
         Initialize the Creative Agent
 
         Args:
             model: LLM model to use (default: gpt-4-turbo)
             temperature: Creativity level 0-1 (default: 0.7)
+            cache: Optional step result cache; hits are replayed instead of calling the LLM
+            rate_limiter: RPM/TPM limiter in front of every LLM call (default: the process-wide one)
+            concurrency_limiter: Adaptive in-flight limit on LLM calls (default: the process-wide one)
+            hedger: Backup requests for streams with a late first token (default: the process-wide one)
+            compactor: Shrinks earlier step outputs in later prompts (default: configured from the environment)
         """
-        self.llm = ChatOpenAI(model=model, temperature=temperature)
-        self.llm_streaming = ChatOpenAI(model=model, temperature=temperature, streaming=True)
-
-    def _stream_text(self, prompt_template: str, input_vars: Dict[str, Any]) -> Generator[str, None, None]:
+        self.model = model
+        self.temperature = temperature
+        self.cache = cache
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+        self.concurrency_limiter = (
+            concurrency_limiter if concurrency_limiter is not None else get_concurrency_limiter()
+        )
+        self.hedger = hedger if hedger is not None else get_hedger()
+        self.compactor = compactor if compactor is not None else ContextCompactor.from_env()
+        # Both models share the process-wide pooled HTTP clients
+        self.llm = create_chat_model(model, temperature)
+        self.llm_streaming = create_chat_model(model, temperature, streaming=True)
+        self._chains: Dict[str, Runnable] = {}
+
+    def _get_chain(self, prompt_template: str) -> Runnable:
         """
-        Stream text output from LLM token by token
+        Return the streaming chain for a prompt template, building it on first use
+
+        Templates and chains are immutable, so one chain per template is shared
+        by every request instead of being rebuilt on each call
 
         Args:
             prompt_template: The prompt template to use
+
+        Returns:
+            The prompt | llm_streaming runnable
+        """
+        chain = self._chains.get(prompt_template)
+        if chain is None:
+            chain = ChatPromptTemplate.from_template(prompt_template) | self.llm_streaming
+            self._chains[prompt_template] = chain
+        return chain
+
+    def _cache_key(self, prompt_template: str, input_vars: Dict[str, Any]) -> str:
+        """Build the step cache key for a prompt rendered with input_vars"""
+        return make_cache_key(self.model, self.temperature, prompt_template, input_vars)
+
+    async def _llm_stream(
+        self,
+        chain: Runnable,
+        input_vars: Dict[str, Any],
+        reserved_tokens: int,
+        trace: Optional[Span] = None,
+        on_admitted: Optional[Callable[[], None]] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Make one upstream LLM call within the rate and concurrency limits
+
+        Args:
+            chain: The prompt | llm_streaming runnable
             input_vars: Variables to fill in the template
+            reserved_tokens: Estimated tokens reserved in the TPM budget
+            trace: Parent span of the call
+            on_admitted: Called once the call got past the rate and concurrency limits
 
         Yields:
             Text chunks as they're generated
         """
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        chain = prompt | self.llm_streaming
+        span = trace.child("llm_call") if trace is not None else get_tracer().start_span("llm_call")
+        concurrency_wait = None
+        chunks = 0
+        error = None
+        try:
+            # Wait for room in the RPM/TPM budgets before calling the LLM
+            with span.child("rate_limit_wait"):
+                await self.rate_limiter.acquire(reserved_tokens)
+
+            concurrency_wait = span.child("concurrency_wait")
+            async with self.concurrency_limiter.slot() as call:
+                concurrency_wait.end()
+                if on_admitted is not None:
+                    on_admitted()
+                # Lets the HTTP transport attach connection events to this call
+                span_token = use_span(span)
+                stream = chain.astream(input_vars)
+                try:
+                    async for chunk in stream:
+                        if call.ttft is None:
+                            # The request has been sent; reset before the first yield, which
+                            # may resume this generator from another task
+                            reset_span(span_token)
+                            span_token = None
+                            call.first_token()
+                            self.hedger.ttft.observe(call.ttft)
+                            span.add_event("first_token")
+                        chunks += 1
+                        yield chunk.content if hasattr(chunk, 'content') else str(chunk)
+                finally:
+                    if span_token is not None:
+                        # Failed or cancelled before the first chunk, still in the same task
+                        reset_span(span_token)
+                    # Leaving the loop on cancellation does not close the LLM stream by itself
+                    await stream.aclose()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if concurrency_wait is not None:
+                concurrency_wait.end()
+            span.set_attribute("chunks", chunks)
+            span.end(error)
+
+    async def _astream_text(
+        self,
+        prompt_template: str,
+        input_vars: Dict[str, Any],
+        trace: Optional[Span] = None,
+        use_cache: bool = True
+    ) -> AsyncGenerator[str, None]:
+        """
+        Asynchronously stream text output from LLM token by token
+
+        A step cache hit is replayed as a single chunk without calling the LLM;
+        so is the result of an identical call already in flight
+
+        Args:
+            prompt_template: The prompt template to use
+            input_vars: Variables to fill in the template
+            trace: Parent span of the LLM call(s)
+            use_cache: Read the step cache; False always calls the LLM (the
+                fresh output still replaces the cached one)
 
+        Yields:
+            Text chunks as they're generated
+        """
+        key = self._cache_key(prompt_template, input_vars) if self.cache is not None else None
+        leader = None
+        if key is not None and use_cache:
+            cached = await self.cache.aget(key)
+            if cached is None:
+                # Share an identical step already running for another pipeline
+                pending = self.cache.inflight.join(key)
+                if pending is not None:
+                    cached = await asyncio.shield(pending)
+            if cached is not None:
+                logger.info("Step cache hit, replaying cached output")
+                if trace is not None:
+                    trace.set_attribute("cache_hit", True)
+                yield cached
+                return
+            leader = self.cache.inflight.lead(key)
+
+        chain = self._get_chain(prompt_template)
+        reserved_tokens = self.rate_limiter.reserve_tokens(prompt_template, input_vars)
+
+        parts = []
+        output = None
         try:
-            for chunk in chain.stream(input_vars):
-                if hasattr(chunk, 'content'):
-                    yield chunk.content
-                else:
-                    yield str(chunk)
+            # A late first token starts a hedged duplicate request; the faster one is kept
+            stream = self.hedger.stream(
+                lambda on_admitted: self._llm_stream(chain, input_vars, reserved_tokens, trace, on_admitted)
+            )
+            try:
+                async for text in stream:
+                    parts.append(text)
+                    yield text
+            finally:
+                await stream.aclose()
+            output = "".join(parts)
+            self.rate_limiter.settle(estimate_tokens(output))
+
+            # Only completed streams are cached; aborted ones never reach this point
+            if key is not None:
+                await self.cache.aset(key, output)
         except Exception as e:
-            logger.error(f"Error in streaming: {str(e)}")
+            logger.error(f"Error in async streaming: {str(e)}")
             raise
+        finally:
+            if leader is not None:
+                self.cache.inflight.finish(key, leader, output)
+
+    async def _astream_step(
+        self,
+        step: PipelineStep,
+        context: Dict[str, Any],
+        trace: Optional[Span] = None,
+        use_cache: bool = True
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Stream a single pipeline step as start/stream/complete events
+
+        Args:
+            step: The pipeline step to run
+            context: Pipeline inputs and completed step outputs; the full output
+                of this step is stored under step.output once it completes
+            trace: Parent span of the step
+            use_cache: Read the step cache (False regenerates the step)
 
-    def run_full_pipeline_streaming(
+        Yields:
+            Events with streaming content for the step; step_complete reports
+            the estimated prompt tokens saved by compaction
+        """
+        logger.info(f"Step {step.number}: Streaming {step.output}")
+        yield {"type": "step_start", "step": step.number, "title": step.title}
+
+        parts = []
+        input_vars, tokens_saved = self.compactor.compact_text(
+            step.number,
+            {key: context[key] for key in step.inputs},
+            [key for key in step.inputs if key in STEP_OUTPUTS]
+        )
+        if tokens_saved:
+            CONTEXT_TOKENS_SAVED.inc(tokens_saved, step=step.number)
+        started = time.perf_counter()
+        first_chunk_at = None
+        span = (trace.child if trace is not None else get_tracer().start_span)(
+            f"step_{step.number}", step=step.number, context_tokens_saved=tokens_saved
+        )
+        error = None
+        try:
+            async for chunk in self._astream_text(step.prompt, input_vars, span, use_cache):
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                    STEP_TTFT.observe(first_chunk_at - started, step=step.number)
+                    span.add_event("first_chunk")
+                parts.append(chunk)
+                yield {"type": "step_stream", "step": step.number, "content": chunk}
+        except Exception as e:
+            STEP_ERRORS.inc(step=step.number)
+            error = e
+            raise
+        except (GeneratorExit, asyncio.CancelledError):
+            span.set_attribute("aborted", True)
+            raise
+        finally:
+            span.set_attribute("chars", sum(len(part) for part in parts))
+            span.end(error)
+
+        context[step.output] = "".join(parts)
+        finished = time.perf_counter()
+        STEP_DURATION.observe(finished - started, step=step.number)
+        if first_chunk_at is not None and finished > first_chunk_at:
+            STEP_TOKENS_PER_SECOND.observe(
+                estimate_tokens(context[step.output]) / (finished - first_chunk_at), step=step.number
+            )
+        yield {
+            "type": "step_complete",
+            "step": step.number,
+            "data": context[step.output],
+            "context_tokens_saved": tokens_saved
+        }
+
+    async def arun_full_pipeline_streaming(
         self,
         client_name: str,
         product_description: str,
         target_audience: str,
-        tone_of_voice: list
-    ) -> Generator[Dict[str, Any], None, None]:
+        tone_of_voice: list,
+        trace: Optional[Span] = None,
+        use_cache: bool = True
+    ) -> AsyncGenerator[Dict[str, Any], None]:
         """
-        Run the complete multi-step creative generation pipeline with streaming output
+        Run the complete multi-step creative generation pipeline on the event loop
 
-        Each step streams its output token by token like ChatGPT
+        Steps start as soon as their inputs are ready, so independent steps
+        (product and audience analysis) stream concurrently and their events
+        are interleaved; every event is tagged with its step number
 
         Args:
             client_name: Name of the client/brand
             product_description: Detailed product description
             target_audience: Description of target audience
             tone_of_voice: List of desired tones
+            trace: Parent span of the pipeline (default: start a new trace)
+            use_cache: Read the step cache; False regenerates every step
+                (explicit regenerate) and refreshes the cached outputs
 
         Yields:
             Events with streaming content for each step
         """
-        logger.info(f"Starting streaming creative agent pipeline for {client_name}")
-
+        logger.info(f"Starting async streaming creative agent pipeline for {client_name}")
+        span = (trace.child if trace is not None else get_tracer().start_span)(
+            "pipeline", client_name=client_name, use_cache=use_cache
+        )
+
+        steps = {step.number: step for step in PIPELINE_STEPS}
+        context: Dict[str, Any] = {
+            "client_name": client_name,
+            "product_description": product_description,
+            "target_audience": target_audience,
+            "tone_of_voice": ", ".join(tone_of_voice)
+        }
+
+        step_events = stream_dependency_graph(
+            STEP_DEPENDENCIES,
+            lambda number: self._astream_step(steps[number], context, span, use_cache)
+        )
+
+        completed = False
+        tokens_saved = 0
         try:
-            # Step 1: Analyze Product (with streaming)
-            logger.info("Step 1: Streaming product analysis")
-            yield {"type": "step_start", "step": 1, "title": "تحليل المنتج"}
-
-            product_analysis_parts = []
-            for chunk in self._stream_text(PRODUCT_ANALYSIS_PROMPT, {
-                "client_name": client_name,
-                "product_description": product_description
-            }):
-                product_analysis_parts.append(chunk)
-                yield {"type": "step_stream", "step": 1, "content": chunk}
-
-            product_analysis = "".join(product_analysis_parts)
-            yield {"type": "step_complete", "step": 1, "data": product_analysis}
-
-            # Step 2: Analyze Audience (with streaming)
-            logger.info("Step 2: Streaming audience analysis")
-            yield {"type": "step_start", "step": 2, "title": "تحليل الجمهور"}
-
-            audience_analysis_parts = []
-            tone_str = ", ".join(tone_of_voice)
-            for chunk in self._stream_text(AUDIENCE_ANALYSIS_PROMPT, {
-                "target_audience": target_audience,
-                "tone_of_voice": tone_str
-            }):
-                audience_analysis_parts.append(chunk)
-                yield {"type": "step_stream", "step": 2, "content": chunk}
-
-            audience_analysis = "".join(audience_analysis_parts)
-            yield {"type": "step_complete", "step": 2, "data": audience_analysis}
-
-            # Step 3: Generate Ideas (with streaming)
-            logger.info("Step 3: Streaming creative ideas")
-            yield {"type": "step_start", "step": 3, "title": "توليد الأفكار"}
-
-            creative_ideas_parts = []
-            for chunk in self._stream_text(CREATIVE_IDEATION_PROMPT, {
-                "product_analysis": product_analysis,
-                "audience_analysis": audience_analysis,
-                "tone_of_voice": tone_str
-            }):
-                creative_ideas_parts.append(chunk)
-                yield {"type": "step_stream", "step": 3, "content": chunk}
-
-            creative_ideas = "".join(creative_ideas_parts)
-            yield {"type": "step_complete", "step": 3, "data": creative_ideas}
-
-            # Step 4: Generate Content (with streaming)
-            logger.info("Step 4: Streaming content generation")
-            yield {"type": "step_start", "step": 4, "title": "توليد المحتوى"}
-
-            generated_content_parts = []
-            for chunk in self._stream_text(CONTENT_GENERATION_PROMPT, {
-                "product_analysis": product_analysis,
-                "audience_analysis": audience_analysis,
-                "creative_ideas": creative_ideas,
-                "tone_of_voice": tone_str
-            }):
-                generated_content_parts.append(chunk)
-                yield {"type": "step_stream", "step": 4, "content": chunk}
-
-            generated_content = "".join(generated_content_parts)
-            yield {"type": "step_complete", "step": 4, "data": generated_content}
-
-            # Step 5: Marketing Suggestions (with streaming)
-            logger.info("Step 5: Streaming marketing suggestions")
-            yield {"type": "step_start", "step": 5, "title": "الاقتراحات التسويقية"}
-
-            marketing_suggestions_parts = []
-            for chunk in self._stream_text(MARKETING_SUGGESTIONS_PROMPT, {
-                "generated_content": generated_content,
-                "target_audience": target_audience,
-                "tone_of_voice": tone_str
-            }):
-                marketing_suggestions_parts.append(chunk)
-                yield {"type": "step_stream", "step": 5, "content": chunk}
-
-            marketing_suggestions = "".join(marketing_suggestions_parts)
-            yield {"type": "step_complete", "step": 5, "data": marketing_suggestions}
-
-            # Step 6: Final Output (with streaming)
-            logger.info("Step 6: Streaming final output")
-            yield {"type": "step_start", "step": 6, "title": "الصياغة النهائية"}
-
-            final_message_parts = []
-            for chunk in self._stream_text(FINAL_CONTENT_PROMPT, {
-                "product_analysis": product_analysis,
-                "audience_analysis": audience_analysis,
-                "creative_ideas": creative_ideas,
-                "generated_content": generated_content,
-                "marketing_suggestions": marketing_suggestions,
-                "tone_of_voice": tone_str
-            }):
-                final_message_parts.append(chunk)
-                yield {"type": "step_stream", "step": 6, "content": chunk}
-
-            final_message = "".join(final_message_parts)
-            yield {"type": "step_complete", "step": 6, "data": final_message}
+            async for event in step_events:
+                if event["type"] == "step_complete":
+                    tokens_saved += event.get("context_tokens_saved", 0)
+                yield event
 
             # Final completion event
-            yield {"type": "complete", "final_content": final_message}
+            completed = True
+            span.set_attribute("context_tokens_saved", tokens_saved)
+            yield {
+                "type": "complete",
+                "final_content": context["final_content"],
+                "context_tokens_saved": tokens_saved
+            }
             logger.info(f"Pipeline completed successfully for {client_name}")
 
         except Exception as e:
-            logger.error(f"Error in streaming creative agent pipeline: {str(e)}")
+            logger.error(f"Error in async streaming creative agent pipeline: {str(e)}")
+            span.end(e)
             yield {"type": "error", "message": str(e)}
             raise
+        finally:
+            # Cancels any in-flight step (and its upstream LLM stream) when the
+            # consumer stops early, e.g. because the client disconnected
+            await step_events.aclose()
+            if not completed and span.duration is None:
+                span.set_attribute("aborted", True)
+            span.end()
+
+    async def arun_full_pipeline(
+        self,
+        client_name: str,
+        product_description: str,
+        target_audience: str,
+        tone_of_voice: list,
+        trace: Optional[Span] = None,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Run the complete pipeline and collect its outputs instead of streaming them
+
+        Args:
+            client_name: Name of the client/brand
+            product_description: Detailed product description
+            target_audience: Description of target audience
+            tone_of_voice: List of desired tones
+            trace: Parent span of the pipeline (default: start a new trace)
+            use_cache: Read the step cache (False regenerates every step)
+
+        Returns:
+            Dictionary with the output of each step, the final content and the
+            estimated prompt tokens saved by compaction
+        """
+        steps: Dict[int, str] = {}
+        final_content = ""
+        tokens_saved = 0
+        async for event in self.arun_full_pipeline_streaming(
+            client_name=client_name,
+            product_description=product_description,
+            target_audience=target_audience,
+            tone_of_voice=tone_of_voice,
+            trace=trace,
+            use_cache=use_cache
+        ):
+            if event["type"] == "step_complete":
+                steps[event["step"]] = event["data"]
+            elif event["type"] == "complete":
+                final_content = event["final_content"]
+                tokens_saved = event.get("context_tokens_saved", 0)
+
+        return {"steps": steps, "final_content": final_content, "context_tokens_saved": tokens_saved}
@@ -1,16 +1,29 @@
 """
 Creative Agent API Routes
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
 from fastapi.responses import StreamingResponse
-from api.schemas.request import CreativeAgentRequest
-from api.schemas.response import CreativeAgentResponse
+from api.schemas.request import CreativeAgentRequest, CreativeAgentBatchRequest
+from api.schemas.response import CreativeAgentResponse, CreativeAgentBatchItem
+from api.sse import PROTOCOL_HEADER, encode_event, negotiate_protocol
 from agents.creative import CreativeAgent
+from core.batch import run_bounded
+from core.cache import StepCache
+from core.concurrency import get_concurrency_limiter
+from core.events import ReplayWindowExceeded
+from core.hedging import get_hedger
+from core.llm import get_http_pool
+from core.metrics import ACTIVE_STREAMS, PIPELINES_ABORTED, Gauge
+from core.rate_limit import get_rate_limiter
+from core.runs import PipelineRunRegistry, parse_event_id
+from core.streaming import coalesce_events, until_disconnected
+from core.tracing import get_tracer, parse_traceparent
 import logging
 import os
 from dotenv import load_dotenv
-import json
 import asyncio
+import time
+from typing import Optional
 
 # Load environment variables
 load_dotenv()
@@ -24,7 +37,50 @@ router = APIRouter()
 # Initialize the creative agent with valid model
 MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1")
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
-creative_agent = CreativeAgent(model=MODEL, temperature=TEMPERATURE)
+
+# Step result cache: in-memory LRU backed by SQLite (empty STEP_CACHE_PATH keeps it in memory)
+step_cache = StepCache.from_env()
+
+creative_agent = CreativeAgent(model=MODEL, temperature=TEMPERATURE, cache=step_cache)
+
+# Minimum seconds between client disconnect checks while streaming
+DISCONNECT_CHECK_INTERVAL = float(os.getenv("DISCONNECT_CHECK_INTERVAL", "0.5"))
+
+# Resumable streams: replay buffer per pipeline (0 keeps the whole run, so a slow
+# subscriber never falls out of the window), and how long a pipeline survives
+# without a connected client (0 aborts as soon as the client disconnects)
+pipeline_runs = PipelineRunRegistry(
+    buffer_events=int(os.getenv("REPLAY_BUFFER_EVENTS", "0")) or None,
+    grace_seconds=float(os.getenv("RESUME_GRACE_SECONDS", "5")),
+    retention_seconds=float(os.getenv("RESUME_RETENTION_SECONDS", "60")),
+    on_abort=PIPELINES_ABORTED.inc
+)
+
+# Scrape-time gauges of the pipeline and upstream LLM state
+Gauge("creative_active_pipelines", "Streaming pipelines currently running", function=lambda: len(pipeline_runs))
+Gauge("creative_llm_concurrency_limit", "Current adaptive limit of concurrent LLM calls",
+      function=lambda: int(get_concurrency_limiter().limit))
+Gauge("creative_llm_in_flight", "LLM calls currently in flight", function=lambda: get_concurrency_limiter().in_flight)
+Gauge("creative_llm_queued", "LLM calls waiting for a concurrency slot",
+      function=lambda: get_concurrency_limiter().stats()["queued"])
+Gauge("creative_llm_rate_limit_waiting", "LLM calls delayed by the RPM/TPM limiter",
+      function=lambda: get_rate_limiter().waiting)
+Gauge("creative_llm_http_active_connections", "Upstream HTTP connections with a request in flight",
+      function=lambda: get_http_pool().stats()["active_connections"])
+
+# Token coalescing: flush buffered tokens after N ms or M characters (0 ms disables)
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "50"))
+SSE_COALESCE_CHARS = int(os.getenv("SSE_COALESCE_CHARS", "256"))
+
+# Batch generation: default and maximum briefs processed concurrently per batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+
+def wants_no_cache(cache_control: Optional[str]) -> bool:
+    """True if a Cache-Control header asks for a fresh (uncached) response"""
+    directives = {directive.strip().split("=")[0].lower() for directive in (cache_control or "").split(",")}
+    return bool(directives & {"no-cache", "no-store"})
 
 
 @router.post(
@@ -34,9 +90,16 @@ creative_agent = CreativeAgent(model=MODEL, temperature=TEMPERATURE)
     description="""
     Generate creative marketing content with real-time streaming of each step.
     Returns Server-Sent Events (SSE) stream showing progress of each pipeline step.
+    Pass `protocol=2` (or the `X-SSE-Protocol: 2` header) for the compact, delta-only protocol.
     """
 )
-async def create_creative_content_stream(request: CreativeAgentRequest):
+async def create_creative_content_stream(
+    request: CreativeAgentRequest,
+    http_request: Request,
+    protocol: str = Query(None, description="SSE protocol version: 1 (default) or 2 (compact)"),
+    last_event_id: str = Header(None, alias="Last-Event-ID"),
+    cache_control: str = Header(None, alias="Cache-Control")
+):
     """
     Generate creative marketing content with streaming progress updates.
 
@@ -47,34 +110,147 @@ async def create_creative_content_stream(request: CreativeAgentRequest):
     - Step 4: Content Generation
     - Step 5: Marketing Suggestions
     - Step 6: Final Output Formatting
+
+    Every event carries an SSE id ("<pipeline id>:<n>"). A reconnect sending
+    Last-Event-ID within RESUME_GRACE_SECONDS only receives the missed events
+    and then joins the live stream instead of restarting the pipeline. If
+    nobody reconnects, the in-flight LLM stream is aborted and the remaining
+    steps are skipped. Resuming an unknown or expired pipeline fails with 404
+    (run_unknown), resuming with a different request body with 409
+    (run_mismatch); the client has to start a new stream without Last-Event-ID.
+
+    Step outputs are replayed from the step cache when the same step ran
+    before; `no_cache: true` in the body or a `Cache-Control: no-cache` header
+    regenerates every step (and refreshes the cached outputs).
+
+    The pipeline is traced; a W3C traceparent header joins the caller's
+    trace. The trace id is returned in X-Trace-Id and on every event except
+    the token deltas.
     """
-    def event_generator():
+    sse_protocol = negotiate_protocol(protocol, http_request.headers.get(PROTOCOL_HEADER))
+    tracer = get_tracer()
+    use_cache = not (request.no_cache or wants_no_cache(cache_control))
+
+    # Resume the pipeline a reconnecting client's last event id belongs to; never
+    # start a new one in its place, the client would append its output twice
+    run, after = None, 0
+    request_key = request.model_dump_json()
+    resume = parse_event_id(last_event_id)
+    if resume is not None:
+        run = pipeline_runs.get(resume[0])
+        if run is None:
+            logger.warning(f"Cannot resume unknown or expired pipeline {resume[0]} for: {request.client_name}")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={"error": "run_unknown", "message": f"Pipeline {resume[0]} is unknown or expired; start a new stream"}
+            )
+        if run.request_key != request_key:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"error": "run_mismatch", "message": f"Pipeline {run.run_id} was started for a different request"}
+            )
+        after = resume[1]
+        logger.info(f"Resuming pipeline {run.run_id} after event {after} for: {request.client_name}")
+
+    async def pipeline_events(trace):
+        events = None
+        error = None
         try:
             logger.info(f"Starting streaming pipeline for: {request.client_name}")
 
             # Validate input
             if not request.tone_of_voice:
-                yield f"data: {json.dumps({'type': 'error', 'message': 'At least one tone of voice is required'})}\n\n"
+                yield {'type': 'error', 'message': 'At least one tone of voice is required', 'trace_id': trace.trace_id}
                 return
 
-            # Use the new streaming pipeline
-            for event in creative_agent.run_full_pipeline_streaming(
-                client_name=request.client_name,
-                product_description=request.product_description,
-                target_audience=request.target_audience,
-                tone_of_voice=request.tone_of_voice
-            ):
-                # Send each event as SSE
-                yield f"data: {json.dumps(event)}\n\n"
+            # Use the async streaming pipeline so the stream lives on the event loop
+            # Coalesce tokens so each SSE frame carries a chunk of text, not a single token
+            events = coalesce_events(
+                creative_agent.arun_full_pipeline_streaming(
+                    client_name=request.client_name,
+                    product_description=request.product_description,
+                    target_audience=request.target_audience,
+                    tone_of_voice=request.tone_of_voice,
+                    trace=trace,
+                    use_cache=use_cache
+                ),
+                max_delay=SSE_COALESCE_MS / 1000,
+                max_chars=SSE_COALESCE_CHARS
+            )
+            async for event in events:
+                # Tag everything but token deltas with the trace id
+                if event.get('type') != 'step_stream':
+                    event = {**event, 'trace_id': trace.trace_id}
+                yield event
 
             logger.info(f"Successfully completed streaming for: {request.client_name}")
 
         except ValueError as ve:
+            error = ve
             logger.error(f"Validation error: {str(ve)}")
-            yield f"data: {json.dumps({'type': 'error', 'message': f'خطأ في التحقق: {str(ve)}'})}\n\n"
+            yield {'type': 'error', 'message': f'خطأ في التحقق: {str(ve)}', 'trace_id': trace.trace_id}
         except Exception as e:
+            error = e
             logger.error(f"Error in streaming pipeline: {str(e)}")
-            yield f"data: {json.dumps({'type': 'error', 'message': f'خطأ: {str(e)}'})}\n\n"
+            yield {'type': 'error', 'message': f'خطأ: {str(e)}', 'trace_id': trace.trace_id}
+        finally:
+            # Closing the pipeline cancels the in-flight OpenAI stream
+            if events is not None:
+                await events.aclose()
+            trace.end(error)
+
+    if run is None:
+        trace = tracer.start_span(
+            "creative_stream",
+            trace_id=parse_traceparent(http_request.headers.get("traceparent")),
+            client_name=request.client_name
+        )
+        run = pipeline_runs.start(pipeline_events(trace), trace_id=trace.trace_id, request_key=request_key)
+
+    async def event_generator():
+        # One span per connection: time spent serializing and sending to this client
+        connection = tracer.start_span(
+            "sse_connection",
+            trace_id=run.trace_id,
+            run_id=run.run_id,
+            protocol=sse_protocol,
+            resumed_after=after
+        )
+        connection.set_attribute("events", 0)
+
+        def disconnected():
+            logger.warning(f"Client disconnected from pipeline {run.run_id}: {request.client_name}")
+            connection.set_attribute("disconnected", True)
+
+        # Stop streaming as soon as nobody is listening anymore, even between events
+        events = until_disconnected(
+            run.subscribe(after),
+            http_request.is_disconnected,
+            interval=DISCONNECT_CHECK_INTERVAL,
+            on_disconnect=disconnected
+        )
+        ACTIVE_STREAMS.inc()
+        try:
+            async for seq, event in events:
+                # Send each event as SSE
+                started = time.perf_counter()
+                frame = encode_event(event, sse_protocol, event_id=f"{run.run_id}:{seq}")
+                connection.add_attribute("serialize_seconds", time.perf_counter() - started)
+                connection.add_attribute("events", 1)
+                connection.add_attribute("bytes", len(frame.encode("utf-8")))
+                if seq == after + 1:
+                    connection.add_event("first_event")
+                yield frame
+
+        except ReplayWindowExceeded as e:
+            logger.warning(f"Cannot resume pipeline {run.run_id}: {str(e)}")
+            connection.end(e)
+            yield encode_event({'type': 'error', 'message': f'تعذر استئناف البث: {str(e)}'}, sse_protocol)
+        finally:
+            # The last subscriber leaving starts the abort grace period
+            ACTIVE_STREAMS.dec()
+            await events.aclose()
+            connection.end()
 
     return StreamingResponse(
         event_generator(),
@@ -82,6 +258,93 @@ async def create_creative_content_stream(request: CreativeAgentRequest):
         headers={
             "Cache-Control": "no-cache",
             "X-Accel-Buffering": "no",
-            "Connection": "keep-alive"
+            "Connection": "keep-alive",
+            PROTOCOL_HEADER: sse_protocol,
+            "X-Pipeline-Id": run.run_id,
+            "X-Trace-Id": run.trace_id
         }
     )
+
+
+@router.post(
+    "/generate-creative-content-batch",
+    status_code=status.HTTP_200_OK,
+    summary="Generate creative content for a batch of briefs",
+    description="""
+    Run the full pipeline for every brief with bounded concurrency.
+    Returns newline-delimited JSON (NDJSON): one result line per brief, in completion order.
+    """
+)
+async def create_creative_content_batch(batch: CreativeAgentBatchRequest):
+    """
+    Generate creative marketing content for many briefs in one request.
+
+    Each line carries the brief's index in the request; a failing brief is
+    reported as an error line and does not fail the rest of the batch.
+    """
+    concurrency = min(batch.concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    logger.info(f"Starting batch of {len(batch.briefs)} briefs with concurrency {concurrency}")
+
+    async def run_brief(item):
+        index, brief = item
+        try:
+            result = await creative_agent.arun_full_pipeline(
+                client_name=brief.client_name,
+                product_description=brief.product_description,
+                target_audience=brief.target_audience,
+                tone_of_voice=brief.tone_of_voice,
+                use_cache=not brief.no_cache
+            )
+            return CreativeAgentBatchItem(
+                index=index,
+                client_name=brief.client_name,
+                status="ok",
+                final_content=result["final_content"],
+                steps=result["steps"],
+                context_tokens_saved=result["context_tokens_saved"]
+            )
+        except Exception as e:
+            logger.error(f"Error in batch brief {index} ({brief.client_name}): {str(e)}")
+            return CreativeAgentBatchItem(
+                index=index,
+                client_name=brief.client_name,
+                status="error",
+                error=str(e)
+            )
+
+    async def ndjson_generator():
+        results = run_bounded(enumerate(batch.briefs), run_brief, concurrency)
+        try:
+            async for item in results:
+                yield item.model_dump_json(exclude_none=True) + "\n"
+            logger.info(f"Successfully completed batch of {len(batch.briefs)} briefs")
+        finally:
+            # Cancels in-flight briefs if the client goes away
+            await results.aclose()
+
+    return StreamingResponse(
+        ndjson_generator(),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+@router.get(
+    "/stats",
+    summary="Streaming pipeline statistics",
+    description="Process-local counters of the streaming pipeline."
+)
+async def get_stats():
+    """Return process-local pipeline statistics"""
+    return {
+        "pipelines_aborted": PIPELINES_ABORTED.value,
+        "pipelines_live": len(pipeline_runs),
+        "step_cache": step_cache.stats() if step_cache is not None else None,
+        "llm_http_pool": get_http_pool().stats(),
+        "rate_limiter": get_rate_limiter().stats(),
+        "concurrency_limiter": get_concurrency_limiter().stats(),
+        "hedging": get_hedger().stats()
+    }
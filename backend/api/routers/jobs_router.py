@@ -0,0 +1,108 @@
+"""
+Generation Job API Routes
+"""
+from fastapi import APIRouter, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from api.schemas.request import CreativeAgentRequest
+from api.schemas.response import JobSubmitResponse, JobStatusResponse
+from api.sse import PROTOCOL_HEADER, encode_event, negotiate_protocol
+from api.routers.creative_router import creative_agent, SSE_COALESCE_MS, SSE_COALESCE_CHARS
+from core.jobs import JobManager, JobStore
+from core.metrics import ACTIVE_STREAMS
+import logging
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Jobs run on a local worker pool and are persisted to SQLite
+job_manager = JobManager(
+    creative_agent,
+    JobStore(os.getenv("JOB_STORE_PATH", ".cache/jobs.sqlite3")),
+    concurrency=int(os.getenv("JOB_CONCURRENCY", "4")),
+    coalesce_delay=SSE_COALESCE_MS / 1000,
+    coalesce_chars=SSE_COALESCE_CHARS
+)
+
+
+@router.post(
+    "/jobs",
+    response_model=JobSubmitResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit a creative content generation job",
+    description="""
+    Queue a generation job that runs independently of this connection.
+    Poll it with GET /api/jobs/{job_id} or stream it with GET /api/jobs/{job_id}/stream.
+    """
+)
+async def submit_job(request: CreativeAgentRequest):
+    """Queue a generation job and return its id"""
+    job_id = await job_manager.submit(request.model_dump())
+    return JobSubmitResponse(job_id=job_id, status="queued")
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobStatusResponse,
+    summary="Get a generation job",
+    description="Job status plus the output of every step completed so far."
+)
+async def get_job(job_id: str):
+    """Return a job's status and step outputs"""
+    job = await job_manager.aget(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+    return JobStatusResponse(**job)
+
+
+@router.get(
+    "/jobs/{job_id}/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Stream a generation job",
+    description="""
+    Server-Sent Events stream of the job, starting after event `after` (or the
+    Last-Event-ID header). Running jobs are followed live; finished jobs are
+    replayed instantly from the store. Supports `protocol=2` like the main stream.
+    """
+)
+async def stream_job(
+    job_id: str,
+    http_request: Request,
+    after: int = Query(0, ge=0, description="Last event id the client already has"),
+    protocol: str = Query(None, description="SSE protocol version: 1 (default) or 2 (compact)"),
+    last_event_id: str = Header(None, alias="Last-Event-ID")
+):
+    """Stream a job's events from any point"""
+    if await job_manager.astatus(job_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    sse_protocol = negotiate_protocol(protocol, http_request.headers.get(PROTOCOL_HEADER))
+
+    async def event_generator():
+        events = job_manager.stream(job_id, after)
+        ACTIVE_STREAMS.inc()
+        try:
+            async for seq, event in events:
+                yield encode_event(event, sse_protocol, event_id=seq)
+        finally:
+            # Only this subscription ends; the job itself keeps running
+            ACTIVE_STREAMS.dec()
+            await events.aclose()
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Connection": "keep-alive",
+            PROTOCOL_HEADER: sse_protocol
+        }
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 
 class CreativeAgentRequest(BaseModel):
@@ -33,3 +33,27 @@ class CreativeAgentRequest(BaseModel):
         max_items=10,
         description="List of desired tones (e.g., casual, formal, playful)"
     )
+    no_cache: bool = Field(
+        False,
+        description="Regenerate every step instead of replaying cached step outputs"
+    )
+
+
+class CreativeAgentBatchRequest(BaseModel):
+    """
+    Request schema for batch creative content generation
+
+    A list of briefs processed with bounded concurrency
+    """
+    briefs: List[CreativeAgentRequest] = Field(
+        ...,
+        min_items=1,
+        max_items=1000,
+        description="Briefs to generate content for"
+    )
+    concurrency: Optional[int] = Field(
+        None,
+        ge=1,
+        le=64,
+        description="Maximum briefs processed at the same time (capped by the server)"
+    )
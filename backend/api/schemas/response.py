@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from typing import Dict, Optional
 
 
 class CreativeAgentResponse(BaseModel):
@@ -14,6 +15,46 @@ class CreativeAgentResponse(BaseModel):
     )
 
 
+class CreativeAgentBatchItem(BaseModel):
+    """
+    One NDJSON line of a batch generation response
+
+    Emitted as soon as the brief finishes; a failed brief reports its error
+    without failing the rest of the batch
+    """
+    index: int = Field(description="Position of the brief in the batch request")
+    client_name: str = Field(description="Client name of the brief")
+    status: str = Field(description="'ok' or 'error'")
+    final_content: Optional[str] = Field(None, description="The final generated creative content")
+    steps: Optional[Dict[int, str]] = Field(None, description="Output of each pipeline step")
+    context_tokens_saved: Optional[int] = Field(
+        None, description="Estimated prompt tokens saved by compacting earlier step outputs"
+    )
+    error: Optional[str] = Field(None, description="Error message if the brief failed")
+
+
+class JobSubmitResponse(BaseModel):
+    """Response schema for a submitted generation job"""
+    job_id: str = Field(description="Id used to query and stream the job")
+    status: str = Field(description="Job status")
+
+
+class JobStatusResponse(BaseModel):
+    """
+    Response schema for a generation job
+
+    Step outputs are included as soon as each step completes
+    """
+    job_id: str = Field(description="Job id")
+    status: str = Field(description="queued, running, completed, failed or interrupted")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    created_at: float = Field(description="Submission time (Unix timestamp)")
+    updated_at: float = Field(description="Last status change (Unix timestamp)")
+    steps: Dict[int, str] = Field(description="Output of each completed step")
+    final_content: Optional[str] = Field(None, description="The final generated creative content")
+    last_event_id: int = Field(description="Sequence number of the latest event")
+
+
 class ErrorResponse(BaseModel):
     """Schema for error responses"""
     detail: str = Field(description="Error message")
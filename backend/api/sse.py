@@ -0,0 +1,103 @@
+"""
+Server-Sent Events encoding
+
+Protocol "1" (default) sends pipeline events verbatim, including the full
+step output on every step_complete and the final content on complete.
+
+Protocol "2" (compact) only sends deltas. Step and final completions carry
+the output length (Unicode code points) and CRC32 instead of the text itself,
+keys are shortened and UTF-8 is sent unescaped:
+
+    {"t":"b","s":1,"ti":"..."}     step_start
+    {"t":"d","s":1,"c":"..."}      step_stream (delta)
+    {"t":"c","s":1,"n":42,"h":"..."} step_complete
+    {"t":"f","n":42,"h":"...","ts":120} complete (final content = step 6 output,
+                                   ts = prompt tokens saved by compaction)
+    {"t":"e","m":"..."}            error
+
+Events tagged with a trace id carry it as "tr" (not sent on deltas).
+"""
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+PROTOCOL_V1 = "1"
+PROTOCOL_COMPACT = "2"
+PROTOCOLS = (PROTOCOL_V1, PROTOCOL_COMPACT)
+
+PROTOCOL_HEADER = "X-SSE-Protocol"
+
+
+def content_checksum(text: str) -> str:
+    """Return the CRC32 of text's UTF-8 bytes as 8 hex digits"""
+    return f"{zlib.crc32(text.encode('utf-8')) & 0xffffffff:08x}"
+
+
+def compact_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a pipeline event to its compact (protocol 2) form
+
+    Args:
+        event: Pipeline event
+
+    Returns:
+        Compact event; unknown event types are passed through unchanged
+    """
+    event_type = event.get("type")
+    if event_type == "step_stream":
+        return {"t": "d", "s": event["step"], "c": event["content"]}
+    if event_type == "step_start":
+        compact = {"t": "b", "s": event["step"], "ti": event.get("title", "")}
+    elif event_type == "step_complete":
+        data = event.get("data") or ""
+        compact = {"t": "c", "s": event["step"], "n": len(data), "h": content_checksum(data)}
+    elif event_type == "complete":
+        final_content = event.get("final_content") or ""
+        compact = {"t": "f", "n": len(final_content), "h": content_checksum(final_content)}
+        if "context_tokens_saved" in event:
+            compact["ts"] = event["context_tokens_saved"]
+    elif event_type == "error":
+        compact = {"t": "e", "m": event.get("message", "")}
+    else:
+        return event
+    if event.get("trace_id"):
+        compact["tr"] = event["trace_id"]
+    return compact
+
+
+def encode_event(event: Dict[str, Any], protocol: str = PROTOCOL_V1, event_id: Optional[Any] = None) -> str:
+    """
+    Encode a pipeline event as an SSE frame
+
+    Args:
+        event: Pipeline event
+        protocol: Wire protocol version ("1" or "2")
+        event_id: Optional SSE event id, echoed back by clients as Last-Event-ID
+
+    Returns:
+        The SSE frame text
+    """
+    if protocol == PROTOCOL_COMPACT:
+        payload = json.dumps(compact_event(event), ensure_ascii=False, separators=(",", ":"))
+    else:
+        payload = json.dumps(event)
+    if event_id is not None:
+        return f"id: {event_id}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+def negotiate_protocol(query_value: Optional[str], header_value: Optional[str]) -> str:
+    """
+    Pick the wire protocol from the query parameter or header
+
+    Args:
+        query_value: Value of the protocol query parameter
+        header_value: Value of the X-SSE-Protocol header
+
+    Returns:
+        A supported protocol version, defaulting to "1"
+    """
+    for value in (query_value, header_value):
+        if value and value.strip() in PROTOCOLS:
+            return value.strip()
+    return PROTOCOL_V1
@@ -1,6 +1,11 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from api.routers import creative_router
+from api.routers import creative_router, jobs_router
+from core.llm import get_http_pool
+from core.metrics import install_default_executor, monitor_event_loop_lag, render_metrics
+from core.tracing import get_tracer
 import os
 from dotenv import load_dotenv
 
@@ -24,12 +29,33 @@ app.add_middleware(
 
 # Include routers
 app.include_router(creative_router.router, prefix="/api", tags=["creative"])
+app.include_router(jobs_router.router, prefix="/api", tags=["jobs"])
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Start measuring event loop lag and blocking-call threads for /metrics"""
+    install_default_executor()
+    app.state.loop_monitor = asyncio.ensure_future(monitor_event_loop_lag())
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    """Stop the loop monitor, close the pooled LLM connections and flush traces"""
+    app.state.loop_monitor.cancel()
+    pool = get_http_pool()
+    await pool.aclose()
+    pool.close()
+    get_tracer().exporter.shutdown()
 
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,193 @@
+"""
+Creative Agent Bulk CLI
+
+Streams a JSONL file of briefs through the creative pipeline with a pool of
+concurrent workers and appends one result line per brief to an output JSONL
+file as soon as it finishes.
+
+The output file doubles as the checkpoint: re-running the same command skips
+every brief already recorded in it, so an interrupted run resumes where it
+stopped.
+
+Each input line is a JSON object with the CreativeAgentRequest fields and an
+optional "id" (defaults to the 1-based line number):
+
+    {"id": "sku-1", "client_name": "...", "product_description": "...",
+     "target_audience": "...", "tone_of_voice": ["..."]}
+
+Usage (from the backend directory):
+    python cli.py briefs.jsonl results.jsonl --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, Set, Tuple
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+
+from agents.creative import CreativeAgent
+from api.schemas.request import CreativeAgentRequest
+from core.batch import run_bounded
+from core.cache import StepCache
+
+logger = logging.getLogger("creative_cli")
+
+
+def load_checkpoint(output_path: str, retry_errors: bool) -> Set[str]:
+    """
+    Read the ids already recorded in the output file
+
+    Args:
+        output_path: Results JSONL file (may not exist yet)
+        retry_errors: If True, briefs whose last result is an error are not treated as done
+
+    Returns:
+        Set of brief ids to skip
+    """
+    statuses: Dict[str, str] = {}
+    if not os.path.exists(output_path):
+        return set()
+
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from an interrupted run; that brief is simply redone
+                continue
+            statuses[str(record.get("id"))] = record.get("status")
+
+    return {
+        brief_id for brief_id, status in statuses.items()
+        if status == "ok" or not retry_errors
+    }
+
+
+def iter_briefs(input_path: str, done: Set[str]) -> Iterator[Tuple[str, Any]]:
+    """
+    Lazily read briefs that still need processing
+
+    Args:
+        input_path: Briefs JSONL file
+        done: Ids to skip
+
+    Yields:
+        (brief id, validated CreativeAgentRequest or the validation error message)
+    """
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+            except json.JSONDecodeError as e:
+                brief_id = str(line_number)
+                if brief_id not in done:
+                    yield brief_id, f"Invalid JSON: {str(e)}"
+                continue
+
+            brief_id = str(raw.pop("id", line_number))
+            if brief_id in done:
+                continue
+            try:
+                yield brief_id, CreativeAgentRequest(**raw)
+            except ValidationError as e:
+                yield brief_id, f"Validation error: {e.errors()}"
+
+
+async def run(args: argparse.Namespace) -> int:
+    """
+    Process the brief file
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        Process exit code
+    """
+    done = load_checkpoint(args.output, args.retry_errors)
+    if done:
+        logger.info(f"Resuming: {len(done)} briefs already in {args.output}")
+
+    agent = CreativeAgent(
+        model=os.getenv("OPENAI_MODEL", "gpt-4.1"),
+        temperature=float(os.getenv("TEMPERATURE", "0.7")),
+        cache=StepCache.from_env()
+    )
+
+    async def process(item: Tuple[str, Any]) -> Dict[str, Any]:
+        brief_id, brief = item
+        if isinstance(brief, str):
+            return {"id": brief_id, "status": "error", "error": brief}
+        try:
+            result = await agent.arun_full_pipeline(
+                client_name=brief.client_name,
+                product_description=brief.product_description,
+                target_audience=brief.target_audience,
+                tone_of_voice=brief.tone_of_voice,
+                use_cache=not brief.no_cache
+            )
+            return {
+                "id": brief_id,
+                "client_name": brief.client_name,
+                "status": "ok",
+                "final_content": result["final_content"],
+                "steps": result["steps"]
+            }
+        except Exception as e:
+            logger.error(f"Error in brief {brief_id}: {str(e)}")
+            return {"id": brief_id, "client_name": brief.client_name, "status": "error", "error": str(e)}
+
+    # Make sure appended records start on a fresh line after a torn write
+    if os.path.exists(args.output) and os.path.getsize(args.output) > 0:
+        with open(args.output, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+        if needs_newline:
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    processed = 0
+    failed = 0
+    started = time.monotonic()
+    with open(args.output, "a", encoding="utf-8") as out:
+        async for record in run_bounded(iter_briefs(args.input, done), process, args.concurrency):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            processed += 1
+            failed += record["status"] != "ok"
+            if processed % args.progress_every == 0:
+                rate = processed / max(time.monotonic() - started, 1e-9)
+                logger.info(f"Processed {processed} briefs ({failed} failed, {rate:.2f}/s)")
+        os.fsync(out.fileno())
+
+    logger.info(f"Done: {processed} briefs processed, {failed} failed, {len(done)} skipped")
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the creative pipeline over a JSONL file of briefs")
+    parser.add_argument("input", help="Briefs JSONL file")
+    parser.add_argument("output", help="Results JSONL file (also used as the resume checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Briefs processed at the same time")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run briefs whose recorded result is an error")
+    parser.add_argument("--progress-every", type=int, default=100, help="Log progress every N briefs")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        sys.exit(asyncio.run(run(args)))
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted; re-run the same command to resume from {args.output}")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
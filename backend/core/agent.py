@@ -1,9 +1,9 @@
 import json
 import logging
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+from typing import Dict, Any, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import Runnable
 
 from backend.prompts.creative_prompts import (
     PRODUCT_ANALYSIS_PROMPT,
@@ -13,9 +13,50 @@ from backend.prompts.creative_prompts import (
     MARKETING_SUGGESTIONS_PROMPT,
     FULL_PIPELINE_PROMPT
 )
+from backend.core.cache import StepCache, make_cache_key
+from backend.core.compaction import ContextCompactor
+from backend.core.concurrency import AdaptiveConcurrencyLimiter, get_concurrency_limiter
+from backend.core.executor import run_dependency_graph
+from backend.core.llm import create_chat_model
+from backend.core.metrics import CONTEXT_TOKENS_SAVED, STEP_FALLBACKS
+from backend.core.rate_limit import RateLimiter, estimate_tokens, get_rate_limiter
+from backend.core.tracing import Span, get_tracer
 
 logger = logging.getLogger(__name__)
 
+# Step number -> steps whose output it consumes (steps 1 and 2 are independent)
+STEP_DEPENDENCIES = {
+    1: (),
+    2: (),
+    3: (1, 2),
+    4: (1, 2, 3),
+    5: (4,)
+}
+
+# Step number -> prompt variable -> fields of the earlier step output the
+# prompt uses (None forwards the whole output)
+STEP_INPUT_FIELDS = {
+    3: {
+        "product_analysis": ("product_name", "key_features", "unique_selling_point"),
+        "audience_analysis": ("demographic", "pain_points", "desires")
+    },
+    4: {
+        "product_analysis": ("product_name", "key_features", "unique_selling_point"),
+        "audience_analysis": ("demographic", "pain_points", "desires", "communication_style"),
+        "creative_ideas": None
+    },
+    5: {
+        "generated_content": ("generated_content", "key_messages")
+    },
+    6: {
+        "product_analysis": ("product_name", "product_category", "unique_selling_point"),
+        "audience_analysis": ("demographic", "desires", "communication_style"),
+        "creative_ideas": None,
+        "generated_content": ("generated_content", "key_messages"),
+        "marketing_suggestions": None
+    }
+}
+
 
 class CreativeAgent:
     """
@@ -30,17 +71,117 @@ class CreativeAgent:
     6. (Optional) Generate comprehensive final report with KSA cultural insights
     """
 
-    def __init__(self, model: str = "gpt-4", temperature: float = 0.7):
+    def __init__(
+        self,
+        model: str = "gpt-4",
+        temperature: float = 0.7,
+        cache: Optional[StepCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        compactor: Optional[ContextCompactor] = None
+    ):
         """
         Initialize the Creative Agent
 
         Args:
             model: LLM model to use (default: gpt-4)
             temperature: Creativity level 0-1 (default: 0.7)
+            cache: Optional step result cache; hits skip the LLM call
+            rate_limiter: RPM/TPM limiter in front of every LLM call (default: the process-wide one)
+            concurrency_limiter: Adaptive in-flight limit on LLM calls (default: the process-wide one)
+            compactor: Shrinks earlier step outputs in later prompts (default: configured from the environment)
         """
-        self.llm = ChatOpenAI(model=model, temperature=temperature)
+        self.model = model
+        self.temperature = temperature
+        self.cache = cache
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+        self.concurrency_limiter = (
+            concurrency_limiter if concurrency_limiter is not None else get_concurrency_limiter()
+        )
+        self.compactor = compactor if compactor is not None else ContextCompactor.from_env()
+        self.llm = create_chat_model(model, temperature)
         self.json_parser = JsonOutputParser()
 
+        # Prebuilt prompt | llm | parser chains, shared by every call of a step
+        self._chains: Dict[str, Runnable] = {}
+        for prompt_template in (
+            PRODUCT_ANALYSIS_PROMPT,
+            AUDIENCE_ANALYSIS_PROMPT,
+            CREATIVE_IDEATION_PROMPT,
+            CONTENT_GENERATION_PROMPT,
+            MARKETING_SUGGESTIONS_PROMPT,
+            FULL_PIPELINE_PROMPT
+        ):
+            self._get_chain(prompt_template)
+
+    def _get_chain(self, prompt_template: str) -> Runnable:
+        """
+        Return the JSON chain for a prompt template, building it on first use
+
+        Args:
+            prompt_template: The prompt template of the step
+
+        Returns:
+            The prompt | llm | json_parser runnable
+        """
+        chain = self._chains.get(prompt_template)
+        if chain is None:
+            chain = ChatPromptTemplate.from_template(prompt_template) | self.llm | self.json_parser
+            self._chains[prompt_template] = chain
+        return chain
+
+    def _invoke(self, prompt_template: str, input_vars: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a JSON step chain, serving repeated calls from the step cache
+
+        Args:
+            prompt_template: The prompt template of the step
+            input_vars: Variables to fill in the template
+
+        Returns:
+            Parsed JSON output of the step
+        """
+        key = None
+        if self.cache is not None:
+            key = make_cache_key(self.model, self.temperature, prompt_template, input_vars)
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info("Step cache hit, skipping LLM call")
+                return json.loads(cached)
+
+        self.rate_limiter.acquire_sync(self.rate_limiter.reserve_tokens(prompt_template, input_vars))
+        with self.concurrency_limiter.slot_sync():
+            result = self._get_chain(prompt_template).invoke(input_vars)
+        output = json.dumps(result, ensure_ascii=False)
+        self.rate_limiter.settle(estimate_tokens(output))
+        if key is not None:
+            self.cache.set(key, output)
+        return result
+
+    def _render_outputs(
+        self,
+        step: int,
+        outputs: Dict[str, Any],
+        stats: Optional[Dict[str, int]] = None
+    ) -> Dict[str, str]:
+        """
+        Serialize earlier step outputs for a step's prompt, compacted to the fields it uses
+
+        Args:
+            step: Number of the step about to run
+            outputs: Prompt variable -> JSON output of an earlier step
+            stats: Optional per-pipeline counters; context_tokens_saved is increased
+
+        Returns:
+            Prompt variable -> serialized output
+        """
+        rendered, saved = self.compactor.compact_json(step, outputs, STEP_INPUT_FIELDS.get(step, {}))
+        if saved:
+            CONTEXT_TOKENS_SAVED.inc(saved, step=step)
+        if stats is not None:
+            stats["context_tokens_saved"] = stats.get("context_tokens_saved", 0) + saved
+        return rendered
+
     def step_1_analyze_product(self, client_name: str, product_description: str) -> Dict[str, Any]:
         """
         Step 1: Analyze product and extract key information
@@ -54,12 +195,8 @@ class CreativeAgent:
         """
         logger.info(f"Step 1: Analyzing product for {client_name}")
 
-        prompt = ChatPromptTemplate.from_template(PRODUCT_ANALYSIS_PROMPT)
-
-        chain = prompt | self.llm | self.json_parser
-
         try:
-            result = chain.invoke({
+            result = self._invoke(PRODUCT_ANALYSIS_PROMPT, {
                 "client_name": client_name,
                 "product_description": product_description
             })
@@ -67,6 +204,7 @@ class CreativeAgent:
             return result
         except Exception as e:
             logger.error(f"Error in Step 1: {str(e)}")
+            STEP_FALLBACKS.inc(step=1)
             # Fallback response
             return {
                 "product_name": client_name,
@@ -88,14 +226,10 @@ class CreativeAgent:
         """
         logger.info("Step 2: Analyzing target audience")
 
-        prompt = ChatPromptTemplate.from_template(AUDIENCE_ANALYSIS_PROMPT)
-
-        chain = prompt | self.llm | self.json_parser
-
         tone_str = ", ".join(tone_of_voice)
 
         try:
-            result = chain.invoke({
+            result = self._invoke(AUDIENCE_ANALYSIS_PROMPT, {
                 "target_audience": target_audience,
                 "tone_of_voice": tone_str
             })
@@ -103,6 +237,7 @@ class CreativeAgent:
             return result
         except Exception as e:
             logger.error(f"Error in Step 2: {str(e)}")
+            STEP_FALLBACKS.inc(step=2)
             # Fallback response
             return {
                 "demographic": target_audience,
@@ -116,7 +251,8 @@ class CreativeAgent:
         self,
         product_analysis: Dict[str, Any],
         audience_analysis: Dict[str, Any],
-        tone_of_voice: list
+        tone_of_voice: list,
+        stats: Optional[Dict[str, int]] = None
     ) -> Dict[str, Any]:
         """
         Step 3: Generate creative ideas based on product and audience analysis
@@ -125,28 +261,28 @@ class CreativeAgent:
             product_analysis: Output from Step 1
             audience_analysis: Output from Step 2
             tone_of_voice: List of desired tones
+            stats: Optional per-pipeline counters (prompt tokens saved by compaction)
 
         Returns:
             Dictionary with creative ideas
         """
         logger.info("Step 3: Generating creative ideas")
 
-        prompt = ChatPromptTemplate.from_template(CREATIVE_IDEATION_PROMPT)
-
-        chain = prompt | self.llm | self.json_parser
-
         tone_str = ", ".join(tone_of_voice)
 
         try:
-            result = chain.invoke({
-                "product_analysis": json.dumps(product_analysis, ensure_ascii=False),
-                "audience_analysis": json.dumps(audience_analysis, ensure_ascii=False),
+            result = self._invoke(CREATIVE_IDEATION_PROMPT, {
+                **self._render_outputs(3, {
+                    "product_analysis": product_analysis,
+                    "audience_analysis": audience_analysis
+                }, stats),
                 "tone_of_voice": tone_str
             })
             logger.info("Step 3 completed successfully")
             return result
         except Exception as e:
             logger.error(f"Error in Step 3: {str(e)}")
+            STEP_FALLBACKS.inc(step=3)
             # Fallback response
             return {
                 "creative_ideas": [
@@ -173,7 +309,8 @@ class CreativeAgent:
         product_analysis: Dict[str, Any],
         audience_analysis: Dict[str, Any],
         creative_ideas: Dict[str, Any],
-        tone_of_voice: list
+        tone_of_voice: list,
+        stats: Optional[Dict[str, int]] = None
     ) -> Dict[str, Any]:
         """
         Step 4: Generate compelling marketing content
@@ -183,29 +320,29 @@ class CreativeAgent:
             audience_analysis: Output from Step 2
             creative_ideas: Output from Step 3
             tone_of_voice: List of desired tones
+            stats: Optional per-pipeline counters (prompt tokens saved by compaction)
 
         Returns:
             Dictionary with generated content
         """
         logger.info("Step 4: Generating marketing content")
 
-        prompt = ChatPromptTemplate.from_template(CONTENT_GENERATION_PROMPT)
-
-        chain = prompt | self.llm | self.json_parser
-
         tone_str = ", ".join(tone_of_voice)
 
         try:
-            result = chain.invoke({
-                "product_analysis": json.dumps(product_analysis, ensure_ascii=False),
-                "audience_analysis": json.dumps(audience_analysis, ensure_ascii=False),
-                "creative_ideas": json.dumps(creative_ideas, ensure_ascii=False),
+            result = self._invoke(CONTENT_GENERATION_PROMPT, {
+                **self._render_outputs(4, {
+                    "product_analysis": product_analysis,
+                    "audience_analysis": audience_analysis,
+                    "creative_ideas": creative_ideas
+                }, stats),
                 "tone_of_voice": tone_str
             })
             logger.info("Step 4 completed successfully")
             return result
         except Exception as e:
             logger.error(f"Error in Step 4: {str(e)}")
+            STEP_FALLBACKS.inc(step=4)
             # Fallback response
             return {
                 "generated_content": "محتوى تسويقي إبداعي يجمع بين الجودة والموثوقية",
@@ -217,7 +354,8 @@ class CreativeAgent:
         self,
         generated_content: Dict[str, Any],
         target_audience: str,
-        tone_of_voice: list
+        tone_of_voice: list,
+        stats: Optional[Dict[str, int]] = None
     ) -> Dict[str, Any]:
         """
         Step 5: Generate marketing suggestions and tactics
@@ -226,21 +364,18 @@ class CreativeAgent:
             generated_content: Output from Step 4
             target_audience: Description of target audience
             tone_of_voice: List of desired tones
+            stats: Optional per-pipeline counters (prompt tokens saved by compaction)
 
         Returns:
             Dictionary with marketing suggestions
         """
         logger.info("Step 5: Generating marketing suggestions")
 
-        prompt = ChatPromptTemplate.from_template(MARKETING_SUGGESTIONS_PROMPT)
-
-        chain = prompt | self.llm | self.json_parser
-
         tone_str = ", ".join(tone_of_voice)
 
         try:
-            result = chain.invoke({
-                "generated_content": json.dumps(generated_content, ensure_ascii=False),
+            result = self._invoke(MARKETING_SUGGESTIONS_PROMPT, {
+                **self._render_outputs(5, {"generated_content": generated_content}, stats),
                 "target_audience": target_audience,
                 "tone_of_voice": tone_str
             })
@@ -248,6 +383,7 @@ class CreativeAgent:
             return result
         except Exception as e:
             logger.error(f"Error in Step 5: {str(e)}")
+            STEP_FALLBACKS.inc(step=5)
             # Fallback response
             return {
                 "marketing_suggestions": [
@@ -277,7 +413,8 @@ class CreativeAgent:
         generated_content: Dict[str, Any],
         marketing_suggestions: Dict[str, Any],
         target_audience: str,
-        tone_of_voice: list
+        tone_of_voice: list,
+        stats: Optional[Dict[str, int]] = None
     ) -> Dict[str, Any]:
         """
         Step 6 (Optional): Generate comprehensive final report with KSA cultural insights
@@ -293,25 +430,24 @@ class CreativeAgent:
             marketing_suggestions: Output from Step 5
             target_audience: Description of target audience
             tone_of_voice: List of desired tones
+            stats: Optional per-pipeline counters (prompt tokens saved by compaction)
 
         Returns:
             Dictionary with comprehensive final report
         """
         logger.info("Step 6: Generating comprehensive final report")
 
-        prompt = ChatPromptTemplate.from_template(FULL_PIPELINE_PROMPT)
-
-        chain = prompt | self.llm | self.json_parser
-
         tone_str = ", ".join(tone_of_voice)
 
         try:
-            result = chain.invoke({
-                "product_analysis": json.dumps(product_analysis, ensure_ascii=False),
-                "audience_analysis": json.dumps(audience_analysis, ensure_ascii=False),
-                "creative_ideas": json.dumps(creative_ideas, ensure_ascii=False),
-                "generated_content": json.dumps(generated_content, ensure_ascii=False),
-                "marketing_suggestions": json.dumps(marketing_suggestions, ensure_ascii=False),
+            result = self._invoke(FULL_PIPELINE_PROMPT, {
+                **self._render_outputs(6, {
+                    "product_analysis": product_analysis,
+                    "audience_analysis": audience_analysis,
+                    "creative_ideas": creative_ideas,
+                    "generated_content": generated_content,
+                    "marketing_suggestions": marketing_suggestions
+                }, stats),
                 "target_audience": target_audience,
                 "tone_of_voice": tone_str
             })
@@ -319,6 +455,7 @@ class CreativeAgent:
             return result
         except Exception as e:
             logger.error(f"Error in Step 6: {str(e)}")
+            STEP_FALLBACKS.inc(step=6)
             # Fallback response
             return {
                 "executive_summary": "ملخص شامل يجمع كل المراحل السابقة",
@@ -341,7 +478,8 @@ class CreativeAgent:
         product_description: str,
         target_audience: str,
         tone_of_voice: list,
-        include_executive_report: bool = False
+        include_executive_report: bool = False,
+        trace: Optional[Span] = None
     ) -> Dict[str, Any]:
         """
         Run the complete multi-step creative generation pipeline
@@ -352,40 +490,38 @@ class CreativeAgent:
             target_audience: Description of target audience
             tone_of_voice: List of desired tones
             include_executive_report: If True, includes Step 6 comprehensive report (default: False)
+            trace: Parent span of the pipeline (default: start a new trace)
 
         Returns:
-            Final result with generated content and suggestions
+            Final result with generated content and suggestions, and the
+            estimated prompt tokens saved by compaction
         """
         logger.info(f"Starting creative agent pipeline for {client_name}")
+        span = (trace.child if trace is not None else get_tracer().start_span)("pipeline", client_name=client_name)
+        stats = {"context_tokens_saved": 0}
+
+        def traced_step(step: int, done: Dict[int, Any]) -> Any:
+            # Steps run on worker threads, so their spans get the parent explicitly
+            with span.child(f"step_{step}", step=step):
+                return step_functions[step](done)
 
         try:
-            # Step 1: Analyze Product
-            product_analysis = self.step_1_analyze_product(client_name, product_description)
-
-            # Step 2: Analyze Audience
-            audience_analysis = self.step_2_analyze_audience(target_audience, tone_of_voice)
-
-            # Step 3: Generate Ideas
-            creative_ideas = self.step_3_generate_ideas(
-                product_analysis,
-                audience_analysis,
-                tone_of_voice
-            )
-
-            # Step 4: Generate Content
-            generated_content = self.step_4_generate_content(
-                product_analysis,
-                audience_analysis,
-                creative_ideas,
-                tone_of_voice
-            )
-
-            # Step 5: Marketing Suggestions
-            marketing_suggestions = self.step_5_marketing_suggestions(
-                generated_content,
-                target_audience,
-                tone_of_voice
-            )
+            # Steps 1-5 run as soon as their inputs are ready, so the product
+            # and audience analyses (steps 1 and 2) run concurrently
+            step_functions = {
+                1: lambda done: self.step_1_analyze_product(client_name, product_description),
+                2: lambda done: self.step_2_analyze_audience(target_audience, tone_of_voice),
+                3: lambda done: self.step_3_generate_ideas(done[1], done[2], tone_of_voice, stats),
+                4: lambda done: self.step_4_generate_content(done[1], done[2], done[3], tone_of_voice, stats),
+                5: lambda done: self.step_5_marketing_suggestions(done[4], target_audience, tone_of_voice, stats)
+            }
+            results = run_dependency_graph(STEP_DEPENDENCIES, traced_step)
+
+            product_analysis = results[1]
+            audience_analysis = results[2]
+            creative_ideas = results[3]
+            generated_content = results[4]
+            marketing_suggestions = results[5]
 
             # Format final response
             suggestions_list = [
@@ -404,20 +540,26 @@ class CreativeAgent:
             # Step 6 (Optional): Generate comprehensive report
             if include_executive_report:
                 logger.info("Generating executive report...")
-                executive_report = self.step_6_full_pipeline_report(
-                    product_analysis,
-                    audience_analysis,
-                    creative_ideas,
-                    generated_content,
-                    marketing_suggestions,
-                    target_audience,
-                    tone_of_voice
-                )
+                with span.child("step_6", step=6):
+                    executive_report = self.step_6_full_pipeline_report(
+                        product_analysis,
+                        audience_analysis,
+                        creative_ideas,
+                        generated_content,
+                        marketing_suggestions,
+                        target_audience,
+                        tone_of_voice,
+                        stats
+                    )
                 final_result["executive_report"] = executive_report
 
+            final_result["context_tokens_saved"] = stats["context_tokens_saved"]
+            span.set_attribute("context_tokens_saved", stats["context_tokens_saved"])
             logger.info(f"Pipeline completed successfully for {client_name}")
+            span.end()
             return final_result
 
         except Exception as e:
             logger.error(f"Error in creative agent pipeline: {str(e)}")
+            span.end(e)
             raise
@@ -0,0 +1,89 @@
+"""
+Bounded-concurrency batch execution
+
+Runs an async worker over a (possibly very large or lazily produced) stream
+of items with a fixed number of workers and yields results as they finish.
+"""
+import asyncio
+import logging
+from typing import AsyncGenerator, AsyncIterable, Awaitable, Callable, Iterable, TypeVar, Union
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+async def run_bounded(
+    items: Union[Iterable[T], AsyncIterable[T]],
+    worker: Callable[[T], Awaitable[R]],
+    concurrency: int
+) -> AsyncGenerator[R, None]:
+    """
+    Run worker over items with at most concurrency calls in flight
+
+    Items are pulled lazily, so only about 2 x concurrency items are held in
+    memory at a time. The worker is expected to handle per-item errors
+    itself; an exception escaping it cancels the batch and is re-raised.
+
+    Args:
+        items: Items to process (sync or async iterable)
+        worker: Coroutine function processing one item
+        concurrency: Maximum number of concurrent worker calls
+
+    Yields:
+        Worker results in completion order
+    """
+    concurrency = max(1, concurrency)
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    pull_lock = asyncio.Lock()
+
+    if hasattr(items, "__aiter__"):
+        source = items.__aiter__()
+
+        async def next_item():
+            try:
+                return await source.__anext__()
+            except StopAsyncIteration:
+                return _DONE
+    else:
+        source = iter(items)
+
+        async def next_item():
+            return next(source, _DONE)
+
+    async def pool_worker():
+        while True:
+            # Async generators cannot be advanced by two tasks at once
+            async with pull_lock:
+                item = await next_item()
+            if item is _DONE:
+                return
+            await results.put((True, await worker(item)))
+
+    async def supervise():
+        workers = [asyncio.ensure_future(pool_worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+            await results.put((False, None))
+        except Exception as e:
+            await results.put((False, e))
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    supervisor = asyncio.ensure_future(supervise())
+    try:
+        while True:
+            is_result, payload = await results.get()
+            if not is_result:
+                if payload is not None:
+                    raise payload
+                break
+            yield payload
+    finally:
+        supervisor.cancel()
+        await asyncio.gather(supervisor, return_exceptions=True)
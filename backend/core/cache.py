@@ -0,0 +1,313 @@
+"""
+Step-level result cache
+
+Content-addressed cache for LLM step outputs, keyed on the model, temperature,
+prompt template and rendered inputs. Entries live in a bounded in-memory LRU
+tier backed by an optional SQLite tier on disk; both tiers expire entries
+after a TTL.
+
+Because a key only covers the inputs a step's own prompt is rendered from,
+the cache memoizes partial pipelines: e.g. the audience analysis is reused
+for every product sold to the same audience.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def hash_text(text: str) -> str:
+    """Return the hex SHA-256 digest of a text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=128)
+def _prompt_digest(prompt_template: str) -> str:
+    """Hash a prompt template once; templates are long-lived constants"""
+    return hash_text(prompt_template)
+
+
+def normalize_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """Collapse whitespace in text inputs so cosmetic differences share a key"""
+    return {
+        name: " ".join(value.split()) if isinstance(value, str) else value
+        for name, value in inputs.items()
+    }
+
+
+def make_cache_key(model: str, temperature: float, prompt_template: str, inputs: Dict[str, Any]) -> str:
+    """
+    Build a content-addressed key for a single LLM call
+
+    Args:
+        model: LLM model name
+        temperature: Sampling temperature
+        prompt_template: The prompt template the call renders
+        inputs: Variables the template is rendered with (whitespace-normalized)
+
+    Returns:
+        Hex digest identifying the call
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "temperature": temperature,
+            "prompt": _prompt_digest(prompt_template),
+            "inputs": normalize_inputs(inputs)
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hash_text(payload)
+
+
+class LRUCache:
+    """Bounded, thread-safe in-memory LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400):
+        """
+        Initialize the LRU tier
+
+        Args:
+            max_entries: Maximum number of entries kept before evicting the least recently used
+            ttl_seconds: Seconds an entry stays valid (0 disables expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires_at: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries if full"""
+        if expires_at is None:
+            expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """On-disk cache tier stored in a single SQLite table"""
+
+    def __init__(self, path: str, ttl_seconds: float = 86400):
+        """
+        Initialize the SQLite tier, creating the database if needed
+
+        Args:
+            path: Database file path
+            ttl_seconds: Seconds an entry stays valid (0 disables expiry)
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS step_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        """Return (expires_at, value) or None if missing or expired"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM step_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] and row[0] < time.time():
+                with self._conn:
+                    self._conn.execute("DELETE FROM step_cache WHERE key = ?", (key,))
+                return None
+            return row[0], row[1]
+
+    def set(self, key: str, value: str) -> float:
+        """Store a value and return its expiry timestamp"""
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else 0.0
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO step_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+        return expires_at
+
+    def purge_expired(self) -> int:
+        """Delete expired entries and return how many were removed"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM step_cache WHERE expires_at > 0 AND expires_at < ?", (time.time(),)
+            )
+            return cursor.rowcount
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same key
+
+    The first caller leads the computation; callers arriving while it is in
+    flight await the leader's result instead of calling the LLM again.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight"""
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.shared = 0
+
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        """Return the in-flight future for key on the running loop, if any"""
+        future = self._calls.get(key)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            return None
+        self.shared += 1
+        return future
+
+    def lead(self, key: str) -> asyncio.Future:
+        """Register the caller as leader for key and return its future"""
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        return future
+
+    def finish(self, key: str, future: asyncio.Future, value: Optional[str]) -> None:
+        """Publish the leader's result (None tells followers to compute it themselves)"""
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.done():
+            future.set_result(value)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class StepCache:
+    """
+    Two-tier step result cache
+
+    Lookups hit the in-memory LRU first and fall back to SQLite, promoting disk
+    hits into memory. Writes go to both tiers.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400, path: Optional[str] = None):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Size of the in-memory LRU tier
+            ttl_seconds: Seconds an entry stays valid (0 disables expiry)
+            path: SQLite database path for the disk tier (None keeps the cache in memory only)
+        """
+        self.memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.disk = SQLiteCache(path, ttl_seconds=ttl_seconds) if path else None
+        self.inflight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["StepCache"]:
+        """
+        Build the cache from STEP_CACHE_* environment variables
+
+        Returns:
+            The configured cache, or None if STEP_CACHE_ENABLED is not "true"
+        """
+        if os.getenv("STEP_CACHE_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            max_entries=int(os.getenv("STEP_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("STEP_CACHE_TTL_SECONDS", "86400")),
+            path=os.getenv("STEP_CACHE_PATH", ".cache/step_cache.sqlite3") or None
+        )
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key or None"""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                entry = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.error(f"Step cache read failed: {str(e)}")
+                entry = None
+            if entry is not None:
+                expires_at, value = entry
+                self.memory.set(key, value, expires_at=expires_at)
+        self._record(value is not None)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store value under key in both tiers"""
+        expires_at = None
+        if self.disk is not None:
+            try:
+                expires_at = self.disk.set(key, value)
+            except sqlite3.Error as e:
+                logger.error(f"Step cache write failed: {str(e)}")
+        self.memory.set(key, value, expires_at=expires_at)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Async get; the disk tier is read off the event loop"""
+        value = self.memory.get(key)
+        if value is not None:
+            self._record(True)
+            return value
+        if self.disk is None:
+            self._record(False)
+            return None
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """Async set; the disk tier is written off the event loop"""
+        if self.disk is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_inflight": self.inflight.shared,
+            "memory_entries": len(self.memory),
+            "disk_enabled": self.disk is not None
+        }
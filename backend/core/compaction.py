@@ -0,0 +1,259 @@
+"""
+Context compaction for downstream pipeline steps
+
+Later steps are prompted with the outputs of earlier ones, so without
+compaction prompt tokens (and prefill latency) grow with every step. Before
+a step is rendered, the upstream outputs it consumes are compacted:
+
+- markdown text is stripped of decoration (emphasis markers, heading hashes,
+  rules, blank lines); the wording is kept
+- JSON outputs (legacy agent) are projected onto the fields the step's
+  prompt actually uses and serialized without whitespace
+
+Both are lossless. Cutting content is opt-in: a step given a token budget
+(CONTEXT_BUDGETS) has its upstream outputs cut to it, the budget shared
+fairly between them. Markdown is cut at line boundaries; for JSON the budget
+is shared between fields, string values are cut and trailing list items
+dropped, so the result is always valid JSON.
+
+Inputs that come straight from the request are never changed.
+"""
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .rate_limit import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Marker appended to an input that was cut to fit the budget
+TRUNCATION_MARKER = "…"
+
+_EMPHASIS = re.compile(r"(\*\*|__|\*(?=\S)|(?<=\S)\*|`)")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s*")
+_RULE = re.compile(r"^\s*([-*_]\s*){3,}$")
+_SPACES = re.compile(r"[ \t]+")
+
+
+def parse_budgets(value: Optional[str]) -> Dict[int, int]:
+    """
+    Parse per-step budgets from "step=tokens" pairs
+
+    Args:
+        value: Comma separated pairs, e.g. "3=400,6=800"
+
+    Returns:
+        Step number -> token budget (malformed pairs are skipped)
+    """
+    budgets = {}
+    for pair in (value or "").split(","):
+        step, _, tokens = pair.partition("=")
+        if step.strip().isdigit() and tokens.strip().isdigit():
+            budgets[int(step)] = int(tokens)
+        elif pair.strip():
+            logger.warning(f"Ignoring malformed context budget {pair.strip()!r}")
+    return budgets
+
+
+def clean_markdown(text: str) -> str:
+    """Strip markdown decoration and redundant whitespace, keeping the wording"""
+    lines = []
+    for line in text.splitlines():
+        if _RULE.match(line):
+            continue
+        line = _SPACES.sub(" ", _EMPHASIS.sub("", _HEADING.sub("", line))).strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    Cut text to roughly budget tokens, preferring whole lines
+
+    Args:
+        text: Text to cut
+        budget: Maximum estimated tokens
+
+    Returns:
+        The text, or its leading lines (or characters) plus a truncation marker
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    max_chars = max(0, budget * CHARS_PER_TOKEN - len(TRUNCATION_MARKER))
+    cut = text[:max_chars]
+    # Drop the partial last line unless it is the only one
+    if "\n" in cut:
+        cut = cut[:cut.rindex("\n")]
+    return cut.rstrip() + TRUNCATION_MARKER
+
+
+def allocate_budget(sizes: List[int], budget: int) -> List[int]:
+    """
+    Split a token budget between inputs of the given sizes
+
+    Inputs smaller than an equal share keep their full size and the remainder
+    is shared by the larger ones (max-min fairness).
+
+    Args:
+        sizes: Estimated tokens of each input
+        budget: Total tokens available
+
+    Returns:
+        Token allowance of each input
+    """
+    allowances = [0] * len(sizes)
+    remaining = budget
+    pending = sorted(range(len(sizes)), key=lambda index: sizes[index])
+    while pending:
+        share = remaining // len(pending)
+        index = pending.pop(0)
+        allowances[index] = min(sizes[index], share)
+        remaining -= allowances[index]
+    return allowances
+
+
+def project_fields(value: Any, fields: Optional[Iterable[str]]) -> Any:
+    """Keep only the given top-level fields of a JSON object (None keeps all)"""
+    if fields is None or not isinstance(value, dict):
+        return value
+    return {field: value[field] for field in fields if field in value}
+
+
+def _dumps(value: Any) -> str:
+    """Serialize a JSON value without whitespace"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def shrink_json(value: Any, budget: int) -> Any:
+    """
+    Shrink a JSON value until it serializes to roughly budget tokens
+
+    Object fields share the budget (max-min fairness, see allocate_budget) and
+    are shrunk recursively, strings are cut with truncate_to_tokens and lists
+    keep their leading items. Numbers, booleans and null are kept as they are.
+
+    Args:
+        value: Parsed JSON value
+        budget: Maximum estimated tokens of the serialized value
+
+    Returns:
+        A value of the same shape that still serializes to valid JSON
+    """
+    if estimate_tokens(_dumps(value)) <= budget:
+        return value
+    if isinstance(value, str):
+        # One token goes to the quotes
+        return truncate_to_tokens(value, max(0, budget - 1))
+    if isinstance(value, list):
+        kept: List[Any] = []
+        for item in value:
+            if estimate_tokens(_dumps(kept + [item])) > budget:
+                if not kept:
+                    # Shrink a lone first item rather than dropping everything
+                    kept.append(shrink_json(item, budget - estimate_tokens(_dumps([None]))))
+                break
+            kept.append(item)
+        return kept
+    if isinstance(value, dict):
+        keys = list(value)
+        overhead = estimate_tokens(_dumps({key: None for key in keys}))
+        sizes = [estimate_tokens(_dumps(value[key])) for key in keys]
+        allowances = allocate_budget(sizes, max(0, budget - overhead))
+        return {key: shrink_json(value[key], allowance) for key, allowance in zip(keys, allowances)}
+    return value
+
+
+class ContextCompactor:
+    """Compacts upstream step outputs to per-step token budgets"""
+
+    def __init__(self, budgets: Optional[Dict[int, int]] = None, enabled: bool = True):
+        """
+        Initialize the compactor
+
+        Args:
+            budgets: Step number -> token budget for its upstream outputs
+                (default none: steps without a budget are only cleaned, not cut)
+            enabled: Compact at all; disabled, inputs are passed through verbatim
+        """
+        self.budgets = dict(budgets or {})
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls) -> "ContextCompactor":
+        """Build the compactor from CONTEXT_COMPACTION / CONTEXT_BUDGETS environment variables"""
+        return cls(
+            budgets=parse_budgets(os.getenv("CONTEXT_BUDGETS")),
+            enabled=os.getenv("CONTEXT_COMPACTION", "true").lower() == "true"
+        )
+
+    def _allowances(self, step: int, sizes: Dict[str, int]) -> Optional[Dict[str, int]]:
+        """Share the step's budget between inputs of the given sizes (None if they fit)"""
+        budget = self.budgets.get(step)
+        if budget is None or not sizes or sum(sizes.values()) <= budget:
+            return None
+        return dict(zip(sizes, allocate_budget(list(sizes.values()), budget)))
+
+    def _fit(self, step: int, texts: Dict[str, str]) -> Dict[str, str]:
+        """Cut texts to the step's budget, shared between them"""
+        allowances = self._allowances(step, {key: estimate_tokens(text) for key, text in texts.items()})
+        if allowances is None:
+            return texts
+        return {key: truncate_to_tokens(texts[key], allowances[key]) for key in texts}
+
+    def compact_text(
+        self,
+        step: int,
+        input_vars: Dict[str, Any],
+        upstream: Iterable[str]
+    ) -> Tuple[Dict[str, Any], int]:
+        """
+        Compact the markdown outputs of earlier steps in a step's prompt inputs
+
+        Args:
+            step: Number of the step about to run
+            input_vars: The step's prompt variables
+            upstream: Keys of input_vars that hold earlier step outputs
+
+        Returns:
+            (compacted prompt variables, estimated prompt tokens saved)
+        """
+        texts = {key: str(input_vars[key]) for key in upstream if key in input_vars}
+        if not self.enabled or not texts:
+            return input_vars, 0
+
+        compacted = self._fit(step, {key: clean_markdown(text) for key, text in texts.items()})
+        saved = sum(estimate_tokens(texts[key]) - estimate_tokens(compacted[key]) for key in texts)
+        return {**input_vars, **compacted}, max(0, saved)
+
+    def compact_json(
+        self,
+        step: int,
+        outputs: Dict[str, Any],
+        fields: Dict[str, Optional[Tuple[str, ...]]]
+    ) -> Tuple[Dict[str, str], int]:
+        """
+        Serialize the JSON outputs of earlier steps for a step's prompt
+
+        Args:
+            step: Number of the step about to run
+            outputs: Prompt variable -> parsed JSON output of an earlier step
+            fields: Prompt variable -> fields the prompt uses (None keeps all)
+
+        Returns:
+            (prompt variable -> serialized output, estimated prompt tokens saved)
+        """
+        verbatim = {key: json.dumps(value, ensure_ascii=False) for key, value in outputs.items()}
+        if not self.enabled:
+            return verbatim, 0
+
+        # Budget the parsed values, never the serialized text, so every output stays valid JSON
+        projected = {key: project_fields(value, fields.get(key)) for key, value in outputs.items()}
+        allowances = self._allowances(step, {key: estimate_tokens(_dumps(value)) for key, value in projected.items()})
+        if allowances is not None:
+            projected = {key: shrink_json(value, allowances[key]) for key, value in projected.items()}
+        compacted = {key: _dumps(value) for key, value in projected.items()}
+        saved = sum(estimate_tokens(verbatim[key]) - estimate_tokens(compacted[key]) for key in outputs)
+        return compacted, max(0, saved)
@@ -0,0 +1,255 @@
+"""
+Adaptive concurrency control for upstream LLM calls
+
+An AIMD (additive increase, multiplicative decrease) limiter on the number of
+LLM calls in flight. While calls succeed with a healthy time-to-first-token
+the limit grows by about one per "round" of calls; on a 429, a timeout or a
+first token much slower than the recent baseline it is cut multiplicatively,
+at most once per cooldown period. Calls beyond the current limit queue FIFO.
+
+The limiter is shared by async (event loop) and sync (thread) callers, so its
+state is protected by a threading lock and async waiters are woken through
+their loop.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Failures that mean the provider is overloaded (as opposed to e.g. a bad request)
+OVERLOAD_ERRORS = (openai.RateLimitError, openai.APITimeoutError, TimeoutError, asyncio.TimeoutError)
+
+
+class CallSlot:
+    """One admitted LLM call; report its first token with first_token()"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.ttft: Optional[float] = None
+
+    def first_token(self) -> None:
+        """Record the time to first token (later calls are ignored)"""
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.started
+
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def wake(self) -> None:
+        self.loop.call_soon_threadsafe(self._grant)
+
+    def _grant(self) -> None:
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class _SyncWaiter:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wake(self) -> None:
+        self.event.set()
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on concurrent LLM calls"""
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 2,
+        max_limit: int = 256,
+        backoff: float = 0.5,
+        latency_tolerance: float = 3.0,
+        ttft_threshold: float = 0.0,
+        cooldown_seconds: float = 2.0
+    ):
+        """
+        Initialize the limiter
+
+        Args:
+            initial_limit: Starting in-flight limit
+            min_limit: The limit never drops below this
+            max_limit: The limit never grows above this
+            backoff: Factor the limit is multiplied by on overload
+            latency_tolerance: A first token slower than this multiple of the
+                baseline counts as overload
+            ttft_threshold: Absolute time to first token (seconds) that counts
+                as overload (0 disables)
+            cooldown_seconds: Minimum seconds between two decreases
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.ttft_threshold = ttft_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+        self.in_flight = 0
+        self.baseline_ttft: Optional[float] = None
+        self.increases = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveConcurrencyLimiter":
+        """Build the limiter from LLM_CONCURRENCY_* environment variables"""
+        return cls(
+            initial_limit=int(os.getenv("LLM_CONCURRENCY_INITIAL", "16")),
+            min_limit=int(os.getenv("LLM_CONCURRENCY_MIN", "2")),
+            max_limit=int(os.getenv("LLM_CONCURRENCY_MAX", "256")),
+            latency_tolerance=float(os.getenv("LLM_LATENCY_TOLERANCE", "3.0")),
+            ttft_threshold=float(os.getenv("LLM_TTFT_THRESHOLD", "0"))
+        )
+
+    def _try_admit(self) -> bool:
+        """Take a slot if one is free and nobody is queued ahead (lock held)"""
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _wake_waiters(self) -> None:
+        """Hand free slots to queued callers in arrival order (lock held)"""
+        while self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            self._waiters.popleft().wake()
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+    def _record(self, slot: CallSlot, error: Optional[BaseException]) -> None:
+        """Adjust the limit from the outcome of a finished call"""
+        now = time.monotonic()
+        latency = slot.ttft if slot.ttft is not None else now - slot.started
+        with self._lock:
+            overloaded = isinstance(error, OVERLOAD_ERRORS)
+            if error is None:
+                if self.ttft_threshold > 0 and latency > self.ttft_threshold:
+                    overloaded = True
+                elif self.baseline_ttft is not None and latency > self.baseline_ttft * self.latency_tolerance:
+                    overloaded = True
+
+                # Slow moving baseline, so a lasting shift in provider latency is eventually accepted
+                if self.baseline_ttft is None:
+                    self.baseline_ttft = latency
+                else:
+                    self.baseline_ttft += 0.05 * (latency - self.baseline_ttft)
+
+            if overloaded:
+                if now - self._last_decrease >= self.cooldown_seconds:
+                    self._last_decrease = now
+                    self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                    self.decreases += 1
+                    logger.warning(f"LLM overload detected, concurrency limit lowered to {int(self.limit)}")
+            elif error is None and self.in_flight >= int(self.limit) - 1:
+                # Only grow a limit that is actually being used: +1 per limit calls
+                new_limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+                if int(new_limit) > int(self.limit):
+                    self.increases += 1
+                self.limit = new_limit
+                self._wake_waiters()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[CallSlot]:
+        """
+        Hold an in-flight slot for the duration of an async LLM call
+
+        Yields:
+            The call slot; call first_token() when the first token arrives
+        """
+        with self._lock:
+            admitted = self._try_admit()
+            waiter = None if admitted else _AsyncWaiter()
+            if waiter is not None:
+                self._waiters.append(waiter)
+
+        if waiter is not None:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                        raise
+                # The slot was granted concurrently with the cancellation
+                self._release()
+                raise
+
+        slot = CallSlot()
+        error = None
+        try:
+            yield slot
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if not isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+                self._record(slot, error)
+            self._release()
+
+    @contextmanager
+    def slot_sync(self) -> Iterator[CallSlot]:
+        """Blocking variant of slot for the legacy agent (core/agent.py), which runs its steps on threads"""
+        with self._lock:
+            admitted = self._try_admit()
+            waiter = None if admitted else _SyncWaiter()
+            if waiter is not None:
+                self._waiters.append(waiter)
+
+        if waiter is not None:
+            waiter.event.wait()
+
+        slot = CallSlot()
+        error = None
+        try:
+            yield slot
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if not isinstance(error, GeneratorExit):
+                self._record(slot, error)
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current limit and in-flight statistics"""
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "baseline_ttft_seconds": round(self.baseline_ttft, 3) if self.baseline_ttft is not None else None,
+            "increases": self.increases,
+            "decreases": self.decreases
+        }
+
+
+_shared_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_concurrency_limiter() -> AdaptiveConcurrencyLimiter:
+    """Return the process-wide concurrency limiter, creating it from the environment on first use"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = AdaptiveConcurrencyLimiter.from_env()
+        return _shared_limiter
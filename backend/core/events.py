@@ -0,0 +1,92 @@
+"""
+Numbered pipeline event logs
+
+An EventLog assigns consecutive sequence numbers to the events of one
+pipeline run and lets any number of subscribers replay it from a given
+sequence number and then follow it live.
+"""
+import asyncio
+import itertools
+from collections import deque
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+
+
+class ReplayWindowExceeded(Exception):
+    """Raised when a subscriber asks for events already dropped from a bounded log"""
+
+
+class EventLog:
+    """Append-only, numbered event log that live subscribers can follow"""
+
+    def __init__(self, maxlen: Optional[int] = None):
+        """
+        Initialize an empty log
+
+        Args:
+            maxlen: Keep only the last maxlen events (None keeps all of them)
+        """
+        self._events: deque = deque(maxlen=maxlen)
+        self._next_seq = 1
+        self._changed = asyncio.Event()
+        self.closed = False
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest event (0 if empty)"""
+        return self._next_seq - 1
+
+    def append(self, event: Dict[str, Any]) -> int:
+        """
+        Append an event and wake up subscribers
+
+        Args:
+            event: Pipeline event
+
+        Returns:
+            The sequence number assigned to the event
+        """
+        seq = self._next_seq
+        self._next_seq += 1
+        self._events.append((seq, event))
+        self._notify()
+        return seq
+
+    def close(self) -> None:
+        """Mark the run as finished; subscribers stop after the last event"""
+        self.closed = True
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self, after: int = 0) -> AsyncGenerator[Tuple[int, Dict[str, Any]], None]:
+        """
+        Replay events after a sequence number, then follow the log live
+
+        Args:
+            after: Last sequence number the subscriber already has
+
+        Yields:
+            (sequence number, event) tuples
+
+        Raises:
+            ReplayWindowExceeded: If events after `after` were already dropped,
+                or (bounded logs only) a slow subscriber fell further behind than
+                maxlen events; unbounded logs never raise
+        """
+        while True:
+            changed = self._changed
+            if self._events:
+                first_seq = self._events[0][0]
+                if after + 1 < first_seq:
+                    raise ReplayWindowExceeded(
+                        f"Events {after + 1}-{first_seq - 1} are no longer buffered"
+                    )
+                start = max(after + 1 - first_seq, 0)
+                for seq, event in list(itertools.islice(self._events, start, None)):
+                    yield seq, event
+                    after = seq
+            if self.closed and after >= self.last_seq:
+                return
+            await changed.wait()
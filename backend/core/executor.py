@@ -0,0 +1,137 @@
+"""
+Dependency-aware step execution
+
+Starts every pipeline step as soon as the steps it depends on have completed,
+so independent steps (e.g. product and audience analysis) run concurrently
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Hashable, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_ITEM = "item"
+_DONE = "done"
+_FAILED = "failed"
+
+
+def _ready_nodes(remaining: Dict[Hashable, Set[Hashable]], completed: Iterable[Hashable]) -> list:
+    """Return the nodes whose dependencies have all completed"""
+    completed = set(completed)
+    return [node for node, deps in remaining.items() if deps <= completed]
+
+
+def _validate(dependencies: Dict[Hashable, Iterable[Hashable]]) -> Dict[Hashable, Set[Hashable]]:
+    """Copy the dependency mapping and reject references to unknown nodes"""
+    remaining = {node: set(deps) for node, deps in dependencies.items()}
+    for node, deps in remaining.items():
+        unknown = deps - remaining.keys()
+        if unknown:
+            raise ValueError(f"Node {node!r} depends on unknown nodes: {sorted(map(str, unknown))}")
+    return remaining
+
+
+def run_dependency_graph(
+    dependencies: Dict[Hashable, Iterable[Hashable]],
+    run_node: Callable[[Hashable, Dict[Hashable, Any]], Any],
+    max_workers: Optional[int] = None
+) -> Dict[Hashable, Any]:
+    """
+    Run blocking nodes on a thread pool in dependency order
+
+    Args:
+        dependencies: Mapping of node -> nodes it depends on
+        run_node: Called as run_node(node, results) once the node's dependencies
+            are done, where results holds the outputs of all completed nodes
+        max_workers: Thread pool size (default: number of nodes)
+
+    Returns:
+        Mapping of node -> value returned by run_node
+
+    Raises:
+        ValueError: If the graph references unknown nodes or contains a cycle
+    """
+    remaining = _validate(dependencies)
+    results: Dict[Hashable, Any] = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(remaining), 1)) as pool:
+        running = {}
+        try:
+            while remaining or running:
+                for node in _ready_nodes(remaining, results):
+                    del remaining[node]
+                    running[pool.submit(run_node, node, dict(results))] = node
+
+                if not running:
+                    raise ValueError(f"Dependency cycle between nodes: {sorted(map(str, remaining))}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        finally:
+            for future in running:
+                future.cancel()
+
+    return results
+
+
+async def stream_dependency_graph(
+    dependencies: Dict[Hashable, Iterable[Hashable]],
+    run_node: Callable[[Hashable], AsyncIterator[Any]]
+) -> AsyncGenerator[Any, None]:
+    """
+    Run streaming nodes concurrently in dependency order and interleave their items
+
+    A node counts as completed once its stream is exhausted. Items from nodes
+    running at the same time are yielded in the order they are produced.
+
+    Args:
+        dependencies: Mapping of node -> nodes it depends on
+        run_node: Returns the async stream of items for a node
+
+    Yields:
+        Items from all node streams as they arrive
+
+    Raises:
+        ValueError: If the graph references unknown nodes or contains a cycle
+    """
+    remaining = _validate(dependencies)
+    completed: Set[Hashable] = set()
+    queue: asyncio.Queue = asyncio.Queue()
+    tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def drive(node: Hashable) -> None:
+        try:
+            async for item in run_node(node):
+                await queue.put((node, _ITEM, item))
+            await queue.put((node, _DONE, None))
+        except Exception as e:
+            await queue.put((node, _FAILED, e))
+
+    def start_ready() -> None:
+        for node in _ready_nodes(remaining, completed):
+            del remaining[node]
+            tasks[node] = asyncio.ensure_future(drive(node))
+        if remaining and not tasks:
+            raise ValueError(f"Dependency cycle between nodes: {sorted(map(str, remaining))}")
+
+    try:
+        start_ready()
+        while tasks:
+            node, kind, payload = await queue.get()
+            if kind == _ITEM:
+                yield payload
+            elif kind == _DONE:
+                tasks.pop(node)
+                completed.add(node)
+                start_ready()
+            else:
+                tasks.pop(node)
+                raise payload
+    finally:
+        # Abort sibling nodes still in flight (error or consumer went away)
+        for task in tasks.values():
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
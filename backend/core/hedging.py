@@ -0,0 +1,213 @@
+"""
+Hedged LLM streams
+
+If a stream has not produced its first item within a high percentile of the
+recently observed time to first token (TTFT), a duplicate request is started.
+Whichever stream produces an item first is kept and the other one is
+cancelled, so a single stuck upstream request no longer dominates the tail
+latency of a whole pipeline. Only the wait for the first item is hedged; once
+a stream has started it is never duplicated.
+
+The hedge clock starts when the request is admitted upstream, not when it is
+queued: the TTFT samples are measured from admission, and time spent waiting
+on the local rate and concurrency limiters says nothing about a slow
+upstream. Hedging a call that is only queued would add load exactly when the
+limiters are saturated.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Sliding window of latency samples with percentile lookups"""
+
+    def __init__(self, window: int = 500):
+        """
+        Initialize an empty tracker
+
+        Args:
+            window: Number of latest samples kept
+        """
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        """Record a latency sample"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th percentile (0-100) of the window, or None if empty"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(p / 100 * len(samples))) - 1))
+        return samples[index]
+
+
+class Hedger:
+    """Starts a backup stream when the first item of a stream is late"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        percentile: float = 95.0,
+        min_delay: float = 1.0,
+        min_samples: int = 20
+    ):
+        """
+        Initialize the hedger
+
+        Args:
+            enabled: Hedge at all (every hedge is an extra, billed LLM call)
+            percentile: TTFT percentile after which a backup request is started
+            min_delay: Never hedge earlier than this many seconds
+            min_samples: TTFT samples needed before hedging starts
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.ttft = LatencyTracker()
+
+        self.streams = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Hedger":
+        """Build the hedger from HEDGE_* environment variables"""
+        return cls(
+            enabled=os.getenv("HEDGE_ENABLED", "false").lower() == "true",
+            percentile=float(os.getenv("HEDGE_PERCENTILE", "95")),
+            min_delay=float(os.getenv("HEDGE_MIN_DELAY", "1.0")),
+            min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a first item before hedging, or None to not hedge"""
+        if not self.enabled or len(self.ttft) < self.min_samples:
+            return None
+        return max(self.min_delay, self.ttft.percentile(self.percentile))
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    async def stream(self, start: Callable[[Callable[[], None]], AsyncIterator[Any]]) -> AsyncGenerator[Any, None]:
+        """
+        Stream from start(), hedging the first item with a second start()
+
+        Args:
+            start: Starts one upstream request and returns its stream; it is
+                passed a callback to invoke once the request has been admitted
+                past the local limiters (the hedge delay counts from there)
+
+        Yields:
+            The items of the winning stream
+
+        Raises:
+            Exception: The error of the primary stream if every attempt failed
+        """
+        self._count("streams")
+        delay = self.hedge_delay()
+        admitted = asyncio.Event()
+        primary = start(admitted.set)
+        if delay is None:
+            try:
+                async for item in primary:
+                    yield item
+            finally:
+                await primary.aclose()
+            return
+
+        attempts: List[AsyncIterator[Any]] = [primary]
+        firsts: Dict[asyncio.Task, AsyncIterator[Any]] = {
+            asyncio.ensure_future(primary.__anext__()): primary
+        }
+        winner = None
+        first_task = None
+        errors: List[BaseException] = []
+        admission = asyncio.ensure_future(admitted.wait())
+        try:
+            # Wait for admission (or an early first item), then for the hedge delay
+            done, _ = await asyncio.wait([*firsts, admission], return_when=asyncio.FIRST_COMPLETED)
+            if admission in done and not any(task in done for task in firsts):
+                done, _ = await asyncio.wait(firsts, timeout=delay)
+            if not done:
+                logger.info(f"No first token {delay:.2f}s after admission, starting a hedged request")
+                self._count("hedges")
+                backup = start(lambda: None)
+                attempts.append(backup)
+                firsts[asyncio.ensure_future(backup.__anext__())] = backup
+
+            while firsts:
+                done, _ = await asyncio.wait(firsts, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    attempt = firsts.pop(task)
+                    if task.exception() is None or isinstance(task.exception(), StopAsyncIteration):
+                        winner, first_task = attempt, task
+                        break
+                    errors.append(task.exception())
+                if winner is not None:
+                    break
+        finally:
+            # Cancel and close the losing (or, on error/cancellation, every) attempt
+            admission.cancel()
+            for task in firsts:
+                task.cancel()
+            if firsts:
+                await asyncio.gather(*firsts, return_exceptions=True)
+            for attempt in attempts:
+                if attempt is not winner:
+                    await attempt.aclose()
+
+        if winner is None:
+            raise errors[0]
+        if winner is not primary:
+            self._count("hedge_wins")
+
+        try:
+            if isinstance(first_task.exception(), StopAsyncIteration):
+                return
+            yield first_task.result()
+            async for item in winner:
+                yield item
+        finally:
+            await winner.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hedging configuration and counters"""
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "delay_seconds": self.hedge_delay(),
+            "ttft_samples": len(self.ttft),
+            "streams": self.streams,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins
+        }
+
+
+_shared_hedger: Optional[Hedger] = None
+_shared_hedger_lock = threading.Lock()
+
+
+def get_hedger() -> Hedger:
+    """Return the process-wide hedger, creating it from the environment on first use"""
+    global _shared_hedger
+    with _shared_hedger_lock:
+        if _shared_hedger is None:
+            _shared_hedger = Hedger.from_env()
+        return _shared_hedger
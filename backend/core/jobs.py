@@ -0,0 +1,296 @@
+"""
+Asynchronous generation jobs
+
+Jobs decouple a pipeline run from the HTTP connection that requested it.
+They run on a bounded local worker pool, every event is persisted to SQLite
+at each step boundary, and clients can (re)connect at any time to stream the
+job from any sequence number. Finished jobs are replayed from the store
+without any new LLM calls.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from .events import EventLog
+from .streaming import coalesce_events
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_INTERRUPTED = "interrupted"
+
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED, JOB_INTERRUPTED)
+
+
+class JobStore:
+    """SQLite persistence for jobs and their numbered events"""
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the job database
+
+        Jobs left queued or running by a previous process are marked interrupted.
+
+        Args:
+            path: Database file path
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " request TEXT NOT NULL,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                " job_id TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " event TEXT NOT NULL,"
+                " PRIMARY KEY (job_id, seq))"
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)",
+                (JOB_INTERRUPTED, "Server restarted before the job finished", time.time(), JOB_QUEUED, JOB_RUNNING)
+            )
+
+    def create_job(self, job_id: str, request: Dict[str, Any]) -> None:
+        """Insert a new queued job"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, request, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, json.dumps(request, ensure_ascii=False), now, now)
+            )
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        """Update a job's status"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def append_events(self, job_id: str, events: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """Persist numbered events of a job"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO job_events (job_id, seq, event) VALUES (?, ?, ?)",
+                [(job_id, seq, json.dumps(event, ensure_ascii=False)) for seq, event in events]
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job row as a dictionary, or None if unknown"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, request, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "request": json.loads(row[2]),
+            "error": row[3],
+            "created_at": row[4],
+            "updated_at": row[5]
+        }
+
+    def get_status(self, job_id: str) -> Optional[str]:
+        """Return the job's status, or None if unknown (reads only the status column)"""
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def get_events(self, job_id: str, after: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        """Return the persisted events of a job after a sequence number"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after)
+            ).fetchall()
+        return [(seq, json.loads(event)) for seq, event in rows]
+
+
+class JobManager:
+    """Runs pipeline jobs on a bounded worker pool and serves their event streams"""
+
+    def __init__(
+        self,
+        agent,
+        store: JobStore,
+        concurrency: int = 4,
+        coalesce_delay: float = 0.05,
+        coalesce_chars: int = 256
+    ):
+        """
+        Initialize the job manager
+
+        Args:
+            agent: CreativeAgent used to run the pipelines
+            store: Job persistence
+            concurrency: Maximum jobs running at the same time
+            coalesce_delay: Token coalescing delay in seconds (see coalesce_events)
+            coalesce_chars: Token coalescing size bound in characters
+        """
+        self.agent = agent
+        self.store = store
+        self.concurrency = concurrency
+        self.coalesce_delay = coalesce_delay
+        self.coalesce_chars = coalesce_chars
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._live: Dict[str, EventLog] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, request: Dict[str, Any]) -> str:
+        """
+        Queue a new job (the job row is written off the event loop)
+
+        Args:
+            request: CreativeAgentRequest fields
+
+        Returns:
+            The new job id
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.store.create_job, job_id, request)
+        self._live[job_id] = EventLog()
+        self._tasks[job_id] = asyncio.ensure_future(self._run(job_id, request))
+        logger.info(f"Queued job {job_id} for {request.get('client_name')}")
+        return job_id
+
+    async def _run(self, job_id: str, request: Dict[str, Any]) -> None:
+        """Run one job, persisting its events at every step boundary"""
+        log = self._live[job_id]
+        unsaved: List[Tuple[int, Dict[str, Any]]] = []
+
+        async def flush():
+            if unsaved:
+                batch = list(unsaved)
+                unsaved.clear()
+                await asyncio.to_thread(self.store.append_events, job_id, batch)
+
+        try:
+            async with self._slots:
+                await asyncio.to_thread(self.store.set_status, job_id, JOB_RUNNING)
+                events = coalesce_events(
+                    self.agent.arun_full_pipeline_streaming(
+                        client_name=request["client_name"],
+                        product_description=request["product_description"],
+                        target_audience=request["target_audience"],
+                        tone_of_voice=request["tone_of_voice"],
+                        use_cache=not request.get("no_cache", False)
+                    ),
+                    max_delay=self.coalesce_delay,
+                    max_chars=self.coalesce_chars
+                )
+                try:
+                    async for event in events:
+                        unsaved.append((log.append(event), event))
+                        if event["type"] != "step_stream":
+                            await flush()
+                finally:
+                    await events.aclose()
+
+            await flush()
+            await asyncio.to_thread(self.store.set_status, job_id, JOB_COMPLETED)
+            logger.info(f"Job {job_id} completed")
+        except Exception as e:
+            logger.error(f"Error in job {job_id}: {str(e)}")
+            await flush()
+            await asyncio.to_thread(self.store.set_status, job_id, JOB_FAILED, str(e))
+        finally:
+            log.close()
+            self._live.pop(job_id, None)
+            self._tasks.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return job status and the step outputs produced so far
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            Job details, or None if the job is unknown
+        """
+        job = self.store.get_job(job_id)
+        if job is None:
+            return None
+
+        steps: Dict[int, str] = {}
+        final_content = None
+        last_seq = 0
+        for seq, event in self.store.get_events(job_id):
+            last_seq = seq
+            if event["type"] == "step_complete":
+                steps[event["step"]] = event["data"]
+            elif event["type"] == "complete":
+                final_content = event["final_content"]
+
+        log = self._live.get(job_id)
+        job.update({
+            "steps": steps,
+            "final_content": final_content,
+            "last_event_id": log.last_seq if log is not None else last_seq
+        })
+        return job
+
+    async def aget(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Async get; the store is read and its events parsed off the event loop"""
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def astatus(self, job_id: str) -> Optional[str]:
+        """
+        Return a job's status without loading its events
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            The job status, or None if the job is unknown
+        """
+        return await asyncio.to_thread(self.store.get_status, job_id)
+
+    async def stream(self, job_id: str, after: int = 0) -> AsyncGenerator[Tuple[int, Dict[str, Any]], None]:
+        """
+        Stream a job's numbered events after a sequence number
+
+        Running jobs are followed live; finished jobs are replayed from the store.
+
+        Args:
+            job_id: Job id
+            after: Last sequence number the client already has
+
+        Yields:
+            (sequence number, event) tuples
+        """
+        log = self._live.get(job_id)
+        if log is not None:
+            async for item in log.subscribe(after):
+                yield item
+            return
+
+        for item in await asyncio.to_thread(self.store.get_events, job_id, after):
+            yield item
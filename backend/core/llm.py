@@ -0,0 +1,220 @@
+"""
+Shared LLM clients
+
+Every ChatOpenAI instance in the process talks to the API through one pair of
+OpenAI SDK clients backed by one pooled httpx transport, so warm keep-alive
+connections (and their TLS sessions) are reused by all agents, steps and
+requests instead of each LLM object opening its own pool. HTTP/2 is used when
+the h2 package is installed, multiplexing concurrent streams over a few
+connections. It also matters for reuse: the SDK closes a streamed response
+right after "[DONE]", which over HTTP/1.1 discards the connection while over
+HTTP/2 it only resets the stream.
+
+httpx async connections are bound to the event loop that opened them, so the
+async side keeps one transport per running loop (the API loop, the CLI loop
+and the private loop of the sync streaming bridge never share sockets).
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Dict, List, Optional
+
+import httpx
+import openai
+from langchain_openai import ChatOpenAI
+
+from .tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+
+def _pool_connections(transport: Any) -> List[Any]:
+    """Return the connections of an httpx transport's connection pool"""
+    pool = getattr(transport, "_pool", None)
+    return list(getattr(pool, "connections", None) or [])
+
+
+class _LoopLocalTransport(httpx.AsyncBaseTransport):
+    """Async transport that keeps a separate connection pool per event loop"""
+
+    def __init__(self, **transport_kwargs: Any):
+        self._transport_kwargs = transport_kwargs
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def transports(self) -> List[httpx.AsyncHTTPTransport]:
+        """Transports of all loops still alive"""
+        return list(self._transports.values())
+
+    def _current(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(**self._transport_kwargs)
+            self._transports[loop] = transport
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        span = current_span()
+        if span is not None:
+            # httpcore reports connect/TLS/response header milestones to this callback
+            request.extensions["trace"] = span.http_trace
+        return await self._current().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+class LLMHTTPPool:
+    """Pooled, keep-alive HTTP clients shared by all LLM objects"""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 120.0,
+        connect_timeout: float = 10.0,
+        http2: bool = True,
+        max_retries: int = 2
+    ):
+        """
+        Initialize the pool (clients are created on first use)
+
+        Args:
+            max_connections: Maximum open connections per client
+            max_keepalive_connections: Idle connections kept warm for reuse
+            keepalive_expiry: Seconds an idle connection is kept open
+            timeout: Read/write/pool timeout in seconds
+            connect_timeout: Connect (TCP + TLS) timeout in seconds
+            http2: Use HTTP/2 if the h2 package is installed
+            max_retries: SDK retries of failed calls (429s, timeouts, 5xx)
+        """
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._openai: Optional[openai.OpenAI] = None
+        self._async_openai: Optional[openai.AsyncOpenAI] = None
+        self._sync_transport: Optional[httpx.HTTPTransport] = None
+        self._async_transport: Optional[_LoopLocalTransport] = None
+
+    @classmethod
+    def from_env(cls) -> "LLMHTTPPool":
+        """Build the pool from OPENAI_* environment variables"""
+        return cls(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+            timeout=float(os.getenv("OPENAI_TIMEOUT", "120")),
+            connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10")),
+            http2=os.getenv("OPENAI_HTTP2", "true").lower() == "true",
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+        )
+
+    def _ensure_clients(self) -> None:
+        with self._lock:
+            if self._openai is not None:
+                return
+            self._sync_transport = httpx.HTTPTransport(limits=self.limits, http2=self.http2)
+            self._async_transport = _LoopLocalTransport(limits=self.limits, http2=self.http2)
+            self._openai = openai.OpenAI(
+                http_client=httpx.Client(transport=self._sync_transport, timeout=self.timeout),
+                max_retries=self.max_retries
+            )
+            self._async_openai = openai.AsyncOpenAI(
+                http_client=httpx.AsyncClient(transport=self._async_transport, timeout=self.timeout),
+                max_retries=self.max_retries
+            )
+
+    @property
+    def openai_client(self) -> openai.OpenAI:
+        """Shared synchronous OpenAI SDK client"""
+        self._ensure_clients()
+        return self._openai
+
+    @property
+    def async_openai_client(self) -> openai.AsyncOpenAI:
+        """Shared asynchronous OpenAI SDK client"""
+        self._ensure_clients()
+        return self._async_openai
+
+    def stats(self) -> Dict[str, Any]:
+        """Return connection pool occupancy"""
+        connections = []
+        if self._sync_transport is not None:
+            connections.extend(_pool_connections(self._sync_transport))
+        if self._async_transport is not None:
+            for transport in self._async_transport.transports:
+                connections.extend(_pool_connections(transport))
+
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "open_connections": len(connections),
+            "active_connections": len(connections) - idle,
+            "idle_connections": idle
+        }
+
+    def close(self) -> None:
+        """Close the synchronous client (the async side is closed per loop with aclose)"""
+        if self._openai is not None:
+            self._openai.close()
+
+    async def aclose(self) -> None:
+        """Close the connections opened on the current event loop"""
+        if self._async_transport is not None:
+            await self._async_transport.aclose()
+
+
+_shared_pool: Optional[LLMHTTPPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> LLMHTTPPool:
+    """Return the process-wide LLM HTTP pool, creating it from the environment on first use"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = LLMHTTPPool.from_env()
+        return _shared_pool
+
+
+def create_chat_model(model: str, temperature: float, **kwargs: Any) -> ChatOpenAI:
+    """
+    Create a ChatOpenAI that uses the shared HTTP pool
+
+    Args:
+        model: LLM model to use
+        temperature: Sampling temperature
+        **kwargs: Extra ChatOpenAI arguments (e.g. streaming=True)
+
+    Returns:
+        The chat model
+    """
+    pool = get_http_pool()
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        client=pool.openai_client.chat.completions,
+        async_client=pool.async_openai_client.chat.completions,
+        **kwargs
+    )
@@ -0,0 +1,351 @@
+"""
+In-process service metrics
+
+Lightweight, thread-safe counters, gauges and histograms shared by the API
+and the agents, rendered in the Prometheus text exposition format
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+# Default latency buckets in seconds (LLM calls range from ~100 ms to minutes)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 60, 120)
+
+
+def _label_set(labels: Dict[str, object]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class of registered metrics"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, description: str):
+        """
+        Initialize and register the metric
+
+        Args:
+            name: Metric name
+            description: Human readable description of what is measured
+        """
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def samples(self) -> List[Tuple[str, LabelSet, float]]:
+        """Return (sample name, labels, value) tuples for exposition"""
+        raise NotImplementedError
+
+
+class Registry:
+    """Set of metrics exposed together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> None:
+        """Add a metric; names must be unique"""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.error(f"Error collecting metric {metric.name}: {str(e)}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter(Metric):
+    """Monotonically increasing, thread-safe counter"""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._values: Dict[LabelSet, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        """Increase the counter (of the given label values) by amount"""
+        key = _label_set(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    @property
+    def value(self) -> float:
+        """Current counter value, summed over all label values"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def samples(self) -> List[Tuple[str, LabelSet, float]]:
+        with self._lock:
+            values = dict(self._values) or {(): 0}
+        return [(self.name, labels, value) for labels, value in values.items()]
+
+
+class Gauge(Metric):
+    """Value that can go up and down, or is read from a callback at scrape time"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, function: Optional[Callable[[], float]] = None):
+        """
+        Initialize the gauge
+
+        Args:
+            name: Metric name
+            description: Human readable description of what is measured
+            function: Optional callback returning the current value when scraped
+        """
+        super().__init__(name, description)
+        self.function = function
+        self._values: Dict[LabelSet, float] = {}
+
+    def set(self, value: float, **labels: object) -> None:
+        """Set the gauge (of the given label values)"""
+        with self._lock:
+            self._values[_label_set(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        """Increase the gauge by amount"""
+        key = _label_set(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: object) -> None:
+        """Decrease the gauge by amount"""
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Tuple[str, LabelSet, float]]:
+        if self.function is not None:
+            return [(self.name, (), float(self.function()))]
+        with self._lock:
+            values = dict(self._values) or {(): 0}
+        return [(self.name, labels, value) for labels, value in values.items()]
+
+
+class Histogram(Metric):
+    """Cumulative histogram with fixed buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Initialize the histogram
+
+        Args:
+            name: Metric name
+            description: Human readable description of what is measured
+            buckets: Upper bounds of the buckets (+Inf is added)
+        """
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelSet, List[float]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        """Record an observation (of the given label values)"""
+        key = _label_set(labels)
+        with self._lock:
+            # Per series: one count per bucket, then sum and count
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[Tuple[str, LabelSet, float]]:
+        with self._lock:
+            all_series = {labels: list(series) for labels, series in self._series.items()}
+
+        samples = []
+        for labels, series in all_series.items():
+            cumulative = 0.0
+            for index, bound in enumerate(self.buckets):
+                cumulative += series[index]
+                samples.append((f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", labels, series[-2]))
+            samples.append((f"{self.name}_count", labels, series[-1]))
+        return samples
+
+
+def render_metrics() -> str:
+    """Render all registered metrics in the Prometheus text format"""
+    return REGISTRY.render()
+
+
+PIPELINES_ABORTED = Counter(
+    "creative_pipelines_aborted_total",
+    "Streaming pipelines aborted because the client disconnected"
+)
+
+STEP_TTFT = Histogram(
+    "creative_step_ttft_seconds",
+    "Time from step start to its first output chunk"
+)
+
+STEP_DURATION = Histogram(
+    "creative_step_duration_seconds",
+    "Total duration of a pipeline step"
+)
+
+STEP_TOKENS_PER_SECOND = Histogram(
+    "creative_step_output_tokens_per_second",
+    "Estimated output tokens per second of a step after its first chunk",
+    buckets=(5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500)
+)
+
+STEP_ERRORS = Counter(
+    "creative_step_errors_total",
+    "Pipeline steps that failed"
+)
+
+STEP_FALLBACKS = Counter(
+    "creative_step_fallbacks_total",
+    "Pipeline steps that returned their canned fallback output after an error"
+)
+
+CONTEXT_TOKENS_SAVED = Counter(
+    "creative_context_tokens_saved_total",
+    "Estimated prompt tokens saved by compacting earlier step outputs"
+)
+
+ACTIVE_STREAMS = Gauge(
+    "creative_active_streams",
+    "Open streaming (SSE) connections"
+)
+
+EVENT_LOOP_LAG = Histogram(
+    "creative_event_loop_lag_seconds",
+    "Delay of event loop callbacks beyond their scheduled time",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+
+class InstrumentedThreadPool(ThreadPoolExecutor):
+    """Thread pool executor that counts its busy workers"""
+
+    def __init__(self, max_workers: Optional[int] = None, thread_name_prefix: str = ""):
+        """
+        Initialize the pool
+
+        Args:
+            max_workers: Worker thread limit (default: the ThreadPoolExecutor default)
+            thread_name_prefix: Prefix of the worker thread names
+        """
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        super().__init__(self.max_workers, thread_name_prefix)
+        self.busy = 0
+        self._busy_lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        def run():
+            with self._busy_lock:
+                self.busy += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._busy_lock:
+                    self.busy -= 1
+
+        return super().submit(run)
+
+
+_default_executor: Optional[InstrumentedThreadPool] = None
+
+
+def install_default_executor(loop: Optional[asyncio.AbstractEventLoop] = None) -> InstrumentedThreadPool:
+    """
+    Make an instrumented pool the default executor of the event loop
+
+    asyncio.to_thread (SQLite job store, disk cache tier) runs on the loop's
+    default executor, so this is the pool the threadpool gauges report.
+
+    Args:
+        loop: Event loop to configure (default: the running loop)
+
+    Returns:
+        The installed pool
+    """
+    global _default_executor
+    _default_executor = InstrumentedThreadPool(thread_name_prefix="blocking")
+    (loop or asyncio.get_running_loop()).set_default_executor(_default_executor)
+    return _default_executor
+
+
+THREADPOOL_BUSY = Gauge(
+    "creative_threadpool_busy_threads",
+    "Worker threads of the event loop's default executor running blocking calls",
+    function=lambda: _default_executor.busy if _default_executor is not None else 0
+)
+
+THREADPOOL_SIZE = Gauge(
+    "creative_threadpool_max_threads",
+    "Worker thread limit of the event loop's default executor",
+    function=lambda: _default_executor.max_workers if _default_executor is not None else 0
+)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """
+    Measure event loop saturation until cancelled
+
+    Sleeps for interval and records how late the loop woke up; a busy or
+    blocked loop delays every stream it serves by the same amount.
+
+    Args:
+        interval: Seconds between measurements
+    """
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - started - interval))
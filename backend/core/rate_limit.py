@@ -0,0 +1,214 @@
+"""
+Upstream rate limiting
+
+A process-wide limiter that keeps LLM calls within the OpenAI requests per
+minute (RPM) and tokens per minute (TPM) budgets, so bursts are smoothed out
+on our side instead of turning into 429s and hidden SDK retries halfway
+through a pipeline.
+
+Both budgets are token buckets refilled continuously. A caller reserves one
+request and its estimated tokens up front; the buckets may go into debt, and
+the caller then sleeps until its reservation is covered. Reservations are
+taken in arrival order under a lock, so waiting callers are served FIFO. Once
+a call finishes, the output estimate is corrected with the actual output size.
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token for mixed Arabic/English text (errs on the high side)
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(prompt_template: str, input_vars: Dict[str, Any]) -> int:
+    """Estimate the tokens of a prompt template rendered with input_vars"""
+    return estimate_tokens(prompt_template) + sum(estimate_tokens(str(value)) for value in input_vars.values())
+
+
+class TokenBucket:
+    """Continuously refilled token bucket that allows reservations into debt"""
+
+    def __init__(self, per_minute: float):
+        """
+        Initialize a full bucket
+
+        Args:
+            per_minute: Refill rate and capacity (one minute's budget)
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        Take amount from the bucket
+
+        Args:
+            amount: Units to reserve (capped at the capacity)
+            now: Current monotonic time
+
+        Returns:
+            Seconds until the reservation is covered (0 if available now)
+        """
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+    def credit(self, amount: float, now: float) -> None:
+        """Return (or, if negative, charge) units after the fact"""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Process-wide RPM/TPM limiter for LLM calls"""
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, expected_output_tokens: int = 400):
+        """
+        Initialize the limiter
+
+        Args:
+            rpm: Requests per minute budget (0 = unlimited)
+            tpm: Tokens per minute budget (0 = unlimited)
+            expected_output_tokens: Output tokens reserved per call before its actual size is known
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.expected_output_tokens = expected_output_tokens
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.delayed_calls = 0
+        self.waiting = 0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Build the limiter from OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT environment variables"""
+        return cls(
+            rpm=int(os.getenv("OPENAI_RPM_LIMIT", "0")),
+            tpm=int(os.getenv("OPENAI_TPM_LIMIT", "0")),
+            expected_output_tokens=int(os.getenv("OPENAI_EXPECTED_OUTPUT_TOKENS", "400"))
+        )
+
+    def _reserve(self, tokens: int) -> float:
+        """Reserve one request and tokens; return the seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self._requests is not None:
+                delay = max(delay, self._requests.reserve(1, now))
+            if self._tokens is not None:
+                delay = max(delay, self._tokens.reserve(tokens, now))
+
+            self.calls += 1
+            if delay > 0:
+                self.delayed_calls += 1
+                self.wait_seconds_total += delay
+                self.max_wait_seconds = max(self.max_wait_seconds, delay)
+            return delay
+
+    def reserve_tokens(self, prompt_template: str, input_vars: Dict[str, Any]) -> int:
+        """Return the tokens to reserve for a call: estimated prompt plus expected output"""
+        return estimate_prompt_tokens(prompt_template, input_vars) + self.expected_output_tokens
+
+    def _release(self, tokens: int) -> None:
+        """Give back a reservation that was never used"""
+        with self._lock:
+            now = time.monotonic()
+            if self._requests is not None:
+                self._requests.credit(1, now)
+            if self._tokens is not None:
+                self._tokens.credit(tokens, now)
+
+    def _set_waiting(self, delta: int) -> None:
+        with self._lock:
+            self.waiting += delta
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Wait until a call with the given estimated tokens fits the budgets
+
+        A caller cancelled while waiting gives its reservation back.
+
+        Args:
+            tokens: Estimated prompt plus output tokens of the call
+        """
+        delay = self._reserve(tokens)
+        if delay > 0:
+            logger.info(f"Rate limit: delaying LLM call by {delay:.2f}s")
+            self._set_waiting(1)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._release(tokens)
+                raise
+            finally:
+                self._set_waiting(-1)
+
+    def acquire_sync(self, tokens: int) -> None:
+        """Blocking variant of acquire for the legacy agent (core/agent.py), which runs its steps on threads"""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            logger.info(f"Rate limit: delaying LLM call by {delay:.2f}s")
+            self._set_waiting(1)
+            try:
+                time.sleep(delay)
+            finally:
+                self._set_waiting(-1)
+
+    def settle(self, output_tokens: int) -> None:
+        """
+        Correct a reservation once the real output size of the call is known
+
+        Args:
+            output_tokens: Estimated tokens of the generated output
+        """
+        if self._tokens is None:
+            return
+        with self._lock:
+            self._tokens.credit(self.expected_output_tokens - output_tokens, time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return limiter configuration and wait-time statistics"""
+        return {
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "calls": self.calls,
+            "delayed_calls": self.delayed_calls,
+            "waiting": self.waiting,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "max_wait_seconds": round(self.max_wait_seconds, 3)
+        }
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter, creating it from the environment on first use"""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter.from_env()
+        return _shared_limiter
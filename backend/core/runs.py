@@ -0,0 +1,199 @@
+"""
+Resumable live pipeline runs
+
+A PipelineRun drives one pipeline independently of the connection that
+started it and keeps its latest events in a bounded replay buffer. Clients
+that lose their connection can re-subscribe from their last event id within
+a grace period; a run nobody is listening to is aborted once the grace
+period expires.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from .events import EventLog
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineRun:
+    """A live pipeline run with a bounded replay buffer"""
+
+    def __init__(
+        self,
+        run_id: str,
+        events: AsyncIterator[Dict[str, Any]],
+        buffer_events: Optional[int],
+        grace_seconds: float,
+        on_abort: Optional[Callable[[], None]] = None,
+        trace_id: Optional[str] = None,
+        request_key: Optional[str] = None
+    ):
+        """
+        Start driving the pipeline
+
+        Args:
+            run_id: Unique run id, used as the prefix of SSE event ids
+            events: Pipeline event stream
+            buffer_events: Number of latest events kept for replay (None keeps the
+                whole run, so no subscriber can fall out of the replay window)
+            grace_seconds: Seconds the run survives without subscribers
+            on_abort: Called when the run is aborted for lack of subscribers
+            trace_id: Trace the pipeline is recorded under, if any
+            request_key: Fingerprint of the request that started the run; a
+                resume must present the same request
+        """
+        self.run_id = run_id
+        self.trace_id = trace_id
+        self.request_key = request_key
+        self.log = EventLog(maxlen=buffer_events)
+        self.grace_seconds = grace_seconds
+        self.on_abort = on_abort
+        self.subscribers = 0
+        self.finished_at: Optional[float] = None
+        self._abort_handle: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = asyncio.ensure_future(self._drive(events))
+        self._task.add_done_callback(self._forget_task)
+
+    def _forget_task(self, task: asyncio.Task) -> None:
+        # A finished task keeps its exception traceback, and with it every frame of
+        # the aborted pipeline (including unclosed LLM streams), alive; don't retain it
+        self._task = None
+
+    async def _drive(self, events: AsyncIterator[Dict[str, Any]]) -> None:
+        try:
+            async for event in events:
+                self.log.append(event)
+        finally:
+            aclose = getattr(events, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self.log.close()
+            self.finished_at = time.monotonic()
+
+    @property
+    def done(self) -> bool:
+        """True once the pipeline has finished or was aborted"""
+        return self._task is None or self._task.done()
+
+    def abort(self) -> None:
+        """Cancel the pipeline (and its in-flight LLM stream)"""
+        self._abort_handle = None
+        if not self.done:
+            logger.warning(f"No subscribers left, aborting pipeline run {self.run_id}")
+            self._task.cancel()
+            if self.on_abort is not None:
+                self.on_abort()
+
+    async def subscribe(self, after: int = 0) -> AsyncGenerator[Tuple[int, Dict[str, Any]], None]:
+        """
+        Replay buffered events after a sequence number, then follow the run live
+
+        Args:
+            after: Last sequence number the subscriber already has
+
+        Yields:
+            (sequence number, event) tuples
+
+        Raises:
+            ReplayWindowExceeded: If the missed events are no longer buffered
+        """
+        self.subscribers += 1
+        if self._abort_handle is not None:
+            self._abort_handle.cancel()
+            self._abort_handle = None
+        try:
+            async for item in self.log.subscribe(after):
+                yield item
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                if self.grace_seconds > 0:
+                    loop = asyncio.get_running_loop()
+                    self._abort_handle = loop.call_later(self.grace_seconds, self.abort)
+                else:
+                    self.abort()
+
+
+class PipelineRunRegistry:
+    """Live and recently finished pipeline runs, addressable by run id"""
+
+    def __init__(
+        self,
+        buffer_events: Optional[int] = None,
+        grace_seconds: float = 15,
+        retention_seconds: float = 60,
+        on_abort: Optional[Callable[[], None]] = None
+    ):
+        """
+        Initialize the registry
+
+        Args:
+            buffer_events: Replay buffer size of each run (None keeps whole runs)
+            grace_seconds: Seconds a run survives without subscribers (0 aborts immediately)
+            retention_seconds: Seconds a finished run stays available for late reconnects
+            on_abort: Called whenever a run is aborted for lack of subscribers
+        """
+        self.buffer_events = buffer_events
+        self.grace_seconds = grace_seconds
+        self.retention_seconds = retention_seconds
+        self.on_abort = on_abort
+        self._runs: Dict[str, PipelineRun] = {}
+
+    def _purge(self) -> None:
+        """Forget finished runs older than the retention period"""
+        now = time.monotonic()
+        expired = [
+            run_id for run_id, run in self._runs.items()
+            if run.finished_at is not None and now - run.finished_at > self.retention_seconds
+        ]
+        for run_id in expired:
+            del self._runs[run_id]
+
+    def start(
+        self,
+        events: AsyncIterator[Dict[str, Any]],
+        trace_id: Optional[str] = None,
+        request_key: Optional[str] = None
+    ) -> PipelineRun:
+        """Start a new run driving the given event stream (recorded under trace_id)"""
+        self._purge()
+        run = PipelineRun(
+            uuid.uuid4().hex,
+            events,
+            buffer_events=self.buffer_events,
+            grace_seconds=self.grace_seconds,
+            on_abort=self.on_abort,
+            trace_id=trace_id,
+            request_key=request_key
+        )
+        self._runs[run.run_id] = run
+        return run
+
+    def get(self, run_id: str) -> Optional[PipelineRun]:
+        """Return a live or recently finished run, or None"""
+        self._purge()
+        return self._runs.get(run_id)
+
+    def __len__(self) -> int:
+        return sum(1 for run in self._runs.values() if not run.done)
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    Parse a "<run id>:<sequence number>" SSE event id
+
+    Args:
+        value: Last-Event-ID header value
+
+    Returns:
+        (run id, sequence number), or None if the value is missing or malformed
+    """
+    if not value or ":" not in value:
+        return None
+    run_id, _, seq = value.strip().rpartition(":")
+    if not run_id or not seq.isdigit():
+        return None
+    return run_id, int(seq)
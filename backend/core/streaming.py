@@ -0,0 +1,143 @@
+"""
+Pipeline event stream utilities
+"""
+import asyncio
+import logging
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+async def coalesce_events(
+    events: AsyncIterator[Dict[str, Any]],
+    max_delay: float = 0.05,
+    max_chars: int = 256
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Merge consecutive step_stream events of the same step into larger chunks
+
+    Buffered text of a step is flushed once max_chars characters are pending or
+    max_delay seconds after the first pending chunk, whichever comes first, and
+    always before any other event so the protocol order is preserved.
+
+    Args:
+        events: Pipeline event stream
+        max_delay: Maximum seconds a token may be held back (0 disables coalescing)
+        max_chars: Pending characters that force a flush (0 means no size bound)
+
+    Yields:
+        Pipeline events with step_stream content coalesced
+    """
+    if max_delay <= 0:
+        async for event in events:
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    buffers: Dict[int, List[str]] = {}
+    sizes: Dict[int, int] = {}
+    deadline = 0.0
+
+    def flush(step: int) -> Dict[str, Any]:
+        sizes.pop(step)
+        return {"type": "step_stream", "step": step, "content": "".join(buffers.pop(step))}
+
+    def flush_all() -> List[Dict[str, Any]]:
+        return [flush(step) for step in list(buffers)]
+
+    iterator = events.__aiter__()
+    pending = None
+    try:
+        while True:
+            # Wait for the next event, but never longer than the oldest buffered chunk may wait
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(deadline - loop.time(), 0) if buffers else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                for chunk in flush_all():
+                    yield chunk
+                continue
+
+            task, pending = pending, None
+            try:
+                event = task.result()
+            except StopAsyncIteration:
+                break
+
+            if event.get("type") == "step_stream":
+                step = event["step"]
+                if not buffers:
+                    deadline = loop.time() + max_delay
+                buffers.setdefault(step, []).append(event["content"])
+                sizes[step] = sizes.get(step, 0) + len(event["content"])
+                if max_chars and sizes[step] >= max_chars:
+                    yield flush(step)
+            else:
+                for chunk in flush_all():
+                    yield chunk
+                yield event
+
+        for chunk in flush_all():
+            yield chunk
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def until_disconnected(
+    events: AsyncIterator[Any],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    interval: float = 0.5,
+    on_disconnect: Optional[Callable[[], None]] = None
+) -> AsyncGenerator[Any, None]:
+    """
+    Forward a stream until the client goes away
+
+    The client is polled every interval seconds on a timer, not when an item
+    arrives, so a client leaving during a long wait (first token, rate limiter
+    or concurrency queue) is noticed without waiting for the next item.
+
+    Args:
+        events: Stream to forward
+        is_disconnected: Returns True once the client has disconnected
+        interval: Seconds between disconnect checks
+        on_disconnect: Called once if the stream stops because of a disconnect
+
+    Yields:
+        The items of events until it ends or the client disconnects
+    """
+    async def watch() -> None:
+        while not await is_disconnected():
+            await asyncio.sleep(interval)
+
+    iterator = events.__aiter__()
+    watcher = asyncio.ensure_future(watch())
+    pending = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(iterator.__anext__())
+            await asyncio.wait({pending, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not pending.done():
+                if on_disconnect is not None:
+                    on_disconnect()
+                return
+
+            task, pending = pending, None
+            try:
+                item = task.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        for task in (pending, watcher):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,265 @@
+"""
+Request tracing
+
+Lightweight spans for following one request through the pipeline: queueing
+in the rate and concurrency limiters, the upstream connection, the first
+token, streaming and SSE serialization. Spans are passed down explicitly
+(parent.child(...)) because pipeline generators are resumed from different
+tasks; the span of the LLM call in progress is additionally published in a
+context variable so the HTTP transport can attach connection events to it.
+
+Finished spans are handed to a pluggable exporter. Built-in exporters:
+"none" (default), "log" and "jsonl" (one JSON object per line in a local
+file, no collector needed). Select one with TRACE_EXPORTER; register others
+in EXPORTERS.
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Span of the LLM call running in the current task (read by the HTTP transport)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional["Span"]:
+    """Return the span published for the current task, if any"""
+    return _current_span.get()
+
+
+def use_span(span: Optional["Span"]) -> contextvars.Token:
+    """Publish span as the current span of the running task; returns the token for reset_span"""
+    return _current_span.set(span)
+
+
+def reset_span(token: contextvars.Token) -> None:
+    """Restore the current span from before use_span (in the same task)"""
+    _current_span.reset(token)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[str]:
+    """
+    Extract the trace id from a W3C traceparent header
+
+    Args:
+        value: Header value ("00-<trace id>-<parent id>-<flags>")
+
+    Returns:
+        The 32 hex digit trace id, or None if missing or malformed
+    """
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32:
+        return None
+    try:
+        int(parts[1], 16)
+    except ValueError:
+        return None
+    return parts[1].lower()
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status = "ok"
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def child(self, name: str, **attributes: Any) -> "Span":
+        """Start a child span"""
+        return Span(self.tracer, name, self.trace_id, self.span_id, attributes)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set an attribute of the span"""
+        self.attributes[key] = value
+
+    def add_attribute(self, key: str, amount: float) -> None:
+        """Add amount to a numeric attribute (starting at 0)"""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        """Record a point in time within the span (offset in ms from its start)"""
+        event = {"name": name, "offset_ms": round((time.perf_counter() - self._started) * 1000, 3)}
+        if attributes:
+            event["attributes"] = attributes
+        self.events.append(event)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Finish the span and export it (ending twice is a no-op)"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        self.tracer.export(self)
+
+    async def http_trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace callback: record connection and response milestones"""
+        if event_name.endswith(".complete") and (
+            "connect_tcp" in event_name or "start_tls" in event_name or "receive_response_headers" in event_name
+        ):
+            self.add_event(event_name)
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end(exc if isinstance(exc, Exception) else None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the span as a JSON-serializable dictionary"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": self.status,
+            "attributes": self.attributes,
+            "events": self.events
+        }
+
+
+class SpanExporter:
+    """Receives finished spans"""
+
+    def export(self, span: Span) -> None:
+        """Export a finished span (must not block the event loop)"""
+
+    def shutdown(self) -> None:
+        """Flush and release resources"""
+
+
+class LogExporter(SpanExporter):
+    """Logs every finished span as JSON"""
+
+    def export(self, span: Span) -> None:
+        logger.info(f"span {json.dumps(span.to_dict(), ensure_ascii=False)}")
+
+
+class JsonlFileExporter(SpanExporter):
+    """Appends finished spans to a local JSONL file from a background thread"""
+
+    def __init__(self, path: str):
+        """
+        Start the writer thread
+
+        Args:
+            path: JSONL file spans are appended to
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        self._queue.put(span.to_dict())
+
+    def _write_loop(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                # Write out a burst of spans before flushing
+                if self._queue.empty():
+                    f.flush()
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+# Exporter name -> factory; extend to plug in other backends
+EXPORTERS: Dict[str, Callable[[], SpanExporter]] = {
+    "none": SpanExporter,
+    "log": LogExporter,
+    "jsonl": lambda: JsonlFileExporter(os.getenv("TRACE_FILE", ".cache/traces.jsonl"))
+}
+
+
+class Tracer:
+    """Creates spans and hands finished ones to an exporter"""
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        """
+        Initialize the tracer
+
+        Args:
+            exporter: Destination of finished spans (default: drop them)
+        """
+        self.exporter = exporter or SpanExporter()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Build the tracer with the exporter named by TRACE_EXPORTER"""
+        name = os.getenv("TRACE_EXPORTER", "none").lower()
+        factory = EXPORTERS.get(name)
+        if factory is None:
+            logger.warning(f"Unknown TRACE_EXPORTER {name!r}; tracing disabled")
+            factory = SpanExporter
+        return cls(factory())
+
+    def start_span(self, name: str, trace_id: Optional[str] = None, **attributes: Any) -> Span:
+        """
+        Start a root span
+
+        Args:
+            name: Span name
+            trace_id: Trace id to join (default: a new trace)
+            **attributes: Initial span attributes
+
+        Returns:
+            The span
+        """
+        return Span(self, name, trace_id or secrets.token_hex(16), attributes=attributes)
+
+    def export(self, span: Span) -> None:
+        """Hand a finished span to the exporter"""
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.error(f"Error exporting span {span.name}: {str(e)}")
+
+
+_shared_tracer: Optional[Tracer] = None
+_shared_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, creating it from the environment on first use"""
+    global _shared_tracer
+    with _shared_tracer_lock:
+        if _shared_tracer is None:
+            _shared_tracer = Tracer.from_env()
+        return _shared_tracer
@@ -0,0 +1,93 @@
+"""
+Chain Registry Micro-Benchmark
+
+Measures the per-call CPU cost of building a prompt template and
+`prompt | llm` runnable on every step call (the old behaviour) against looking
+the chain up in the CreativeAgent registry, and extrapolates the CPU saved per
+pipeline at a given request rate. No LLM calls are made.
+
+Usage:
+    python benchmarks/bench_chain_registry.py [--iterations 2000] [--rps 100] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+
+from agents.creative import CreativeAgent, PIPELINE_STEPS  # noqa: E402
+
+
+def _measure(fn, iterations: int) -> float:
+    """Return CPU microseconds per call of fn"""
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def run(iterations: int, rps: float) -> dict:
+    """
+    Run the benchmark
+
+    Args:
+        iterations: Calls measured per variant
+        rps: Pipeline requests per second used to extrapolate the savings
+
+    Returns:
+        Benchmark results
+    """
+    agent = CreativeAgent()
+    prompts = [step.prompt for step in PIPELINE_STEPS]
+    for prompt in prompts:
+        agent._get_chain(prompt)
+
+    def rebuild():
+        for prompt in prompts:
+            ChatPromptTemplate.from_template(prompt) | agent.llm_streaming
+
+    def registry():
+        for prompt in prompts:
+            agent._get_chain(prompt)
+
+    rebuild_us = _measure(rebuild, iterations)
+    registry_us = _measure(registry, iterations)
+    saved_us = rebuild_us - registry_us
+
+    return {
+        "iterations": iterations,
+        "steps_per_pipeline": len(prompts),
+        "rebuild_us_per_pipeline": round(rebuild_us, 2),
+        "registry_us_per_pipeline": round(registry_us, 2),
+        "saved_us_per_pipeline": round(saved_us, 2),
+        "rps": rps,
+        "cpu_core_fraction_saved_at_rps": round(saved_us * rps / 1e6, 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chain registry micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls measured per variant")
+    parser.add_argument("--rps", type=float, default=100.0, help="Request rate used to extrapolate savings")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.rps)
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"Chain construction per pipeline ({results['steps_per_pipeline']} steps)")
+    print(f"  rebuild per call : {results['rebuild_us_per_pipeline']:>10.2f} us")
+    print(f"  registry lookup  : {results['registry_us_per_pipeline']:>10.2f} us")
+    print(f"  saved            : {results['saved_us_per_pipeline']:>10.2f} us")
+    print(f"  at {args.rps:g} req/s   : {results['cpu_core_fraction_saved_at_rps']:.2%} of a CPU core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+SSE Encoding Micro-Benchmark
+
+Measures the per-event cost of turning pipeline events into SSE frames, as
+done for every token in the streaming endpoint's event_generator, on a
+recorded token-by-token pipeline run with Arabic output
+(fixtures/arabic_pipeline_events.json). Compared encoders:
+
+- json: api.sse.encode_event (stdlib json, protocol 1 and 2)
+- orjson: the same payloads serialized with orjson (if installed)
+- pre-encoded: protocol 2 deltas built from a per-step byte prefix, only the
+  token text is JSON-escaped
+
+Every variant produces the bytes that go on the wire (id line included), so
+the str -> UTF-8 encoding done by the response is part of the measurement.
+
+Usage:
+    python benchmarks/bench_sse_encoding.py [--iterations 200] [--repeat 5] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from api.sse import PROTOCOL_COMPACT, PROTOCOL_V1, compact_event, encode_event  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "arabic_pipeline_events.json")
+RUN_ID = "9c49ae9b7a2b46d9b0ec25bcece353b3"
+
+
+def load_events(path: str = FIXTURE) -> List[Dict[str, Any]]:
+    """Load the recorded pipeline events"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["events"]
+
+
+def encode_json_v1(seq: int, event: Dict[str, Any]) -> bytes:
+    return encode_event(event, PROTOCOL_V1, event_id=f"{RUN_ID}:{seq}").encode("utf-8")
+
+
+def encode_json_v2(seq: int, event: Dict[str, Any]) -> bytes:
+    return encode_event(event, PROTOCOL_COMPACT, event_id=f"{RUN_ID}:{seq}").encode("utf-8")
+
+
+def encode_orjson_v1(seq: int, event: Dict[str, Any]) -> bytes:
+    return b"id: " + f"{RUN_ID}:{seq}".encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+
+
+def encode_orjson_v2(seq: int, event: Dict[str, Any]) -> bytes:
+    return b"id: " + f"{RUN_ID}:{seq}".encode() + b"\ndata: " + orjson.dumps(compact_event(event)) + b"\n\n"
+
+
+# Protocol 2 delta prefix per step, built once
+_DELTA_PREFIXES = {step: f'data: {{"t":"d","s":{step},"c":'.encode() for step in range(1, 7)}
+
+
+def encode_preencoded_v2(seq: int, event: Dict[str, Any]) -> bytes:
+    if event.get("type") != "step_stream":
+        return encode_json_v2(seq, event)
+    return b"".join((
+        b"id: ", f"{RUN_ID}:{seq}".encode(), b"\n",
+        _DELTA_PREFIXES[event["step"]],
+        json.dumps(event["content"], ensure_ascii=False).encode("utf-8"),
+        b"}\n\n"
+    ))
+
+
+def encoders() -> Dict[str, Callable[[int, Dict[str, Any]], bytes]]:
+    """Available encoders by name"""
+    variants = {"json v1": encode_json_v1, "json v2": encode_json_v2}
+    if orjson is not None:
+        variants["orjson v1"] = encode_orjson_v1
+        variants["orjson v2"] = encode_orjson_v2
+    variants["pre-encoded v2"] = encode_preencoded_v2
+    return variants
+
+
+def _measure(encode: Callable[[int, Dict[str, Any]], bytes], events: List[Dict[str, Any]],
+             iterations: int, repeat: int) -> float:
+    """Return the best-of-repeat seconds to encode the whole run once"""
+    numbered = list(enumerate(events, start=1))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for seq, event in numbered:
+                encode(seq, event)
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best
+
+
+def run(iterations: int, repeat: int) -> dict:
+    """
+    Run the benchmark
+
+    Args:
+        iterations: Encodings of the whole recorded run per measurement
+        repeat: Measurements per encoder (the fastest is reported)
+
+    Returns:
+        Benchmark results
+    """
+    events = load_events()
+    deltas = [event for event in events if event["type"] == "step_stream"]
+    results = {
+        "events": len(events),
+        "deltas": len(deltas),
+        "orjson": orjson is not None,
+        "encoders": {}
+    }
+    for name, encode in encoders().items():
+        per_run = _measure(encode, events, iterations, repeat)
+        per_delta = _measure(encode, deltas, iterations, repeat) / len(deltas)
+        wire_bytes = sum(len(encode(seq, event)) for seq, event in enumerate(events, start=1))
+        results["encoders"][name] = {
+            "us_per_pipeline": round(per_run * 1e6, 2),
+            "us_per_delta": round(per_delta * 1e6, 3),
+            "bytes_per_pipeline": wire_bytes
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE encoding micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=200, help="Encodings of the recorded run per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per encoder (best is reported)")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.repeat)
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"SSE encoding of one pipeline ({results['events']} events, {results['deltas']} token deltas)")
+    if not results["orjson"]:
+        print("  (orjson not installed, skipped)")
+    print(f"  {'encoder':<16}{'us/pipeline':>14}{'us/delta':>12}{'bytes':>10}")
+    for name, result in results["encoders"].items():
+        print(f"  {name:<16}{result['us_per_pipeline']:>14.2f}{result['us_per_delta']:>12.3f}"
+              f"{result['bytes_per_pipeline']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Frontend SSE Parsing Micro-Benchmark
+
+Measures the Streamlit client's per-event parsing cost (everything in the
+frontend/app.py read loop except rendering) on the recorded Arabic pipeline
+run (fixtures/arabic_pipeline_events.json), for both SSE protocols:
+
+- line splitting: requests' iter_lines over the response body with its
+  default 512 byte chunks against larger chunks
+- current: decode, startswith("data: "), json.loads, expand_compact_event and
+  apply_event, per line as frontend/app.py did on iter_lines
+- orjson: the same with orjson.loads on the raw bytes (if installed)
+- delta fast path: protocol 2 deltas recognised by their byte prefix and
+  appended directly, other events take the current path
+
+The dispatch loop is also measured end to end, from response body chunks to
+updated step status: requests' iter_lines at 512 byte chunks with the
+per-line parsing frontend/app.py used to do, against frontend/sse_client.py's
+SSEParser on 16 KiB chunks with frontend/stream_events.py's decoding (orjson
+if installed, what the app uses now). The client's dispatch throughput is
+checked against --target events per second.
+
+Event expansion and the step status update are imported from
+frontend/stream_events.py, the module frontend/app.py uses.
+
+Usage:
+    python benchmarks/bench_sse_parsing.py [--iterations 200] [--repeat 5] [--target 200000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend"))
+
+from api.sse import PROTOCOL_COMPACT, PROTOCOL_V1, encode_event  # noqa: E402
+from sse_client import DEFAULT_CHUNK_SIZE, SSEParser  # noqa: E402
+from stream_events import apply_event, decode_event, expand_compact_event  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "arabic_pipeline_events.json")
+RUN_ID = "9c49ae9b7a2b46d9b0ec25bcece353b3"
+
+# Events per second the client's dispatch loop must sustain (5 us per event)
+DEFAULT_TARGET_EVENTS_PER_SECOND = 200000
+
+
+def load_events(path: str = FIXTURE) -> List[Dict[str, Any]]:
+    """Load the recorded pipeline events"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["events"]
+
+
+def response_body(events: List[Dict[str, Any]], protocol: str) -> bytes:
+    """The SSE response body the backend sends for the recorded run"""
+    return "".join(
+        encode_event(event, protocol, event_id=f"{RUN_ID}:{seq}") for seq, event in enumerate(events, start=1)
+    ).encode("utf-8")
+
+
+def iter_lines(body: bytes, chunk_size: int) -> Iterator[bytes]:
+    """requests.Response.iter_lines over a body delivered in chunk_size pieces"""
+    pending = None
+    for start in range(0, len(body), chunk_size):
+        chunk = body[start:start + chunk_size]
+        if pending is not None:
+            chunk = pending + chunk
+        lines = chunk.splitlines()
+        if lines and lines[-1] and chunk and lines[-1][-1] == chunk[-1]:
+            pending = lines.pop()
+        else:
+            pending = None
+        yield from lines
+    if pending is not None:
+        yield pending
+
+
+def _new_status() -> Dict[int, Dict[str, Any]]:
+    return {step: {"status": "pending", "data": None, "streaming": None} for step in range(1, 7)}
+
+
+def parse_current(lines: List[bytes]) -> str:
+    steps_status, final_content = _new_status(), ""
+    for line in lines:
+        if line:
+            line_str = line.decode('utf-8') if isinstance(line, bytes) else line
+            if line_str.startswith("data: "):
+                event_data = expand_compact_event(json.loads(line_str[6:]), steps_status, final_content)
+                final_content = apply_event(event_data, steps_status, final_content)
+    return final_content
+
+
+def parse_orjson(lines: List[bytes]) -> str:
+    steps_status, final_content = _new_status(), ""
+    for line in lines:
+        if line.startswith(b"data: "):
+            event_data = expand_compact_event(orjson.loads(line[6:]), steps_status, final_content)
+            final_content = apply_event(event_data, steps_status, final_content)
+    return final_content
+
+
+_DELTA_PREFIX = b'data: {"t":"d","s":'
+
+
+def parse_fast_path(lines: List[bytes]) -> str:
+    loads = orjson.loads if orjson is not None else json.loads
+    steps_status, final_content = _new_status(), ""
+    for line in lines:
+        if line.startswith(_DELTA_PREFIX):
+            event = loads(line[6:])
+            status = steps_status[event["s"]]
+            status["streaming"] = (status["streaming"] or "") + event["c"]
+            if event["s"] == 6:
+                final_content += event["c"]
+        elif line.startswith(b"data: "):
+            event_data = expand_compact_event(loads(line[6:]), steps_status, final_content)
+            final_content = apply_event(event_data, steps_status, final_content)
+    return final_content
+
+
+def dispatch_iter_lines(body: bytes) -> str:
+    """Body to step status as frontend/app.py did before sse_client: iter_lines, then per-line parsing"""
+    return parse_current(list(iter_lines(body, 512)))
+
+
+def dispatch_sse_client(body: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """Body to step status as frontend/app.py does: SSEParser over large reads"""
+    parser = SSEParser()
+    steps_status, final_content = _new_status(), ""
+    for start in range(0, len(body), chunk_size):
+        for event in parser.feed(body[start:start + chunk_size]):
+            event_data = expand_compact_event(decode_event(event.data), steps_status, final_content)
+            final_content = apply_event(event_data, steps_status, final_content)
+    return final_content
+
+
+def _best(fn: Callable[[], Any], iterations: int, repeat: int) -> float:
+    """Return the best-of-repeat seconds per call of fn"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best
+
+
+def run(iterations: int, repeat: int, target: float = DEFAULT_TARGET_EVENTS_PER_SECOND) -> dict:
+    """
+    Run the benchmark
+
+    Args:
+        iterations: Parses of the whole recorded run per measurement
+        repeat: Measurements per variant (the fastest is reported)
+        target: Events per second the sse_client dispatch loop must sustain
+
+    Returns:
+        Benchmark results
+    """
+    events = load_events()
+    expected = next(event["final_content"] for event in events if event["type"] == "complete")
+    results = {"events": len(events), "orjson": orjson is not None, "target_events_per_second": target,
+               "protocols": {}}
+
+    for protocol in (PROTOCOL_V1, PROTOCOL_COMPACT):
+        body = response_body(events, protocol)
+        lines = list(iter_lines(body, 512))
+        splitting = {
+            f"iter_lines chunk {chunk_size}": _best(lambda: list(iter_lines(body, chunk_size)), iterations, repeat)
+            for chunk_size in (512, 16384)
+        }
+
+        parsers = {"current": parse_current}
+        if orjson is not None:
+            parsers["orjson"] = parse_orjson
+        if protocol == PROTOCOL_COMPACT:
+            parsers["delta fast path"] = parse_fast_path
+
+        parsing = {}
+        for name, parse in parsers.items():
+            assert parse(lines) == expected, f"{name} parser produced different content"
+            parsing[name] = _best(lambda: parse(lines), iterations, repeat)
+
+        dispatch = {}
+        for name, loop in (("iter_lines + current", dispatch_iter_lines), ("sse_client", dispatch_sse_client)):
+            assert loop(body) == expected, f"{name} dispatch produced different content"
+            dispatch[name] = _best(lambda: loop(body), iterations, repeat)
+        events_per_second = {name: round(len(events) / seconds) for name, seconds in dispatch.items()}
+
+        results["protocols"][protocol] = {
+            "body_bytes": len(body),
+            "us_per_pipeline": {
+                name: round(seconds * 1e6, 2) for name, seconds in {**splitting, **parsing}.items()
+            },
+            "us_per_event": {name: round(seconds * 1e6 / len(events), 3) for name, seconds in parsing.items()},
+            "dispatch_events_per_second": events_per_second,
+            "target_met": events_per_second["sse_client"] >= target
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frontend SSE parsing micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=200, help="Parses of the recorded run per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per variant (best is reported)")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET_EVENTS_PER_SECOND,
+                        help="Events per second the sse_client dispatch loop must sustain")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.repeat, args.target)
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"Frontend parsing of one pipeline ({results['events']} events)")
+    if not results["orjson"]:
+        print("  (orjson not installed, skipped)")
+    for protocol, result in results["protocols"].items():
+        print(f"  protocol {protocol} ({result['body_bytes']} bytes)")
+        for name, us in result["us_per_pipeline"].items():
+            per_event = result["us_per_event"].get(name)
+            suffix = f"{per_event:>10.3f} us/event" if per_event is not None else ""
+            print(f"    {name:<22}{us:>12.2f} us{suffix}")
+        print("    dispatch loop (body to step status)")
+        for name, rate in result["dispatch_events_per_second"].items():
+            print(f"      {name:<20}{rate:>12} events/s")
+        print(f"      target {results['target_events_per_second']:.0f} events/s: "
+              f"{'met' if result['target_met'] else 'MISSED'}")
+
+
+if __name__ == "__main__":
+    main()
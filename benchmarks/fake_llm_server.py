@@ -0,0 +1,305 @@
+"""
+Fake OpenAI-Compatible LLM Server
+
+A local stand-in for the chat completions API, so the whole system can be
+load-tested offline, for free and deterministically. Responses are canned
+Arabic marketing outputs streamed word by word with a configurable time to
+first token and tokens per second; server errors (500) and rate limit
+responses (429 with Retry-After) can be injected at a given rate.
+
+Point the backend at it through configuration:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=sk-fake uvicorn app:app
+
+Usage:
+    python benchmarks/fake_llm_server.py [--port 8001] [--ttft 0.5] [--tps 40]
+        [--jitter 0.1] [--error-rate 0] [--rate-limit-rate 0] [--seed 0] [--json]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Canned step outputs (markdown, matching the length the prompts ask for)
+CANNED_OUTPUTS = (
+    "- **المنتج:** قهوة مختصة محمصة محلياً (مشروبات)\n"
+    "- **الميزات:** حبوب عربية 100٪، تحميص طازج أسبوعياً، توصيل سريع\n"
+    "- **نقطة البيع:** أول قهوة مختصة تصلك طازجة من المحمصة لباب بيتك خلال يوم",
+
+    "- **الجمهور:** شباب وموظفون بين 22 و35 سنة في المدن الكبرى\n"
+    "- **المشاكل:** قهوة المكاتب مملة، والمقاهي المميزة بعيدة وغالية\n"
+    "- **أسلوب الحديث:** قريب وخفيف دم، كأنك تكلم صديق على فنجان",
+
+    "- **الفكرة 1: صباحك من المحمصة** — نتابع حبة القهوة من التحميص إلى فنجانك في أقل من 24 ساعة\n"
+    "- **الفكرة 2: استراحة الدوام** — القهوة اللي تخلي اجتماع الساعة ثمانية يمر بسلام",
+
+    "**النص الرئيسي:** يا هلا بعشاق القهوة! تعبت من قهوة الدوام اللي طعمها ماله طعم؟ "
+    "قهوتنا تتحمص كل أسبوع وتوصلك طازجة لين باب بيتك، بنكهة تصحصح المخ وتعدل المزاج. "
+    "جرب أول كيس وخل صباحك يبدأ صح.\n"
+    "**الرسالة:** قهوة مختصة طازجة، بدون مشاوير",
+
+    "- **القنوات:** سناب شات، إنستغرام، تيك توك\n"
+    "- **التكتيك:** مقاطع قصيرة من داخل المحمصة مع عرض أول طلب\n"
+    "- **التوقيت:** الصبح بدري وبداية الأسبوع\n"
+    "- **نصيحة ذهبية:** خل العميل يشم الريحة من الشاشة — ركز على صوت وصورة التحميص",
+
+    "## صباحك يبدأ من المحمصة ☕\n\n"
+    "يا هلا والله بعشاق القهوة! نعرف إن قهوة الدوام ما تمشي معك، وإن المقهى المميز دايم بعيد. "
+    "عشان كذا جبنا لك القهوة المختصة لين عندك: حبوب عربية أصلية تتحمص كل أسبوع، "
+    "وتوصلك طازجة خلال يوم واحد بس.\n\n"
+    "ريحتها تملى البيت، وطعمها يعدل المزاج قبل اجتماع الساعة ثمانية. "
+    "لا مشاوير، لا زحمة، ولا قهوة باردة من أمس.\n\n"
+    "**اطلب أول كيس اليوم وخل صباحك يبدأ صح!**"
+)
+
+_TOKEN = re.compile(r"\s*\S+")
+
+
+def split_tokens(text: str) -> List[str]:
+    """Split text into word-sized stream chunks (leading whitespace kept)"""
+    return _TOKEN.findall(text)
+
+
+class FakeLLM:
+    """Latency, throughput and failure model of the fake upstream"""
+
+    def __init__(
+        self,
+        ttft: float = 0.5,
+        tps: float = 40.0,
+        jitter: float = 0.1,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0
+    ):
+        """
+        Initialize the model
+
+        Args:
+            ttft: Seconds before the first token
+            tps: Tokens (words) streamed per second after the first (0 = no delay)
+            jitter: Relative random variation of both delays (0-1)
+            error_rate: Fraction of requests answered with a 500
+            rate_limit_rate: Fraction of requests answered with a 429
+            seed: Random seed; the same seed gives the same sequence of delays and failures
+        """
+        self.ttft = ttft
+        self.tps = tps
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+
+        self.requests = 0
+        self.active = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def _rng(self, index: int) -> random.Random:
+        """Random source of the index-th request"""
+        return random.Random(f"{self.seed}:{index}")
+
+    def _vary(self, rng: random.Random, seconds: float) -> float:
+        return max(0.0, seconds * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+    def next_request(self) -> Dict[str, Any]:
+        """
+        Decide the fate and timing of a new request
+
+        Returns:
+            "failure" (None, "error" or "rate_limit"), "ttft" and "token_delay" in seconds
+        """
+        with self._lock:
+            index = self.requests
+            self.requests += 1
+        rng = self._rng(index)
+        roll = rng.random()
+        failure = None
+        if roll < self.rate_limit_rate:
+            failure = "rate_limit"
+        elif roll < self.rate_limit_rate + self.error_rate:
+            failure = "error"
+        return {
+            "failure": failure,
+            "ttft": self._vary(rng, self.ttft),
+            "token_delay": self._vary(rng, 1.0 / self.tps) if self.tps > 0 else 0.0
+        }
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return configuration and counters"""
+        return {
+            "ttft": self.ttft,
+            "tps": self.tps,
+            "jitter": self.jitter,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+            "seed": self.seed,
+            "requests": self.requests,
+            "active": self.active,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "tokens": self.tokens
+        }
+
+
+def pick_output(messages: List[Dict[str, Any]]) -> str:
+    """Pick the canned output for a prompt (the same prompt always gets the same output)"""
+    prompt = "".join(str(message.get("content", "")) for message in messages)
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    return CANNED_OUTPUTS[digest[0] % len(CANNED_OUTPUTS)]
+
+
+def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _usage(prompt: List[Dict[str, Any]], tokens: List[str]) -> Dict[str, int]:
+    prompt_tokens = sum(len(split_tokens(str(message.get("content", "")))) for message in prompt)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(tokens),
+        "total_tokens": prompt_tokens + len(tokens)
+    }
+
+
+def _error(status_code: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": message, "type": error_type, "param": None, "code": None}},
+        status_code=status_code,
+        headers=headers
+    )
+
+
+def create_app(llm: FakeLLM) -> FastAPI:
+    """Build the fake API around a latency model"""
+    app = FastAPI(title="Fake LLM Server")
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "fake", "object": "model", "created": 0, "owned_by": "benchmark"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return llm.stats()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        messages = body.get("messages", [])
+        plan = llm.next_request()
+
+        if plan["failure"] == "rate_limit":
+            llm.count("rate_limited")
+            return _error(429, "Rate limit reached (injected)", "rate_limit_exceeded", {"Retry-After": "1"})
+        if plan["failure"] == "error":
+            llm.count("errors")
+            return _error(500, "Internal server error (injected)", "server_error")
+
+        tokens = split_tokens(pick_output(messages))
+        completion_id = f"chatcmpl-fake{llm.requests}"
+
+        if not body.get("stream"):
+            await asyncio.sleep(plan["ttft"] + plan["token_delay"] * len(tokens))
+            llm.count("tokens", len(tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop"
+                }],
+                "usage": _usage(messages, tokens)
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def stream() -> AsyncGenerator[str, None]:
+            llm.count("active")
+            try:
+                await asyncio.sleep(plan["ttft"])
+                yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+                for index, token in enumerate(tokens):
+                    if index and plan["token_delay"]:
+                        await asyncio.sleep(plan["token_delay"])
+                    llm.count("tokens")
+                    yield _chunk(completion_id, model, {"content": token})
+                yield _chunk(completion_id, model, {}, "stop")
+                if include_usage:
+                    payload = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [],
+                        "usage": _usage(messages, tokens)
+                    }
+                    yield f"data: {json.dumps(payload)}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                llm.count("active", -1)
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8001, help="Bind port")
+    parser.add_argument("--ttft", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--tps", type=float, default=40.0, help="Tokens per second after the first (0 = no delay)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative random variation of the delays")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests failing with 429")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for delays and failures")
+    parser.add_argument("--json", action="store_true", help="Print the final counters as JSON on exit")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    llm = FakeLLM(
+        ttft=args.ttft,
+        tps=args.tps,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(llm), host=args.host, port=args.port, log_level="warning")
+
+    results = llm.stats()
+    if args.json:
+        print(json.dumps(results))
+        return
+    print(f"Served {results['requests']} requests, {results['tokens']} tokens "
+          f"({results['errors']} errors, {results['rate_limited']} rate limited)")
+
+
+if __name__ == "__main__":
+    main()
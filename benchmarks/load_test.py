@@ -0,0 +1,313 @@
+"""
+Streaming Endpoint Load Test
+
+Drives POST /api/generate-creative-content-stream at stepped concurrency
+levels and reports, per level, completed requests per second, p50/p95/p99
+time to first event (TTFE) and time to complete (TTC), and the server's CPU
+usage and resident memory (read from /proc, Linux only).
+
+By default the fake LLM server and the backend are started as subprocesses
+on free ports (step cache disabled), so a run is offline and reproducible.
+Pass --url (and --server-pid for CPU/RSS) to load-test a running backend.
+
+Usage:
+    python benchmarks/load_test.py [--levels 1,10,100,500] [--rounds 2]
+        [--protocol 2] [--llm-ttft 0.2] [--llm-tps 200] [--output results.json] [--json]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARKS_DIR, "..", "backend")
+STREAM_PATH = "/api/generate-creative-content-stream"
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def percentile(samples: List[float], p: float) -> Optional[float]:
+    """Return the p-th percentile (nearest rank) of samples, or None if empty"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    """User plus system CPU seconds of a process"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return None
+
+
+def _brief(index: int) -> Dict[str, Any]:
+    """A distinct brief per request, so no request is served from another's work"""
+    return {
+        "client_name": f"محمصة القهوة {index}",
+        "product_description": "قهوة مختصة محمصة محلياً توصل طازجة خلال يوم واحد",
+        "target_audience": "شباب وموظفون في المدن الكبرى",
+        "tone_of_voice": ["ودي", "مرح"]
+    }
+
+
+async def _one_request(client: httpx.AsyncClient, url: str, index: int, protocol: str) -> Dict[str, Any]:
+    """Stream one pipeline and time its first event and completion"""
+    started = time.perf_counter()
+    first_event = None
+    completed = None
+    error = None
+    try:
+        async with client.stream("POST", url, json=_brief(index), params={"protocol": protocol}) as response:
+            if response.status_code != 200:
+                return {"error": f"HTTP {response.status_code}"}
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                if first_event is None:
+                    first_event = time.perf_counter() - started
+                event = json.loads(line[5:])
+                event_type = event.get("type", event.get("t"))
+                if event_type in ("complete", "f"):
+                    completed = time.perf_counter() - started
+                elif event_type in ("error", "e"):
+                    error = event.get("message", event.get("m"))
+    except httpx.HTTPError as e:
+        error = f"{type(e).__name__}: {e}"
+    if completed is None and error is None:
+        error = "stream ended before completion"
+    return {"ttfe": first_event, "ttc": completed, "error": error}
+
+
+async def _sample_rss(pid: int, samples: List[int], interval: float = 0.2) -> None:
+    while True:
+        rss = _rss_bytes(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+async def run_level(
+    base_url: str,
+    concurrency: int,
+    rounds: int,
+    protocol: str,
+    server_pid: Optional[int],
+    timeout: float
+) -> Dict[str, Any]:
+    """
+    Run one concurrency level: concurrency workers, each streaming rounds requests back to back
+
+    Returns:
+        Throughput, latency percentiles (seconds), errors and server resource usage
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    rss_samples: List[int] = []
+    results: List[Dict[str, Any]] = []
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker(worker_index: int) -> None:
+            for round_index in range(rounds):
+                results.append(await _one_request(client, STREAM_PATH, worker_index * rounds + round_index, protocol))
+
+        sampler = asyncio.ensure_future(_sample_rss(server_pid, rss_samples)) if server_pid else None
+        cpu_before = _cpu_seconds(server_pid) if server_pid else None
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        cpu_after = _cpu_seconds(server_pid) if server_pid else None
+        if sampler is not None:
+            sampler.cancel()
+
+    ok = [result for result in results if result["error"] is None]
+    ttfe = [result["ttfe"] for result in ok]
+    ttc = [result["ttc"] for result in ok]
+    errors: Dict[str, int] = {}
+    for result in results:
+        if result["error"] is not None:
+            errors[result["error"][:80]] = errors.get(result["error"][:80], 0) + 1
+
+    def _round(value: Optional[float]) -> Optional[float]:
+        return round(value, 4) if value is not None else None
+
+    level = {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "completed": len(ok),
+        "failed": len(results) - len(ok),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "rps": round(len(ok) / elapsed, 3) if elapsed > 0 else None,
+        "ttfe_seconds": {f"p{p}": _round(percentile(ttfe, p)) for p in (50, 95, 99)},
+        "ttc_seconds": {f"p{p}": _round(percentile(ttc, p)) for p in (50, 95, 99)}
+    }
+    if cpu_before is not None and cpu_after is not None:
+        level["server_cpu_seconds"] = round(cpu_after - cpu_before, 3)
+        level["server_cpu_cores"] = round((cpu_after - cpu_before) / elapsed, 3)
+    if rss_samples:
+        level["server_rss_mb_peak"] = round(max(rss_samples) / 2 ** 20, 1)
+        level["server_rss_mb_end"] = round(rss_samples[-1] / 2 ** 20, 1)
+    return level
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def start_servers(args: argparse.Namespace) -> Dict[str, Any]:
+    """Start the fake LLM server and the backend; return their processes and the backend URL"""
+    llm_port = _free_port()
+    api_port = _free_port()
+    llm = subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARKS_DIR, "fake_llm_server.py"), "--port", str(llm_port),
+         "--ttft", str(args.llm_ttft), "--tps", str(args.llm_tps), "--seed", str(args.seed)],
+        stdout=subprocess.DEVNULL
+    )
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=f"http://127.0.0.1:{llm_port}/v1",
+        OPENAI_API_KEY="sk-benchmark",
+        STEP_CACHE_ENABLED="false"
+    )
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(api_port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.server_logs else subprocess.DEVNULL
+    )
+    try:
+        _wait_ready(f"http://127.0.0.1:{llm_port}/v1/models", llm)
+        _wait_ready(f"http://127.0.0.1:{api_port}/health", api)
+    except Exception:
+        stop_servers([llm, api])
+        raise
+    return {"processes": [llm, api], "url": f"http://127.0.0.1:{api_port}", "pid": api.pid}
+
+
+def stop_servers(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run every concurrency level
+
+    Returns:
+        Benchmark configuration and per-level results
+    """
+    servers = None
+    base_url, server_pid = args.url, args.server_pid
+    if base_url is None:
+        servers = start_servers(args)
+        base_url, server_pid = servers["url"], servers["pid"]
+
+    try:
+        levels = []
+        for concurrency in args.levels:
+            levels.append(asyncio.run(
+                run_level(base_url, concurrency, args.rounds, args.protocol, server_pid, args.timeout)
+            ))
+            if not args.json:
+                _print_level(levels[-1])
+    finally:
+        if servers is not None:
+            stop_servers(servers["processes"])
+
+    return {
+        "target": "external" if args.url else "local",
+        "protocol": args.protocol,
+        "rounds": args.rounds,
+        "llm": None if args.url else {"ttft": args.llm_ttft, "tps": args.llm_tps, "seed": args.seed},
+        "levels": levels
+    }
+
+
+def _print_level(level: Dict[str, Any]) -> None:
+    def ms(value: Optional[float]) -> str:
+        return f"{value * 1000:8.0f}" if value is not None else "       -"
+
+    ttfe, ttc = level["ttfe_seconds"], level["ttc_seconds"]
+    print(f"concurrency {level['concurrency']:>4}: {level['completed']}/{level['requests']} ok, "
+          f"{level['rps']} req/s")
+    print(f"  TTFE ms p50/p95/p99 : {ms(ttfe['p50'])} {ms(ttfe['p95'])} {ms(ttfe['p99'])}")
+    print(f"  TTC  ms p50/p95/p99 : {ms(ttc['p50'])} {ms(ttc['p95'])} {ms(ttc['p99'])}")
+    if "server_cpu_cores" in level:
+        print(f"  server CPU          : {level['server_cpu_cores']:.2f} cores, "
+              f"RSS peak {level.get('server_rss_mb_peak')} MB")
+    for error, count in level["errors"].items():
+        print(f"  error x{count}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming endpoint load test")
+    parser.add_argument("--levels", default="1,10,100,500", help="Comma separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=2, help="Requests per worker at each level")
+    parser.add_argument("--protocol", default="2", choices=("1", "2"), help="SSE protocol requested")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--url", help="Load-test a running backend instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="Backend process id for CPU/RSS (with --url)")
+    parser.add_argument("--llm-ttft", type=float, default=0.2, help="Fake LLM time to first token")
+    parser.add_argument("--llm-tps", type=float, default=200.0, help="Fake LLM tokens per second")
+    parser.add_argument("--seed", type=int, default=0, help="Fake LLM random seed")
+    parser.add_argument("--server-logs", action="store_true", help="Show the backend's log output")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    args = parser.parse_args()
+    args.levels = [int(level) for level in args.levels.split(",") if level.strip()]
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
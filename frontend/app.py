@@ -2,7 +2,11 @@
 import streamlit as st
 import requests
 from datetime import datetime
-import json
+import time
+
+from result_cache import ResultCache, make_brief_key
+from sse_client import DEFAULT_CHUNK_SIZE, SSEStream, StreamExpired, create_session
+from stream_events import JSONDecodeError, apply_event, decode_event, expand_compact_event
 
 # Page configuration
 st.set_page_config(
@@ -228,9 +232,164 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Step status -> icon and color of the progress list
+STATUS_ICONS = {"pending": "⏳", "active": "⚙️", "complete": "✅", "error": "❌"}
+STATUS_COLORS = {"pending": "#999", "active": "#667eea", "complete": "#10b981", "error": "#ef4444"}
+
+
+def final_content_html(final_content):
+    """Wrap the generated content in the RTL content box"""
+    return f"""
+<div style="
+    direction: rtl;
+    text-align: right;
+    background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
+    border-right: 5px solid #667eea;
+    padding: 25px;
+    border-radius: 12px;
+    margin: 20px 0;
+    line-height: 1.8;
+    font-size: 16px;
+    color: #333;
+">
+
+{final_content}
+
+</div>
+"""
+
+
+def render_step(placeholder, step_num, step):
+    """Draw one step of the progress list into its placeholder"""
+    status = step["status"]
+    title = step["title"]
+    emoji = step["emoji"]
+    status_icon = STATUS_ICONS.get(status, "⏳")
+    color = STATUS_COLORS.get(status, "#999")
+
+    with placeholder.container():
+        # Show streaming content while active, then final data when complete
+        if status == "active" and step.get("streaming"):
+            with st.expander(f"{status_icon} {emoji} {step_num}. {title}", expanded=True):
+                st.markdown(step["streaming"])
+        elif step.get("data") and status == "complete":
+            with st.expander(f"{status_icon} {emoji} {step_num}. {title}", expanded=False):
+                # Display markdown content from the persona agent
+                st.markdown(step["data"])
+        else:
+            st.markdown(f"""
+            <div style="padding: 12px; margin: 8px 0; border-right: 4px solid {color}; background: #f9f9f9; border-radius: 6px;">
+                <span style="color: {color}; font-weight: 600;">{status_icon} {emoji} {step_num}. {title}</span>
+            </div>
+            """, unsafe_allow_html=True)
+
+
+class StreamRenderer:
+    """
+    Draws streaming progress at a capped frame rate
+
+    Every event is applied to steps_status right away, but only the steps it
+    changed are marked dirty. Dirty placeholders are redrawn at most fps
+    times per second (status changes are drawn at once), so a long output
+    costs one redraw per frame instead of one per token. In "full" mode
+    every event redraws all steps and the final content, as before.
+    """
+
+    def __init__(self, steps_status, progress_col, content_header, content_placeholder, fps=10, mode="incremental"):
+        self.steps_status = steps_status
+        self.content_header = content_header
+        self.content_placeholder = content_placeholder
+        self.min_interval = 1.0 / fps if fps > 0 else 0.0
+        self.full = mode == "full"
+        self.final_content = ""
+        self.dirty = set()
+        self.last_render = 0.0
+        self.events = 0
+        self.renders = 0
+        self.final_renders = 0
+        self.started = time.monotonic()
+
+        # One placeholder per step of the progress list (step 6 is the content on the left)
+        with progress_col:
+            st.markdown("### ⏱️ تقدم التوليد")
+            self.step_placeholders = {step_num: st.empty() for step_num in range(1, 6)}
+        for step_num, placeholder in self.step_placeholders.items():
+            render_step(placeholder, step_num, steps_status[step_num])
+
+    def update(self, step_num, final_content, urgent=False):
+        """Record that an event changed step_num (and the final content) and redraw if due"""
+        self.events += 1
+        if final_content != self.final_content:
+            self.final_content = final_content
+            self.dirty.add(6)
+        if step_num in self.step_placeholders:
+            self.dirty.add(step_num)
+        if self.full:
+            self.dirty.update(self.step_placeholders)
+            if self.final_content:
+                self.dirty.add(6)
+        if urgent or self.full or time.monotonic() - self.last_render >= self.min_interval:
+            self.flush()
+
+    def flush(self):
+        """Redraw every dirty placeholder"""
+        for step_num in sorted(self.dirty):
+            if step_num == 6:
+                # Show header on first step 6 content
+                if self.final_renders == 0:
+                    self.content_header.markdown("### 📨 المحتوى المُولد")
+                self.content_placeholder.markdown(final_content_html(self.final_content), unsafe_allow_html=True)
+                self.final_renders += 1
+            else:
+                render_step(self.step_placeholders[step_num], step_num, self.steps_status[step_num])
+            self.renders += 1
+        self.dirty.clear()
+        self.last_render = time.monotonic()
+
+    def stats(self):
+        """Render statistics of the run"""
+        elapsed = time.monotonic() - self.started
+        return {
+            "mode": "full" if self.full else "incremental",
+            "events": self.events,
+            "renders": self.renders,
+            "seconds": round(elapsed, 2),
+            "renders_per_second": round(self.renders / elapsed, 1) if elapsed > 0 else None
+        }
+
+
+@st.cache_resource
+def get_http_session():
+    """One pooled HTTP session shared by all reruns and browser sessions"""
+    return create_session()
+
+
+@st.cache_resource
+def get_result_cache():
+    """Generated results shared by all reruns and browser sessions, keyed by brief"""
+    return ResultCache(
+        max_entries=int(st.secrets.get("RESULT_CACHE_MAX_ENTRIES", 100)),
+        ttl_seconds=float(st.secrets.get("RESULT_CACHE_TTL_SECONDS", 3600))
+    )
+
+
 # Initialize session state
 if "api_url" not in st.session_state:
     st.session_state.api_url = st.secrets.get("API_URL",)
+if "sse_protocol" not in st.session_state:
+    # "2" = compact delta-only protocol, "1" = verbose protocol
+    st.session_state.sse_protocol = st.secrets.get("SSE_PROTOCOL", "2")
+if "sse_chunk_size" not in st.session_state:
+    # Bytes per read from the event stream
+    st.session_state.sse_chunk_size = int(st.secrets.get("SSE_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+if "render_fps" not in st.session_state:
+    # Maximum UI refreshes per second while streaming (0 = refresh on every event)
+    st.session_state.render_fps = float(st.secrets.get("RENDER_FPS", 10))
+if "render_mode" not in st.session_state:
+    # "incremental" redraws only changed steps; "full" redraws everything per event
+    st.session_state.render_mode = st.secrets.get("RENDER_MODE", "incremental")
+if "render_stats" not in st.session_state:
+    st.session_state.render_stats = None
 if "last_content" not in st.session_state:
     st.session_state.last_content = None
 if "stream_data" not in st.session_state:
@@ -360,12 +519,23 @@ with col2:
         disabled=not all_valid
     )
 
-if generate_button:
+with col3:
+    # Same brief again: skip the stored result and the backend step cache, run the pipeline anew
+    regenerate_button = st.button(
+        "🔄 إعادة التوليد",
+        use_container_width=True,
+        disabled=not all_valid,
+        help="تجاهل النتيجة المحفوظة لهذه المدخلات وتوليد محتوى جديد"
+    )
+
+if generate_button or regenerate_button:
     payload = {
         "client_name": client_name,
         "product_description": product_description,
         "target_audience": target_audience,
-        "tone_of_voice": selected_tones
+        "tone_of_voice": selected_tones,
+        # Regenerating must not replay the backend's cached step outputs either
+        "no_cache": bool(regenerate_button)
     }
 
     # Create containers for streaming display
@@ -374,8 +544,8 @@ if generate_button:
     # Create two-column layout
     left_col, right_col = st.columns([1, 1])
 
-    # Use placeholders for progress and content that update without redrawing
-    progress_placeholder = right_col.empty()
+    # Use placeholders for content that update without redrawing
+    # (the progress list gets one placeholder per step from StreamRenderer)
     content_header = left_col.empty()
     content_placeholder = left_col.empty()
 
@@ -388,134 +558,85 @@ if generate_button:
         6: {"title": "الصياغة النهائية", "emoji": "🎨", "status": "pending", "data": None, "streaming": None}
     }
 
+    result_cache = get_result_cache()
+    cache_key = make_brief_key(client_name, product_description, target_audience, selected_tones)
+    cached = result_cache.get(cache_key) if result_cache.enabled and not regenerate_button else None
+
     final_content = ""
-    step_6_started = False
+    completed = False
+    renderer = StreamRenderer(
+        steps_status,
+        right_col,
+        content_header,
+        content_placeholder,
+        fps=st.session_state.render_fps,
+        mode=st.session_state.render_mode
+    )
 
     try:
-        # Connect to streaming endpoint
-        response = requests.post(
-            f"{st.session_state.api_url}/api/generate-creative-content-stream",
-            json=payload,
-            stream=True,
-            timeout=600
-        )
-
-        if response.status_code == 200:
-            # Parse streaming events
-            for line in response.iter_lines():
-                if line:
-                    line_str = line.decode('utf-8') if isinstance(line, bytes) else line
-                    if line_str.startswith("data: "):
-                        try:
-                            event_data = json.loads(line_str[6:])
-
-                            # Update status based on event
-                            step_num = event_data.get("step")
-                            step_type = event_data.get("type")
-
-                            if step_num and step_num in steps_status:
-                                if step_type == "step_start":
-                                    steps_status[step_num]["status"] = "active"
-                                    steps_status[step_num]["streaming"] = ""  # Initialize streaming content
-                                elif step_type == "step_stream":
-                                    # Append streamed content
-                                    if steps_status[step_num]["streaming"] is None:
-                                        steps_status[step_num]["streaming"] = ""
-                                    steps_status[step_num]["streaming"] += event_data.get("content", "")
-
-                                elif step_type == "step_complete":
-                                    steps_status[step_num]["status"] = "complete"
-                                    # Store the final step data
-                                    if "data" in event_data:
-                                        steps_status[step_num]["data"] = event_data.get("data")
-                                elif step_type == "step_error":
-                                    steps_status[step_num]["status"] = "error"
-
-                            # For step 6 streaming, accumulate final content for left column
-                            if step_num == 6 and step_type == "step_stream":
-                                final_content += event_data.get("content", "")
-
-                                # Show header on first step 6 event
-                                if not step_6_started:
-                                    content_header.markdown("### 📨 المحتوى المُولد")
-                                    step_6_started = True
-
-                                # Update final content in real-time
-                                content_placeholder.markdown(f"""
-<div style="
-    direction: rtl;
-    text-align: right;
-    background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-    border-right: 5px solid #667eea;
-    padding: 25px;
-    border-radius: 12px;
-    margin: 20px 0;
-    line-height: 1.8;
-    font-size: 16px;
-    color: #333;
-">
-
-{final_content}
-
-</div>
-""", unsafe_allow_html=True)
-
-                            # Update progress display on the right column (single update, not redrawn)
-                            with progress_placeholder.container():
-                                st.markdown("### ⏱️ تقدم التوليد")
-
-                                # Display steps 1-5 with expandable details (step 6 is the final output shown on left)
-                                for step_num in range(1, 6):
-                                    status = steps_status[step_num]["status"]
-                                    title = steps_status[step_num]["title"]
-                                    emoji = steps_status[step_num]["emoji"]
-                                    step_data = steps_status[step_num].get("data")
-                                    streaming_content = steps_status[step_num].get("streaming")
-
-                                    # Display step
-                                    status_icon = {
-                                        "pending": "⏳",
-                                        "active": "⚙️",
-                                        "complete": "✅",
-                                        "error": "❌"
-                                    }.get(status, "⏳")
-
-                                    color = {
-                                        "pending": "#999",
-                                        "active": "#667eea",
-                                        "complete": "#10b981",
-                                        "error": "#ef4444"
-                                    }.get(status, "#999")
-
-                                    # Show streaming content while active, then final data when complete
-                                    if status == "active" and streaming_content:
-                                        # Show streaming content while being generated
-                                        with st.expander(f"{status_icon} {emoji} {step_num}. {title}", expanded=True):
-                                            st.markdown(streaming_content)
-                                    elif step_data and status == "complete":
-                                        # Show final data when complete
-                                        with st.expander(f"{status_icon} {emoji} {step_num}. {title}", expanded=False):
-                                            # Display markdown content from the persona agent
-                                            st.markdown(step_data)
-                                    else:
-                                        st.markdown(f"""
-                                        <div style="padding: 12px; margin: 8px 0; border-right: 4px solid {color}; background: #f9f9f9; border-radius: 6px;">
-                                            <span style="color: {color}; font-weight: 600;">{status_icon} {emoji} {step_num}. {title}</span>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-
-                            # Handle different event types
-                            if event_data.get("type") == "step":
-                                pass  # Just update progress
-
-                            elif event_data.get("type") == "step_complete":
-                                pass  # Step completed
-
-                            elif event_data.get("type") == "error":
-                                st.error(f"❌ {event_data.get('message', 'حدث خطأ')}")
-
-                        except json.JSONDecodeError:
-                            pass
+        if cached is not None:
+            # Replay the stored result instead of running the pipeline again
+            response = None
+            final_content = cached["final_content"]
+            for step_num, data in cached["steps"].items():
+                steps_status[step_num]["status"] = "complete"
+                steps_status[step_num]["data"] = data
+                renderer.update(step_num, final_content, urgent=True)
+            st.info(
+                f"⚡ نتيجة محفوظة لنفس المدخلات ({datetime.fromtimestamp(cached['created_at']).strftime('%H:%M')}) "
+                "— اضغط «إعادة التوليد» لتوليد محتوى جديد"
+            )
+        else:
+            # Connect to streaming endpoint (resumed with Last-Event-ID if the connection drops)
+            stream = SSEStream(
+                get_http_session(),
+                f"{st.session_state.api_url}/api/generate-creative-content-stream",
+                json=payload,
+                params={"protocol": st.session_state.sse_protocol},
+                timeout=600,
+                chunk_size=st.session_state.sse_chunk_size
+            )
+            response = stream.connect()
+
+            if response.status_code == 200:
+                # Parse streaming events
+                for event in stream:
+                    try:
+                        event_data = expand_compact_event(decode_event(event.data), steps_status, final_content)
+
+                        if event_data.get("verified") is False:
+                            st.warning(f"⚠️ عدم تطابق في بيانات الخطوة {event_data.get('step', '')}")
+
+                        # Update status based on event (step 6 deltas also extend the final content)
+                        step_num = event_data.get("step")
+                        step_type = event_data.get("type")
+                        final_content = apply_event(event_data, steps_status, final_content)
+
+                        # Redraw only what changed, at most RENDER_FPS times per second
+                        # (status changes are drawn immediately)
+                        renderer.update(step_num, final_content, urgent=step_type != "step_stream")
+
+                        if event_data.get("type") == "complete":
+                            completed = True
+                        elif event_data.get("type") == "error":
+                            completed = False
+                            st.error(f"❌ {event_data.get('message', 'حدث خطأ')}")
+
+                    except JSONDecodeError:
+                        pass
+
+        if response is None or response.status_code == 200:
+            # Draw whatever the frame rate cap held back
+            renderer.flush()
+            st.session_state.render_stats = renderer.stats()
+
+            # Keep complete runs so the same brief is replayed instantly next time
+            if completed and final_content:
+                result_cache.put(
+                    cache_key,
+                    final_content,
+                    {step_num: step["data"] for step_num, step in steps_status.items() if step["data"]}
+                )
 
             # Final display of content after streaming completes
             if final_content:
@@ -525,24 +646,7 @@ if generate_button:
                     st.markdown("### 📨 المحتوى المُولد")
 
                     # Display content with markdown rendering and RTL support
-                    st.markdown(f"""
-<div style="
-    direction: rtl;
-    text-align: right;
-    background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-    border-right: 5px solid #667eea;
-    padding: 25px;
-    border-radius: 12px;
-    margin: 20px 0;
-    line-height: 1.8;
-    font-size: 16px;
-    color: #333;
-">
-
-{final_content}
-
-</div>
-""", unsafe_allow_html=True)
+                    st.markdown(final_content_html(final_content), unsafe_allow_html=True)
 
                     st.markdown("---")
 
@@ -586,6 +690,12 @@ Generated by Creative Agent ✨
                     with meta_col2:
                         st.metric("📝 الكلمات", len(final_content.split()))
 
+                    render_stats = st.session_state.render_stats
+                    st.caption(
+                        f"🖼️ {render_stats['renders']} تحديث للواجهة لـ {render_stats['events']} حدث "
+                        f"({render_stats['renders_per_second']} تحديث/ث، {render_stats['mode']})"
+                    )
+
         else:
             st.error(f"❌ خطأ من الخادم: {response.status_code}")
             st.write(response.text)
@@ -594,6 +704,10 @@ Generated by Creative Agent ✨
         st.error("❌ انتهاء المهلة الزمنية - الطلب يستغرق وقتاً أطول من المتوقع")
         st.info("💡 تلميح: قد تستغرق عملية التوليد 3-5 دقائق. يرجى الانتظار...")
 
+    except StreamExpired:
+        st.error("❌ انقطع الاتصال ولم يعد بالإمكان استئناف البث")
+        st.info("💡 اضغط «إعادة التوليد» لبدء توليد جديد")
+
     except requests.exceptions.ConnectionError:
         st.error("❌ لا يمكن الاتصال بـ API")
         st.info(f"تأكد من أن الخادم يعمل على: {st.session_state.api_url}")
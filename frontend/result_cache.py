@@ -0,0 +1,124 @@
+"""
+Client-side cache of generated results
+
+Generating again with the same brief replays the stored result (final content
+and every step's output) instead of running the six-step pipeline on the
+backend. Keys are a hash of the normalized brief, so whitespace differences
+and duplicate tones do not cause a miss. Tone order is kept: the backend
+prompt lists the tones in the order given, so it can change the output. Entries live in a bounded,
+thread-safe LRU with a TTL; app.py shares one instance across all Streamlit
+sessions.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Strip and collapse whitespace so cosmetic differences share a key"""
+    return " ".join(text.split())
+
+
+def normalize_tones(tones: Iterable[str]) -> List[str]:
+    """Return the tones normalized and without duplicates, in their original order"""
+    normalized = (normalize_text(tone) for tone in tones)
+    return list(dict.fromkeys(tone for tone in normalized if tone))
+
+
+def make_brief_key(
+    client_name: str,
+    product_description: str,
+    target_audience: str,
+    tone_of_voice: Iterable[str]
+) -> str:
+    """
+    Build the cache key of a brief
+
+    Args:
+        client_name: Client or brand name
+        product_description: Product description
+        target_audience: Target audience description
+        tone_of_voice: Selected tones (duplicates are ignored, their order is not)
+
+    Returns:
+        Hex SHA-256 digest of the normalized brief
+    """
+    payload = json.dumps(
+        {
+            "client_name": normalize_text(client_name),
+            "product_description": normalize_text(product_description),
+            "target_audience": normalize_text(target_audience),
+            "tone_of_voice": normalize_tones(tone_of_voice)
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Bounded, thread-safe LRU cache of generated results with per-entry TTL"""
+
+    def __init__(self, max_entries: int = 100, ttl_seconds: float = 3600):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of results kept before evicting the least
+                recently used (0 disables the cache)
+            ttl_seconds: Seconds a result stays valid (0 disables expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether results are stored at all"""
+        return self.max_entries > 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored result or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] and entry[0] < time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, final_content: str, steps: Dict[int, Any]) -> None:
+        """
+        Store a completed result, evicting the least recently used entries if full
+
+        Args:
+            key: Brief key from make_brief_key
+            final_content: Final generated content
+            steps: Step number -> output of the step
+        """
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else 0.0
+        result = {"final_content": final_content, "steps": dict(steps), "created_at": time.time()}
+        with self._lock:
+            self._entries[key] = (expires_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the number of stored results"""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,285 @@
+"""
+Server-Sent Events client for the streaming endpoint
+
+The response body is read in large chunks (16 KiB instead of requests'
+512 byte default) and fed to an incremental parser that splits and decodes
+whole blocks of lines at once, instead of going through iter_lines and a
+per-line decode. The parser follows the SSE spec: multi-line data fields
+are joined with newlines, id/event/retry fields are honoured, comments are
+skipped and LF, CRLF and CR line endings are accepted.
+
+If the connection drops mid-stream, the request is re-sent with the last
+received event id as Last-Event-ID, so the backend replays only the missed
+events instead of restarting the pipeline. If the backend no longer knows
+the pipeline, StreamExpired is raised and the caller has to start over.
+
+This module does not depend on Streamlit, so the parser can be benchmarked
+on its own (see benchmarks/bench_sse_parsing.py).
+"""
+import time
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Bytes per read from the response body
+DEFAULT_CHUNK_SIZE = 16384
+
+# Reconnects after a dropped connection before giving up
+DEFAULT_MAX_RECONNECTS = 3
+
+# Milliseconds to wait before reconnecting, unless the server sent a retry field
+DEFAULT_RETRY_MS = 1000
+
+
+class StreamExpired(requests.exceptions.RequestException):
+    """Raised when a dropped stream cannot be resumed because the backend no longer knows its pipeline"""
+
+
+@dataclass
+class SSEEvent:
+    """
+    A dispatched Server-Sent Event
+
+    Attributes:
+        data: Data field (multiple data lines joined with newlines)
+        event: Event type ("message" if none was sent)
+        id: Last event id seen by the parser when the event was dispatched
+    """
+    data: str
+    event: str = "message"
+    id: Optional[str] = None
+
+
+class SSEParser:
+    """Incremental SSE parser fed with raw response bytes"""
+
+    def __init__(self):
+        self.last_event_id: Optional[str] = None
+        self.retry_ms: Optional[int] = None
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """
+        Parse a chunk of the response body
+
+        Args:
+            chunk: Next bytes of the body (may end anywhere, even inside a character)
+
+        Returns:
+            Events completed by this chunk, in order
+        """
+        buffer = self._buffer + chunk if self._buffer else chunk
+        if b"\r" in buffer:
+            # A trailing CR may be the first half of a CRLF split across reads
+            held = b"\r" if buffer.endswith(b"\r") else b""
+            buffer = buffer[:len(buffer) - len(held)].replace(b"\r\n", b"\n").replace(b"\r", b"\n") + held
+        end = buffer.rfind(b"\n\n")
+        if end < 0:
+            self._buffer = buffer
+            return []
+        self._buffer = buffer[end + 2:]
+
+        # Complete events end on a blank line, so the text never splits a UTF-8 sequence
+        text = buffer[:end].decode("utf-8")
+        events = self._parse_backend_events(text)
+        if events is None:
+            events = []
+            for block in text.split("\n\n"):
+                event = self._parse_block(block)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def _parse_backend_events(self, text: str) -> Optional[List[SSEEvent]]:
+        """
+        Parse events that all have the backend's shape: one "id: " and one "data: " line
+
+        The id and data lines are checked and split with a few string
+        operations over the whole text instead of a Python loop per line.
+
+        Args:
+            text: Complete events, without the final blank line
+
+        Returns:
+            The events, or None if any event has another shape
+        """
+        lines = text.split("\n")
+        if len(lines) % 3 != 2 or any(lines[2::3]):
+            return None
+        count = len(lines) // 3 + 1
+        ids = "\n".join(lines[0::3])
+        data = "\n".join(lines[1::3])
+        # Lines hold no newline, so a prefix after every separator means every line has it
+        if not (ids.startswith("id: ") and ids.count("\nid: ") == count - 1 and "\0" not in ids
+                and data.startswith("data: ") and data.count("\ndata: ") == count - 1):
+            return None
+        ids = ids[4:].split("\nid: ")
+        self.last_event_id = ids[-1]
+        return list(map(SSEEvent, data[6:].split("\ndata: "), repeat("message", count), ids))
+
+    def _parse_block(self, block: str) -> Optional[SSEEvent]:
+        """Apply the field lines of one event; None if it carries no data"""
+        data = []
+        event_type = "message"
+        for line in block.split("\n"):
+            if not line or line[0] == ":":
+                continue
+            name, colon, value = line.partition(":")
+            if colon and value[:1] == " ":
+                value = value[1:]
+            if name == "data":
+                data.append(value)
+            elif name == "event":
+                event_type = value or "message"
+            elif name == "id":
+                if "\0" not in value:
+                    self.last_event_id = value
+            elif name == "retry":
+                if value.isdigit():
+                    self.retry_ms = int(value)
+        if not data:
+            return None
+        return SSEEvent("\n".join(data), event_type, self.last_event_id)
+
+    def finish(self) -> List[SSEEvent]:
+        """End of the body: a held trailing CR still ends its line (an unterminated event is dropped)"""
+        return self.feed(b"\n") if self._buffer.endswith(b"\r") else []
+
+    def reset(self) -> None:
+        """Drop a partially received event (after the connection was lost)"""
+        self._buffer = b""
+
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """
+    Create an HTTP session with a keep-alive connection pool
+
+    Args:
+        pool_size: Connections kept open per host
+
+    Returns:
+        The session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class SSEStream:
+    """
+    A POST request answered with an SSE stream, resumed after dropped connections
+
+    Call connect() and check the response status, then iterate for events.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        url: str,
+        json: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 600,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_reconnects: int = DEFAULT_MAX_RECONNECTS
+    ):
+        """
+        Initialize the stream
+
+        Args:
+            session: HTTP session to send the requests with
+            url: Streaming endpoint URL
+            json: Request body
+            params: Query parameters
+            headers: Extra request headers
+            timeout: Connect and read timeout in seconds
+            chunk_size: Bytes per read from the response body
+            max_reconnects: Reconnects after a dropped connection before giving up
+        """
+        self.session = session
+        self.url = url
+        self.json = json
+        self.params = params
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.max_reconnects = max_reconnects
+
+        self.parser = SSEParser()
+        self.response: Optional[requests.Response] = None
+        self.events = 0
+        self.bytes = 0
+        self.reconnects = 0
+
+    def connect(self) -> requests.Response:
+        """Send the request (resuming after the last event id, if any) and return the response"""
+        headers = dict(self.headers, Accept="text/event-stream")
+        if self.parser.last_event_id:
+            headers["Last-Event-ID"] = self.parser.last_event_id
+        self.response = self.session.post(
+            self.url,
+            params=self.params,
+            json=self.json,
+            headers=headers,
+            stream=True,
+            timeout=self.timeout
+        )
+        return self.response
+
+    def __iter__(self) -> Iterator[SSEEvent]:
+        """
+        Yield events until the stream ends
+
+        Yields:
+            Dispatched events
+
+        Raises:
+            StreamExpired: If the backend dropped the pipeline before the resume
+            requests.exceptions.RequestException: If the connection drops and
+                cannot be resumed (no event id yet, or out of reconnects)
+        """
+        while True:
+            try:
+                if self.response is None:
+                    status_code = self.connect().status_code
+                    if status_code in (404, 409) and self.parser.last_event_id:
+                        raise StreamExpired(
+                            f"Resuming the stream failed with HTTP {status_code}: {self.response.text}",
+                            response=self.response
+                        )
+                    if status_code != 200:
+                        raise requests.exceptions.ConnectionError(
+                            f"Connecting to the stream failed with HTTP {self.response.status_code}"
+                        )
+                for chunk in self.response.iter_content(chunk_size=self.chunk_size):
+                    self.bytes += len(chunk)
+                    for event in self.parser.feed(chunk):
+                        self.events += 1
+                        yield event
+                for event in self.parser.finish():
+                    self.events += 1
+                    yield event
+                return
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                self.close()
+                if not self.parser.last_event_id or self.reconnects >= self.max_reconnects:
+                    raise
+            # Resume after the last event received
+            self.reconnects += 1
+            self.parser.reset()
+            time.sleep((self.parser.retry_ms if self.parser.retry_ms is not None else DEFAULT_RETRY_MS) / 1000)
+
+    def close(self) -> None:
+        """Close the current connection"""
+        if self.response is not None:
+            self.response.close()
+            self.response = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Events, bytes and reconnects of the stream so far"""
+        return {"events": self.events, "bytes": self.bytes, "reconnects": self.reconnects}
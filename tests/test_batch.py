@@ -0,0 +1,91 @@
+"""Tests for bounded-concurrency batch execution"""
+import asyncio
+
+import pytest
+
+from backend.core.batch import run_bounded
+
+
+def _run(items, worker, concurrency):
+    async def collect():
+        return [result async for result in run_bounded(items, worker, concurrency)]
+
+    return asyncio.run(collect())
+
+
+def test_run_bounded_never_exceeds_the_concurrency_limit():
+    state = {"running": 0, "peak": 0}
+
+    async def worker(item):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.01)
+        state["running"] -= 1
+        return item * 2
+
+    results = _run(range(20), worker, 3)
+
+    assert sorted(results) == [item * 2 for item in range(20)]
+    assert state["peak"] == 3
+
+
+def test_run_bounded_yields_in_completion_order():
+    async def worker(delay):
+        await asyncio.sleep(delay)
+        return delay
+
+    assert _run([0.1, 0.01, 0.05], worker, 3) == [0.01, 0.05, 0.1]
+
+
+def test_run_bounded_pulls_async_items_lazily():
+    pulled = []
+
+    async def items():
+        for index in range(100):
+            pulled.append(index)
+            yield index
+
+    async def worker(item):
+        await asyncio.sleep(0)
+        return item
+
+    async def first_two():
+        results = run_bounded(items(), worker, 2)
+        taken = [await results.__anext__(), await results.__anext__()]
+        await results.aclose()
+        return taken
+
+    assert len(asyncio.run(first_two())) == 2
+    # Only about 2 x concurrency items are held at a time, not the whole input
+    assert len(pulled) < 20
+
+
+def test_run_bounded_reraises_worker_errors():
+    async def worker(item):
+        if item == 3:
+            raise RuntimeError("boom")
+        return item
+
+    with pytest.raises(RuntimeError, match="boom"):
+        _run(range(10), worker, 2)
+
+
+def test_run_bounded_cancels_workers_when_closed_early():
+    cancelled = []
+
+    async def worker(item):
+        try:
+            await asyncio.sleep(0 if item == 0 else 10)
+            return item
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+
+    async def first():
+        results = run_bounded(range(4), worker, 4)
+        item = await results.__anext__()
+        await results.aclose()
+        return item
+
+    assert asyncio.run(first()) == 0
+    assert sorted(cancelled) == [1, 2, 3]
@@ -0,0 +1,134 @@
+"""Tests for the step-level result cache"""
+import asyncio
+import time
+
+from backend.core.cache import LRUCache, SingleFlight, StepCache, make_cache_key
+
+PROMPT = "Analyze {product_description} for {client_name}"
+
+
+def test_cache_key_ignores_whitespace_and_input_order():
+    key = make_cache_key("gpt-4.1", 0.7, PROMPT, {"client_name": "Acme", "product_description": "A  new\nphone"})
+
+    assert key == make_cache_key("gpt-4.1", 0.7, PROMPT, {"product_description": "A new phone ", "client_name": "Acme"})
+
+
+def test_cache_key_covers_model_temperature_prompt_and_inputs():
+    inputs = {"client_name": "Acme"}
+    key = make_cache_key("gpt-4.1", 0.7, PROMPT, inputs)
+
+    assert key != make_cache_key("gpt-4.1-mini", 0.7, PROMPT, inputs)
+    assert key != make_cache_key("gpt-4.1", 0.2, PROMPT, inputs)
+    assert key != make_cache_key("gpt-4.1", 0.7, PROMPT + "!", inputs)
+    assert key != make_cache_key("gpt-4.1", 0.7, PROMPT, {"client_name": "Other"})
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl_seconds=0)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(ttl_seconds=60)
+    cache.set("fresh", "1")
+    cache.set("stale", "2", expires_at=time.time() - 1)
+
+    assert cache.get("fresh") == "1"
+    assert cache.get("stale") is None
+    assert len(cache) == 1
+
+
+def test_step_cache_counts_hits_and_misses():
+    cache = StepCache()
+    assert cache.get("key") is None
+    cache.set("key", "output")
+
+    assert cache.get("key") == "output"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_a_restart_and_is_promoted(tmp_path):
+    path = str(tmp_path / "step_cache.sqlite3")
+    StepCache(path=path).set("key", "output")
+
+    restarted = StepCache(path=path)
+    assert len(restarted.memory) == 0
+    assert restarted.get("key") == "output"
+    assert restarted.memory.get("key") == "output"
+
+
+def test_disk_tier_expires_entries(tmp_path):
+    cache = StepCache(path=str(tmp_path / "step_cache.sqlite3"), ttl_seconds=60)
+    cache.disk.set("key", "output")
+    cache.disk._conn.execute("UPDATE step_cache SET expires_at = ?", (time.time() - 1,))
+
+    assert cache.get("key") is None
+    assert cache.disk.get("key") is None
+
+
+def test_async_get_and_set_use_both_tiers(tmp_path):
+    cache = StepCache(path=str(tmp_path / "step_cache.sqlite3"))
+
+    async def roundtrip():
+        await cache.aset("key", "output")
+        cache.memory = LRUCache()
+        return await cache.aget("key"), await cache.aget("missing")
+
+    assert asyncio.run(roundtrip()) == ("output", None)
+
+
+def test_single_flight_shares_the_leaders_result():
+    flights = SingleFlight()
+
+    async def run():
+        leader = flights.lead("key")
+        follower = flights.join("key")
+        flights.finish("key", leader, "output")
+        return await follower, flights.join("key"), flights.shared
+
+    assert asyncio.run(run()) == ("output", None, 1)
+
+
+def test_single_flight_failed_leader_releases_followers():
+    flights = SingleFlight()
+
+    async def run():
+        leader = flights.lead("key")
+        follower = flights.join("key")
+        # None tells followers to compute the value themselves
+        flights.finish("key", leader, None)
+        return await follower, len(flights)
+
+    assert asyncio.run(run()) == (None, 0)
+
+
+def test_single_flight_finish_keeps_a_newer_leader():
+    flights = SingleFlight()
+
+    async def run():
+        first = flights.lead("key")
+        second = flights.lead("key")
+        flights.finish("key", first, "old")
+        return flights.join("key") is second
+
+    assert asyncio.run(run())
+
+
+def test_single_flight_is_per_event_loop():
+    flights = SingleFlight()
+
+    async def lead():
+        flights.lead("key")
+
+    async def join():
+        return flights.join("key")
+
+    asyncio.run(lead())
+    assert asyncio.run(join()) is None
@@ -0,0 +1,89 @@
+"""Tests for context compaction of upstream step outputs"""
+import json
+
+from backend.core.compaction import TRUNCATION_MARKER, ContextCompactor, clean_markdown, shrink_json
+from backend.core.rate_limit import estimate_tokens
+
+GENERATED = {
+    "generated_content": "نص " * 200,
+    "key_messages": ["رسالة أولى", "رسالة ثانية", "رسالة ثالثة"],
+    "hashtags": ["#وسم"]
+}
+FIELDS = {"generated_content": ("generated_content", "key_messages")}
+
+
+def test_compact_json_over_budget_stays_valid_json():
+    compactor = ContextCompactor(budgets={5: 30})
+    rendered, saved = compactor.compact_json(5, {"generated_content": GENERATED}, FIELDS)
+
+    value = json.loads(rendered["generated_content"])
+    assert set(value) == {"generated_content", "key_messages"}
+    assert value["generated_content"].endswith("…")
+    assert value["key_messages"] == GENERATED["key_messages"][:len(value["key_messages"])]
+    assert value["key_messages"]
+    assert saved > 0
+
+
+def test_compact_json_within_budget_only_projects():
+    compactor = ContextCompactor(budgets={5: 10000})
+    rendered, _ = compactor.compact_json(5, {"generated_content": GENERATED}, FIELDS)
+
+    assert json.loads(rendered["generated_content"]) == {
+        "generated_content": GENERATED["generated_content"],
+        "key_messages": GENERATED["key_messages"]
+    }
+
+
+def test_compact_json_shares_budget_between_outputs():
+    compactor = ContextCompactor(budgets={6: 60})
+    outputs = {"creative_ideas": {"ideas": ["فكرة " * 50] * 5}, "generated_content": GENERATED}
+    rendered, _ = compactor.compact_json(6, outputs, {"creative_ideas": None, **FIELDS})
+
+    for text in rendered.values():
+        json.loads(text)
+    assert sum(estimate_tokens(text) for text in rendered.values()) <= 70
+
+
+def test_shrink_json_keeps_scalars_and_drops_trailing_items():
+    value = {"count": 3, "flag": True, "items": ["a" * 30, "b" * 30, "c" * 30]}
+    shrunk = shrink_json(value, 40)
+
+    assert shrunk == {"count": 3, "flag": True, "items": value["items"][:2]}
+
+
+def test_shrink_json_cuts_a_lone_oversized_item():
+    shrunk = shrink_json({"items": ["a" * 300]}, 20)
+
+    assert len(shrunk["items"]) == 1
+    assert shrunk["items"][0].startswith("aaa") and shrunk["items"][0].endswith("…")
+
+
+def test_default_compaction_keeps_all_content(monkeypatch):
+    monkeypatch.delenv("CONTEXT_BUDGETS", raising=False)
+    compactor = ContextCompactor.from_env()
+    # A typical (long) markdown step output
+    analysis = "## تحليل المنتج\n\n" + "\n".join(f"- **نقطة {index}:** " + "تفاصيل " * 40 for index in range(30))
+
+    rendered, saved = compactor.compact_text(6, {"product_analysis": analysis, "tone": "ودية"}, ["product_analysis"])
+
+    assert rendered["product_analysis"] == clean_markdown(analysis)
+    assert rendered["product_analysis"].count("\n") == 30
+    assert TRUNCATION_MARKER not in rendered["product_analysis"]
+    assert rendered["tone"] == "ودية"
+    assert saved > 0
+
+    outputs, _ = compactor.compact_json(6, {"generated_content": GENERATED}, FIELDS)
+    assert json.loads(outputs["generated_content"]) == {
+        "generated_content": GENERATED["generated_content"],
+        "key_messages": GENERATED["key_messages"]
+    }
+
+
+def test_budgets_from_the_environment_opt_in_to_cutting(monkeypatch):
+    monkeypatch.setenv("CONTEXT_BUDGETS", "6=50")
+    compactor = ContextCompactor.from_env()
+
+    rendered, _ = compactor.compact_text(6, {"analysis": "سطر " * 400}, ["analysis"])
+
+    assert compactor.budgets == {6: 50}
+    assert rendered["analysis"].endswith(TRUNCATION_MARKER)
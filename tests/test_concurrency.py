@@ -0,0 +1,147 @@
+"""Tests for the adaptive (AIMD) concurrency limiter"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.core.concurrency import AdaptiveConcurrencyLimiter
+
+
+def test_calls_beyond_the_limit_queue_in_arrival_order():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1)
+    order = []
+
+    async def call(name):
+        async with limiter.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        first = asyncio.create_task(call("a"))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(call(name)) for name in ("b", "c")]
+        await asyncio.sleep(0)
+        stats = limiter.stats()
+        await asyncio.gather(first, *queued)
+        return stats
+
+    stats = asyncio.run(run())
+
+    assert stats["in_flight"] == 1 and stats["queued"] == 2
+    assert order == ["a", "b", "c"]
+    assert limiter.in_flight == 0
+
+
+def test_successful_calls_grow_the_limit_up_to_the_maximum():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=3)
+
+    async def run():
+        for _ in range(10):
+            async with limiter.slot() as slot:
+                slot.first_token()
+
+    asyncio.run(run())
+
+    assert limiter.stats()["limit"] == 3
+    assert limiter.increases == 1
+
+
+def test_overload_cuts_the_limit_once_per_cooldown():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=16, min_limit=2, cooldown_seconds=60)
+
+    async def overloaded_call():
+        with pytest.raises(TimeoutError):
+            async with limiter.slot():
+                raise TimeoutError()
+
+    asyncio.run(overloaded_call())
+    asyncio.run(overloaded_call())
+
+    assert limiter.stats()["limit"] == 8
+    assert limiter.decreases == 1
+
+
+def test_the_limit_never_drops_below_the_minimum():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=3, cooldown_seconds=0)
+
+    async def overloaded_calls():
+        for _ in range(3):
+            with pytest.raises(TimeoutError):
+                async with limiter.slot():
+                    raise TimeoutError()
+
+    asyncio.run(overloaded_calls())
+
+    assert limiter.stats()["limit"] == 3
+
+
+def test_slow_first_token_counts_as_overload():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, ttft_threshold=0.01)
+
+    async def slow_call():
+        async with limiter.slot() as slot:
+            await asyncio.sleep(0.05)
+            slot.first_token()
+
+    asyncio.run(slow_call())
+
+    assert limiter.stats()["limit"] == 4
+
+
+def test_other_errors_do_not_change_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+
+    async def failing_call():
+        with pytest.raises(ValueError):
+            async with limiter.slot():
+                raise ValueError("bad request")
+
+    asyncio.run(failing_call())
+
+    assert limiter.stats()["limit"] == 8 and limiter.decreases == 0
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_waiter_leaves_the_queue_without_a_slot():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1)
+
+    async def run():
+        async with limiter.slot():
+            waiter = asyncio.create_task(limiter.slot().__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert limiter.stats()["queued"] == 0
+
+    asyncio.run(run())
+
+    assert limiter.in_flight == 0
+    assert limiter.decreases == 0
+
+
+def test_slot_sync_blocks_threads_until_a_slot_is_free():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2, max_limit=2)
+    peak = []
+    lock = threading.Lock()
+    active = [0]
+
+    def call():
+        with limiter.slot_sync() as slot:
+            with lock:
+                active[0] += 1
+                peak.append(active[0])
+            time.sleep(0.02)
+            slot.first_token()
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert max(peak) == 2 and len(peak) == 6
+    assert limiter.in_flight == 0
@@ -0,0 +1,107 @@
+"""Tests for dependency-aware step execution"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.core.executor import run_dependency_graph, stream_dependency_graph
+
+# Same shape as the pipeline: 1 and 2 are independent, 3 needs both
+GRAPH = {1: (), 2: (), 3: (1, 2), 4: (3,)}
+
+
+def test_run_dependency_graph_passes_upstream_results():
+    seen = {}
+
+    def run_node(node, results):
+        seen[node] = sorted(results)
+        return sum(results.get(dep, 0) for dep in GRAPH[node]) + node
+
+    results = run_dependency_graph(GRAPH, run_node)
+
+    assert results == {1: 1, 2: 2, 3: 6, 4: 10}
+    assert seen[3] == [1, 2] and seen[4] == [1, 2, 3]
+
+
+def test_run_dependency_graph_runs_independent_nodes_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def run_node(node, results):
+        if node in (1, 2):
+            # Deadlocks (and times out) unless 1 and 2 run at the same time
+            barrier.wait()
+        return node
+
+    assert run_dependency_graph(GRAPH, run_node)[4] == 4
+
+
+def test_run_dependency_graph_rejects_unknown_nodes_and_cycles():
+    with pytest.raises(ValueError, match="unknown"):
+        run_dependency_graph({1: (9,)}, lambda node, results: node)
+    with pytest.raises(ValueError, match="cycle"):
+        run_dependency_graph({1: (2,), 2: (1,)}, lambda node, results: node)
+
+
+def test_stream_dependency_graph_interleaves_independent_nodes():
+    async def run_node(node):
+        for index in range(3):
+            await asyncio.sleep(0.01)
+            yield (node, index)
+
+    async def collect():
+        return [item async for item in stream_dependency_graph(GRAPH, run_node)]
+
+    items = asyncio.run(collect())
+
+    assert len(items) == 12
+    first_six = {node for node, _ in items[:6]}
+    assert first_six == {1, 2}
+    # 3 only starts after 1 and 2 finished, 4 after 3
+    assert [node for node, _ in items[6:]] == [3, 3, 3, 4, 4, 4]
+
+
+def test_stream_dependency_graph_cancels_siblings_on_failure():
+    cancelled = []
+
+    async def run_node(node):
+        if node == 1:
+            yield "started"
+            raise RuntimeError("boom")
+        try:
+            await asyncio.sleep(10)
+            yield "never"
+        except asyncio.CancelledError:
+            cancelled.append(node)
+            raise
+
+    async def collect():
+        return [item async for item in stream_dependency_graph({1: (), 2: ()}, run_node)]
+
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(collect())
+    assert cancelled == [2]
+    assert time.monotonic() - started < 5
+
+
+def test_stream_dependency_graph_cancels_nodes_when_closed_early():
+    cancelled = []
+
+    async def run_node(node):
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield node
+        except asyncio.CancelledError:
+            cancelled.append(node)
+            raise
+
+    async def consume_one():
+        stream = stream_dependency_graph({1: (), 2: ()}, run_node)
+        item = await stream.__anext__()
+        await stream.aclose()
+        return item
+
+    assert asyncio.run(consume_one()) in (1, 2)
+    assert sorted(cancelled) == [1, 2]
@@ -0,0 +1,112 @@
+"""Tests for hedged LLM streams"""
+import asyncio
+
+import pytest
+
+from backend.core.hedging import Hedger, LatencyTracker
+
+
+def _hedger(samples=20, **options):
+    hedger = Hedger(enabled=True, min_delay=0.05, min_samples=20, **options)
+    for _ in range(samples):
+        hedger.ttft.observe(0.01)
+    return hedger
+
+
+def _upstream(first_token_delays, queue_delay=0.0, closed=None):
+    """start() for Hedger.stream: attempt i admits after queue_delay and yields after first_token_delays[i]"""
+    attempts = []
+
+    def start(on_admitted):
+        attempt = len(attempts)
+        attempts.append(attempt)
+
+        async def stream():
+            try:
+                await asyncio.sleep(queue_delay)
+                on_admitted()
+                delay = first_token_delays[attempt]
+                if isinstance(delay, BaseException):
+                    raise delay
+                await asyncio.sleep(delay)
+                for index in range(3):
+                    yield f"{attempt}:{index}"
+            finally:
+                if closed is not None:
+                    closed.append(attempt)
+
+        return stream()
+
+    return start, attempts
+
+
+def _collect(hedger, start):
+    async def collect():
+        return [item async for item in hedger.stream(start)]
+
+    return asyncio.run(collect())
+
+
+def test_latency_tracker_percentiles():
+    tracker = LatencyTracker(window=100)
+    assert tracker.percentile(95) is None
+    for value in range(1, 101):
+        tracker.observe(value / 100)
+
+    assert tracker.percentile(50) == 0.5
+    assert tracker.percentile(95) == 0.95
+    assert tracker.percentile(100) == 1.0
+
+
+def test_no_hedge_until_enough_samples_or_when_disabled():
+    assert _hedger(samples=19).hedge_delay() is None
+    assert Hedger(enabled=False).hedge_delay() is None
+    assert _hedger().hedge_delay() == 0.05
+
+    start, attempts = _upstream([0.2])
+    assert _collect(_hedger(samples=5), start) == ["0:0", "0:1", "0:2"]
+    assert attempts == [0]
+
+
+def test_slow_first_token_is_hedged_and_the_faster_stream_wins():
+    closed = []
+    hedger = _hedger()
+    start, attempts = _upstream([5, 0], closed=closed)
+
+    assert _collect(hedger, start) == ["1:0", "1:1", "1:2"]
+    assert attempts == [0, 1]
+    assert sorted(closed) == [0, 1]
+    assert hedger.stats()["hedges"] == 1 and hedger.stats()["hedge_wins"] == 1
+
+
+def test_fast_first_token_is_not_hedged():
+    hedger = _hedger()
+    start, attempts = _upstream([0])
+
+    assert _collect(hedger, start) == ["0:0", "0:1", "0:2"]
+    assert attempts == [0] and hedger.hedges == 0
+
+
+def test_time_queued_on_the_limiters_does_not_count():
+    hedger = _hedger()
+    # Queued far longer than the hedge delay, then a prompt first token
+    start, attempts = _upstream([0], queue_delay=0.3)
+
+    assert _collect(hedger, start) == ["0:0", "0:1", "0:2"]
+    assert attempts == [0]
+
+
+def test_failed_attempt_falls_back_to_the_other_one():
+    hedger = _hedger()
+    start, _ = _upstream([0.1, RuntimeError("backup failed")])
+
+    assert _collect(hedger, start) == ["0:0", "0:1", "0:2"]
+    assert hedger.hedge_wins == 0
+
+
+def test_primary_error_is_raised_when_every_attempt_fails():
+    hedger = _hedger()
+    start, _ = _upstream([RuntimeError("primary"), RuntimeError("backup")])
+
+    with pytest.raises(RuntimeError, match="primary"):
+        _collect(hedger, start)
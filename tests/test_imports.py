@@ -0,0 +1,64 @@
+"""
+Import smoke tests for both import roots
+
+The API, the CLI and the streaming agent run with backend/ on sys.path and
+import "core.…"; the legacy JSON agent is imported from the repository root
+as "backend.core.…". Modules under backend/core must import under both.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+
+# Top-level names that belong to this repository (a missing one is a bug,
+# any other missing module is an uninstalled dependency)
+FIRST_PARTY = {"backend", "core", "api", "agents", "prompts", "app", "cli"}
+
+CORE_MODULES = sorted(
+    name[:-3] for name in os.listdir(os.path.join(BACKEND, "core"))
+    if name.endswith(".py") and name not in ("__init__.py", "agent.py")
+)
+
+PROBE = """
+import importlib, sys
+try:
+    importlib.import_module(sys.argv[1])
+except ModuleNotFoundError as error:
+    if (error.name or "").split(".")[0] not in sys.argv[2].split(","):
+        print(error.name)
+        sys.exit(3)
+    raise
+"""
+
+
+def _import(module: str, path: str) -> None:
+    """Import a module in a fresh interpreter, skipping on missing dependencies"""
+    # app builds its agent at import time, which needs an API key (never used here)
+    env = {"OPENAI_API_KEY": "sk-test", **os.environ, "PYTHONPATH": path}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, module, ",".join(sorted(FIRST_PARTY))],
+        cwd=path, env=env, capture_output=True, text=True
+    )
+    if result.returncode == 3:
+        pytest.skip(f"dependency not installed: {result.stdout.strip()}")
+    assert result.returncode == 0, result.stderr
+
+
+LEGACY_AGENT = pytest.param("backend.core.agent", marks=pytest.mark.xfail(
+    reason="core/agent.py imports FULL_PIPELINE_PROMPT, which prompts/creative_prompts.py does not define",
+    strict=True
+))
+
+
+@pytest.mark.parametrize("module", [LEGACY_AGENT] + [f"backend.core.{name}" for name in CORE_MODULES])
+def test_import_from_repository_root(module):
+    _import(module, ROOT)
+
+
+@pytest.mark.parametrize("module", ["app", "cli", "agents.creative"] + [f"core.{name}" for name in CORE_MODULES])
+def test_import_from_backend_root(module):
+    _import(module, BACKEND)
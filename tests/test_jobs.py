@@ -0,0 +1,48 @@
+"""Tests for asynchronous generation jobs"""
+import asyncio
+
+from backend.core.jobs import JOB_COMPLETED, JobManager, JobStore
+
+REQUEST = {"client_name": "Acme", "product_description": "A phone", "target_audience": "Teens", "tone_of_voice": ["x"]}
+
+
+class FakeAgent:
+    """Emits a two-step pipeline without calling an LLM"""
+
+    async def arun_full_pipeline_streaming(self, **kwargs):
+        for step in (1, 2):
+            yield {"type": "step_start", "step": step, "title": ""}
+            yield {"type": "step_stream", "step": step, "content": f"out{step}"}
+            yield {"type": "step_complete", "step": step, "data": f"out{step}"}
+        yield {"type": "complete", "final_content": "out2"}
+
+
+def test_job_runs_persists_and_replays(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    manager = JobManager(FakeAgent(), store, coalesce_delay=0)
+
+    async def run():
+        job_id = await manager.submit(REQUEST)
+        live = [event async for _, event in manager.stream(job_id)]
+        while await manager.astatus(job_id) != JOB_COMPLETED:
+            await asyncio.sleep(0.01)
+        replayed = [event async for _, event in manager.stream(job_id, after=2)]
+        return job_id, live, replayed, await manager.aget(job_id)
+
+    job_id, live, replayed, job = asyncio.run(run())
+
+    assert live[-1] == {"type": "complete", "final_content": "out2"}
+    assert replayed == live[2:]
+    assert job["status"] == JOB_COMPLETED
+    assert job["steps"] == {1: "out1", 2: "out2"}
+    assert job["final_content"] == "out2"
+    assert job["request"] == REQUEST
+
+
+def test_unknown_job(tmp_path):
+    manager = JobManager(FakeAgent(), JobStore(str(tmp_path / "jobs.sqlite3")))
+
+    async def lookup():
+        return await manager.astatus("missing"), await manager.aget("missing")
+
+    assert asyncio.run(lookup()) == (None, None)
@@ -0,0 +1,30 @@
+"""Tests for the in-process service metrics"""
+import asyncio
+import threading
+
+from backend.core import metrics
+
+
+def test_threadpool_gauges_measure_the_loops_default_executor():
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_call():
+        started.set()
+        release.wait(5)
+
+    async def run():
+        pool = metrics.install_default_executor()
+        call = asyncio.ensure_future(asyncio.to_thread(blocking_call))
+        await asyncio.to_thread(started.wait, 5)
+        # The helper waiting on started has returned; only blocking_call is running
+        busy = metrics.THREADPOOL_BUSY.samples()[0][2]
+        release.set()
+        await call
+        return pool, busy
+
+    pool, busy = asyncio.run(run())
+
+    assert busy == 1
+    assert metrics.THREADPOOL_BUSY.samples()[0][2] == 0
+    assert metrics.THREADPOOL_SIZE.samples()[0][2] == pool.max_workers
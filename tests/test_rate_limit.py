@@ -0,0 +1,77 @@
+"""Tests for the RPM/TPM rate limiter"""
+import asyncio
+
+import pytest
+
+from backend.core.rate_limit import RateLimiter, TokenBucket, estimate_tokens
+
+
+def test_token_bucket_goes_into_debt_and_refills():
+    bucket = TokenBucket(60)  # one unit per second
+
+    assert bucket.reserve(60, now=bucket.updated) == 0
+    # Empty bucket: the next unit is covered after a second
+    assert bucket.reserve(1, now=bucket.updated) == pytest.approx(1)
+    # Ten seconds later the debt is paid and nine units are back
+    assert bucket.reserve(9, now=bucket.updated + 10) == 0
+    assert bucket.level == pytest.approx(0)
+
+
+def test_token_bucket_caps_reservations_and_credits_at_capacity():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+
+    assert bucket.reserve(1000, now) == 0
+    bucket.credit(1000, now)
+    assert bucket.level == 60
+
+
+def test_unlimited_limiter_never_delays():
+    limiter = RateLimiter()
+
+    assert limiter._reserve(10 ** 9) == 0
+    assert limiter.stats()["delayed_calls"] == 0
+
+
+def test_rpm_budget_delays_the_call_over_it():
+    limiter = RateLimiter(rpm=2)
+
+    assert limiter._reserve(0) == 0
+    assert limiter._reserve(0) == 0
+    assert limiter._reserve(0) == pytest.approx(30, abs=0.1)
+    assert limiter.stats()["delayed_calls"] == 1
+
+
+def test_tpm_budget_and_settle_correct_the_output_estimate():
+    limiter = RateLimiter(tpm=1000, expected_output_tokens=400)
+
+    assert limiter._reserve(1000) == 0
+    # The call produced only 100 output tokens: 300 reserved tokens come back
+    limiter.settle(100)
+    assert limiter._reserve(300) == 0
+    assert limiter._reserve(60) == pytest.approx(3.6, abs=0.1)
+
+
+def test_cancelled_waiter_gives_its_reservation_back():
+    limiter = RateLimiter(rpm=1)
+
+    async def run():
+        await limiter.acquire(0)
+        waiter = asyncio.ensure_future(limiter.acquire(0))
+        await asyncio.sleep(0.01)
+        assert limiter.waiting == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return limiter.waiting, limiter._requests.level
+
+    waiting, level = asyncio.run(run())
+
+    assert waiting == 0
+    assert level == pytest.approx(0, abs=0.01)
+
+
+def test_reserve_tokens_adds_expected_output():
+    limiter = RateLimiter(expected_output_tokens=400)
+
+    assert limiter.reserve_tokens("abc", {"x": "abcdef"}) == 1 + 2 + 400
+    assert estimate_tokens("abcd") == 2
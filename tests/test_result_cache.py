@@ -0,0 +1,13 @@
+"""Tests for the frontend's result cache keys"""
+from frontend.result_cache import make_brief_key, normalize_tones
+
+
+def test_tones_are_deduplicated_in_their_original_order():
+    assert normalize_tones([" شاعري", "طبيعي ", "شاعري", "", "احترافي"]) == ["شاعري", "طبيعي", "احترافي"]
+
+
+def test_brief_key_ignores_whitespace_and_duplicate_tones_but_not_tone_order():
+    key = make_brief_key("Acme", "A new  phone", "Youth", ["شاعري", "طبيعي"])
+
+    assert key == make_brief_key(" Acme", "A new\nphone", "Youth ", ["شاعري", "طبيعي", "شاعري"])
+    assert key != make_brief_key("Acme", "A new phone", "Youth", ["طبيعي", "شاعري"])
@@ -0,0 +1,134 @@
+"""Tests for numbered event logs and resumable pipeline runs"""
+import asyncio
+
+import pytest
+
+from backend.core.events import EventLog, ReplayWindowExceeded
+from backend.core.runs import PipelineRunRegistry, parse_event_id
+
+
+def test_event_log_replays_then_follows_live():
+    async def run():
+        log = EventLog()
+        log.append("a")
+        log.append("b")
+
+        async def produce():
+            await asyncio.sleep(0.01)
+            log.append("c")
+            log.close()
+
+        producer = asyncio.ensure_future(produce())
+        items = [item async for item in log.subscribe(after=1)]
+        await producer
+        return items
+
+    assert asyncio.run(run()) == [(2, "b"), (3, "c")]
+
+
+def test_bounded_log_rejects_a_resume_outside_the_window():
+    async def run():
+        log = EventLog(maxlen=2)
+        for event in "abc":
+            log.append(event)
+        log.close()
+        return [item async for item in log.subscribe(after=0)]
+
+    with pytest.raises(ReplayWindowExceeded):
+        asyncio.run(run())
+
+
+def test_unbounded_log_keeps_a_slow_subscriber_in_the_window():
+    async def run():
+        log = EventLog()
+        received = []
+
+        async def consume():
+            async for seq, _ in log.subscribe():
+                received.append(seq)
+                await asyncio.sleep(0)
+
+        consumer = asyncio.ensure_future(consume())
+        for index in range(5000):
+            log.append(index)
+        log.close()
+        await consumer
+        return received
+
+    assert asyncio.run(run()) == list(range(1, 5001))
+
+
+async def _pipeline(events, delay=0.01):
+    for event in events:
+        await asyncio.sleep(delay)
+        yield event
+
+
+def test_run_resumes_after_the_last_event_id():
+    async def run():
+        registry = PipelineRunRegistry(grace_seconds=1)
+        pipeline = registry.start(_pipeline(["a", "b", "c"]), request_key="brief")
+        first = pipeline.subscribe()
+        got = [await first.__anext__()]
+        await first.aclose()
+
+        resumed = registry.get(pipeline.run_id)
+        got += [item async for item in resumed.subscribe(after=got[-1][0])]
+        return resumed is pipeline, pipeline.request_key, got
+
+    same, request_key, got = asyncio.run(run())
+
+    assert same and request_key == "brief"
+    assert got == [(1, "a"), (2, "b"), (3, "c")]
+
+
+def test_run_without_subscribers_is_aborted_after_the_grace_period():
+    aborted = []
+
+    async def run():
+        registry = PipelineRunRegistry(grace_seconds=0.05, on_abort=lambda: aborted.append(True))
+        pipeline = registry.start(_pipeline(range(1000), delay=0.01))
+        events = pipeline.subscribe()
+        await events.__anext__()
+        await events.aclose()
+        live_after_close = len(registry)
+        await asyncio.sleep(0.2)
+        return pipeline, live_after_close, len(registry)
+
+    pipeline, live_after_close, live_after_grace = asyncio.run(run())
+
+    assert live_after_close == 1 and live_after_grace == 0
+    assert aborted == [True]
+    assert pipeline.done and pipeline._task is None
+
+
+def test_reconnect_within_the_grace_period_keeps_the_run():
+    async def run():
+        registry = PipelineRunRegistry(grace_seconds=0.1)
+        pipeline = registry.start(_pipeline(range(10), delay=0.02))
+        events = pipeline.subscribe()
+        await events.__anext__()
+        await events.aclose()
+        await asyncio.sleep(0.05)
+        return [seq async for seq, _ in pipeline.subscribe(after=1)]
+
+    assert asyncio.run(run()) == list(range(2, 11))
+
+
+def test_finished_runs_expire_after_retention():
+    async def run():
+        registry = PipelineRunRegistry(retention_seconds=0.05)
+        pipeline = registry.start(_pipeline(["a"], delay=0))
+        [item async for item in pipeline.subscribe()]
+        known = registry.get(pipeline.run_id) is pipeline
+        await asyncio.sleep(0.1)
+        return known, registry.get(pipeline.run_id)
+
+    assert asyncio.run(run()) == (True, None)
+
+
+def test_parse_event_id():
+    assert parse_event_id("abc:12") == ("abc", 12)
+    assert parse_event_id(" abc:0 ") == ("abc", 0)
+    for value in (None, "", "12", "abc:", ":3", "abc:x"):
+        assert parse_event_id(value) is None
@@ -0,0 +1,53 @@
+"""Tests for Server-Sent Events encoding"""
+import json
+import zlib
+
+from backend.api.sse import PROTOCOL_COMPACT, PROTOCOL_V1, compact_event, encode_event, negotiate_protocol
+
+TEXT = "مرحبا بالعالم"
+
+
+def _crc(text):
+    return f"{zlib.crc32(text.encode('utf-8')) & 0xffffffff:08x}"
+
+
+def test_compact_events_carry_deltas_and_checksums_only():
+    assert compact_event({"type": "step_start", "step": 1, "title": "تحليل"}) == {"t": "b", "s": 1, "ti": "تحليل"}
+    assert compact_event({"type": "step_stream", "step": 2, "content": "نص"}) == {"t": "d", "s": 2, "c": "نص"}
+    assert compact_event({"type": "step_complete", "step": 3, "data": TEXT}) == {
+        "t": "c", "s": 3, "n": len(TEXT), "h": _crc(TEXT)
+    }
+    assert compact_event({"type": "complete", "final_content": TEXT, "context_tokens_saved": 12}) == {
+        "t": "f", "n": len(TEXT), "h": _crc(TEXT), "ts": 12
+    }
+    assert compact_event({"type": "error", "message": "خطأ"}) == {"t": "e", "m": "خطأ"}
+
+
+def test_compact_events_keep_trace_ids_but_not_on_deltas():
+    assert compact_event({"type": "step_start", "step": 1, "title": "", "trace_id": "abc"})["tr"] == "abc"
+    assert "tr" not in compact_event({"type": "step_stream", "step": 1, "content": "x", "trace_id": "abc"})
+
+
+def test_compact_event_passes_unknown_types_through():
+    event = {"type": "heartbeat"}
+
+    assert compact_event(event) is event
+
+
+def test_encode_event_frames():
+    event = {"type": "step_stream", "step": 1, "content": TEXT}
+
+    verbose = encode_event(event, PROTOCOL_V1, event_id="run:7")
+    assert verbose.startswith("id: run:7\ndata: ") and verbose.endswith("\n\n")
+    assert json.loads(verbose.split("data: ", 1)[1]) == event
+
+    compact = encode_event(event, PROTOCOL_COMPACT)
+    # UTF-8 is sent unescaped and without whitespace
+    assert compact == 'data: {"t":"d","s":1,"c":"مرحبا بالعالم"}\n\n'
+
+
+def test_negotiate_protocol_prefers_query_then_header():
+    assert negotiate_protocol("2", "1") == "2"
+    assert negotiate_protocol(None, " 2 ") == "2"
+    assert negotiate_protocol("9", None) == "1"
+    assert negotiate_protocol(None, None) == "1"
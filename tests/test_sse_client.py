@@ -0,0 +1,147 @@
+"""Tests for the frontend's Server-Sent Events client"""
+import pytest
+import requests
+
+from backend.api.sse import PROTOCOL_COMPACT, PROTOCOL_V1, encode_event
+from frontend.sse_client import SSEEvent, SSEParser, SSEStream, StreamExpired
+from frontend.stream_events import apply_event, decode_event, expand_compact_event
+
+EVENTS = [
+    {"type": "step_start", "step": 6, "title": "المحتوى النهائي"},
+    {"type": "step_stream", "step": 6, "content": "مرحبا "},
+    {"type": "step_stream", "step": 6, "content": "بالعالم"},
+    {"type": "step_complete", "step": 6, "data": "مرحبا بالعالم"},
+    {"type": "complete", "final_content": "مرحبا بالعالم"}
+]
+
+
+def _feed_bytewise(parser, body):
+    events = []
+    for index in range(len(body)):
+        events.extend(parser.feed(body[index:index + 1]))
+    return events + parser.finish()
+
+
+def test_backend_frames_parse_in_one_chunk_and_byte_by_byte():
+    body = "".join(encode_event(event, PROTOCOL_V1, f"run:{n}") for n, event in enumerate(EVENTS, 1)).encode("utf-8")
+
+    whole = SSEParser().feed(body)
+    parser = SSEParser()
+    split = _feed_bytewise(parser, body)
+
+    assert whole == split
+    assert [decode_event(event.data) for event in whole] == EVENTS
+    assert [event.id for event in whole] == [f"run:{n}" for n in range(1, 6)]
+    assert parser.last_event_id == "run:5"
+
+
+def test_fields_comments_and_multi_line_data():
+    body = (
+        b": keep-alive\n\n"
+        b"retry: 2500\n"
+        b"event: progress\n"
+        b"id: 7\n"
+        b"data: first\n"
+        b"data:second\n"
+        b"data\n"
+        b"\n"
+        b"id: 8\n"
+        b"retry: soon\n"
+        b"\n"
+    )
+    parser = SSEParser()
+
+    assert parser.feed(body) == [SSEEvent("first\nsecond\n", "progress", "7")]
+    # An event without data only updates the id
+    assert parser.last_event_id == "8"
+    assert parser.retry_ms == 2500
+
+
+def test_crlf_and_cr_line_endings_including_a_crlf_split_across_reads():
+    parser = SSEParser()
+
+    events = parser.feed(b"data: a\r\n\r")
+    events += parser.feed(b"\ndata: b\r\rdata: c\r")
+    events += parser.finish()
+
+    assert [event.data for event in events] == ["a", "b"]
+    assert parser.feed(b"\n") == [SSEEvent("c")]
+
+
+def test_unterminated_event_is_held_then_dropped_by_reset():
+    parser = SSEParser()
+
+    assert parser.feed("data: نص".encode("utf-8")[:-1]) == []
+    assert parser.finish() == []
+    parser.reset()
+    assert parser.feed(b"data: next\n\n") == [SSEEvent("next")]
+
+
+def test_compact_protocol_round_trip_rebuilds_and_verifies_outputs():
+    steps_status = {6: {"status": "pending", "streaming": None, "data": None}}
+    final_content = ""
+    completions = []
+    body = "".join(encode_event(event, PROTOCOL_COMPACT) for event in EVENTS).encode("utf-8")
+
+    for sse_event in SSEParser().feed(body):
+        event = expand_compact_event(decode_event(sse_event.data), steps_status, final_content)
+        final_content = apply_event(event, steps_status, final_content)
+        if "verified" in event:
+            completions.append(event)
+
+    assert final_content == "مرحبا بالعالم"
+    assert steps_status[6] == {"status": "complete", "streaming": final_content, "data": final_content}
+    assert [event["verified"] for event in completions] == [True, True]
+
+
+class _Response:
+    def __init__(self, status_code, chunks, drop=False):
+        self.status_code = status_code
+        self.text = ""
+        self._chunks = chunks
+        self._drop = drop
+
+    def iter_content(self, chunk_size):
+        yield from self._chunks
+        if self._drop:
+            raise requests.exceptions.ChunkedEncodingError("connection lost")
+
+    def close(self):
+        pass
+
+
+class _Session:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.headers = []
+
+    def post(self, url, params, json, headers, stream, timeout):
+        self.headers.append(headers)
+        return self.responses.pop(0)
+
+
+def test_stream_resumes_after_the_last_event_id():
+    session = _Session([
+        _Response(200, [b"retry: 0\nid: run:1\ndata: a\n\nid: run:2\nda"], drop=True),
+        _Response(200, [b"id: run:2\ndata: b\n\n"])
+    ])
+    stream = SSEStream(session, "http://backend/stream")
+
+    assert [event.data for event in stream] == ["a", "b"]
+    assert "Last-Event-ID" not in session.headers[0]
+    assert session.headers[1]["Last-Event-ID"] == "run:1"
+    assert stream.stats()["reconnects"] == 1
+
+
+def test_stream_expired_when_the_backend_forgot_the_run():
+    session = _Session([
+        _Response(200, [b"retry: 0\nid: run:1\ndata: a\n\n"], drop=True),
+        _Response(404, [])
+    ])
+    stream = SSEStream(session, "http://backend/stream")
+    received = []
+
+    with pytest.raises(StreamExpired):
+        for event in stream:
+            received.append(event.data)
+    assert received == ["a"]
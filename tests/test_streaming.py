@@ -0,0 +1,105 @@
+"""Tests for the pipeline event stream utilities"""
+import asyncio
+
+from backend.core.streaming import coalesce_events, until_disconnected
+
+
+def _delta(step, content):
+    return {"type": "step_stream", "step": step, "content": content}
+
+
+def _coalesce(events, delays=None, **options):
+    """Run coalesce_events over a list of events, sleeping delays[i] before event i"""
+    async def source():
+        for index, event in enumerate(events):
+            if delays:
+                await asyncio.sleep(delays[index])
+            yield event
+
+    async def collect():
+        return [event async for event in coalesce_events(source(), **options)]
+
+    return asyncio.run(collect())
+
+
+def test_coalesce_merges_deltas_per_step_and_keeps_order():
+    events = [
+        {"type": "step_start", "step": 1},
+        _delta(1, "مر"), _delta(2, "a"), _delta(1, "حبا"), _delta(2, "b"),
+        {"type": "step_complete", "step": 1, "data": "مرحبا"},
+        _delta(2, "c")
+    ]
+
+    coalesced = _coalesce(events, max_delay=10, max_chars=0)
+
+    assert coalesced == [
+        {"type": "step_start", "step": 1},
+        _delta(1, "مرحبا"), _delta(2, "ab"),
+        {"type": "step_complete", "step": 1, "data": "مرحبا"},
+        _delta(2, "c")
+    ]
+
+
+def test_coalesce_flushes_on_size():
+    coalesced = _coalesce([_delta(1, "abc")] * 4, max_delay=10, max_chars=6)
+
+    assert coalesced == [_delta(1, "abcabc"), _delta(1, "abcabc")]
+
+
+def test_coalesce_flushes_on_delay_while_the_stream_is_idle():
+    coalesced = _coalesce([_delta(1, "a"), _delta(1, "b"), _delta(1, "c")], delays=[0, 0, 0.3], max_delay=0.05)
+
+    assert coalesced == [_delta(1, "ab"), _delta(1, "c")]
+
+
+def test_coalesce_disabled_passes_events_through():
+    events = [_delta(1, "a"), _delta(1, "b")]
+
+    assert _coalesce(events, max_delay=0) == events
+
+
+def test_until_disconnected_forwards_the_whole_stream():
+    async def events():
+        for index in range(3):
+            yield index
+
+    async def connected():
+        return False
+
+    async def collect():
+        return [item async for item in until_disconnected(events(), connected, interval=0.01)]
+
+    assert asyncio.run(collect()) == [0, 1, 2]
+
+
+def test_until_disconnected_notices_a_disconnect_between_items():
+    closed = []
+    calls = []
+
+    async def events():
+        try:
+            yield "first"
+            # A long first-token or queue wait with no items
+            await asyncio.sleep(10)
+            yield "never"
+        finally:
+            closed.append(True)
+
+    async def is_disconnected():
+        calls.append(True)
+        return len(calls) > 2
+
+    async def collect():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        items = [item async for item in until_disconnected(
+            events(), is_disconnected, interval=0.01, on_disconnect=lambda: calls.append("notified")
+        )]
+        return items, loop.time() - started
+
+    items, elapsed = asyncio.run(collect())
+
+    assert items == ["first"]
+    assert elapsed < 1
+    assert "notified" in calls
+    assert closed == [True]